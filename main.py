@@ -6,6 +6,7 @@ Main entry point for the application
 
 import sys
 import os
+import multiprocessing
 
 # Add the src directory to Python path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
@@ -13,5 +14,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 from app import PriCHApp
 
 if __name__ == '__main__':
+    # Needed for the regex sandbox worker process in frozen builds
+    multiprocessing.freeze_support()
     app = PriCHApp()
     app.run() 
\ No newline at end of file
@@ -6,6 +6,7 @@ Alternative entry point
 
 import sys
 import os
+import multiprocessing
 
 # Add the src directory to Python path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
@@ -17,4 +18,6 @@ def main():
     app.run()   
 
 if __name__ == '__main__':
+    # Needed for the regex sandbox worker process in frozen builds
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
@@ -4,6 +4,7 @@ from src.ui.main_window import MainWindow
 from src.db.initialize import initialize_database
 from src.services.clipboard_service import ClipboardService
 from src.services.config_service import ConfigService
+from src.services.history_compactor import HistoryCompactor
 import screeninfo
 
 class PriCHApp:
@@ -35,6 +36,10 @@ class PriCHApp:
         
         # Start clipboard monitoring
         self.clipboard_service.start_monitor()
+        
+        # Start background history retention/compaction
+        self.history_compactor = HistoryCompactor(self.config)
+        self.history_compactor.start()
 
     def run(self):
         try:
@@ -44,4 +49,6 @@ class PriCHApp:
             if hasattr(self, 'main_window'):
                 self.main_window.cleanup()
             if hasattr(self, 'clipboard_service'):
-                self.clipboard_service.stop_monitor() 
\ No newline at end of file
+                self.clipboard_service.stop_monitor()
+            if hasattr(self, 'history_compactor'):
+                self.history_compactor.stop() 
\ No newline at end of file
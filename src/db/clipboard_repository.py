@@ -1,77 +1,174 @@
 from src.db.connection import DBConnection
+from src.db.text_codec import encode_text, decode_text, text_hash, DEFAULT_COMPRESS_MIN_BYTES
+
+# History rows joined with their shared content. Entries stored before deduplication
+# (content_id IS NULL) keep their text in clipboard_history itself.
+HISTORY_SELECT = """
+    SELECT h.id,
+           COALESCE(c.original_text, h.original_text), COALESCE(c.masked_text, h.masked_text),
+           h.source_process, h.timestamp, h.created_at,
+           c.original_blob, c.masked_blob,
+           h.content_id
+    FROM clipboard_history h
+    LEFT JOIN clipboard_contents c ON c.id = h.content_id
+"""
+
+# Mappings of one history entry, from content_mask_mappings or the legacy per-entry table
+MAPPINGS_SELECT = """
+    SELECT original_text, masked_text, mask_type, priority FROM content_mask_mappings WHERE content_id = ?
+    UNION ALL
+    SELECT original_text, masked_text, mask_type, priority FROM mask_mappings WHERE history_id = ?
+    ORDER BY priority
+"""
 
 class ClipboardRepository:
-    def __init__(self):
+    def __init__(self, compress_min_bytes=DEFAULT_COMPRESS_MIN_BYTES):
         self.db = DBConnection()
+        self.compress_min_bytes = compress_min_bytes
+
+    def _decode_history_row(self, row):
+        """Return (id, original_text, masked_text, source_process, timestamp, created_at) with payloads decompressed"""
+        return (row[0], decode_text(row[1], row[6]), decode_text(row[2], row[7]), row[3], row[4], row[5])
 
     # Clipboard History CRUD
     def add_entry(self, original_text, masked_text, source_process, timestamp, mask_mappings=None):
+        """
+        Record a copy. The text is stored once per distinct (original, masked) pair in
+        clipboard_contents; repeated copies only insert a small occurrence row.
+        """
         conn = self.db.connect()
         cur = conn.cursor()
         
-        # Insert clipboard history entry
+        content_id = self._get_or_add_content(cur, original_text, masked_text, mask_mappings)
+        
+        # Insert clipboard history occurrence
         cur.execute("""
-            INSERT INTO clipboard_history (original_text, masked_text, source_process, timestamp)
-            VALUES (?, ?, ?, ?)
-        """, (original_text, masked_text, source_process, timestamp))
+            INSERT INTO clipboard_history (original_text, masked_text, source_process, timestamp, content_id)
+            VALUES ('', '', ?, ?, ?)
+        """, (source_process, timestamp, content_id))
         
         history_id = cur.lastrowid
-        
-        # Insert mask mappings if provided
-        if mask_mappings:
-            for i, mapping in enumerate(mask_mappings):
-                cur.execute("""
-                    INSERT INTO mask_mappings (history_id, original_text, masked_text, mask_type, priority)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
-                    history_id,
-                    mapping.get('originalText', ''),
-                    mapping.get('maskedText', ''),
-                    mapping.get('maskType', ''),
-                    i  # Use index as priority
-                ))
-        
         conn.commit()
         cur.close()
         return history_id
 
+    def _get_or_add_content(self, cur, original_text, masked_text, mask_mappings):
+        """Return the clipboard_contents id for the pair, inserting content and mappings if new"""
+        content_hash = text_hash(original_text + "\x00" + masked_text)
+        cur.execute("SELECT id FROM clipboard_contents WHERE content_hash = ?", (content_hash,))
+        row = cur.fetchone()
+        if row:
+            return row[0]
+        
+        # Large payloads are stored compressed in the blob columns
+        original_plain, original_blob = encode_text(original_text, self.compress_min_bytes)
+        masked_plain, masked_blob = encode_text(masked_text, self.compress_min_bytes)
+        payload_bytes = (len(original_blob) if original_blob is not None else len(original_plain.encode('utf-8'))) + \
+                        (len(masked_blob) if masked_blob is not None else len(masked_plain.encode('utf-8')))
+        
+        cur.execute("""
+            INSERT INTO clipboard_contents (content_hash, original_text, masked_text, original_blob, masked_blob,
+                                            masked_hash, payload_bytes)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (content_hash, original_plain, masked_plain, original_blob, masked_blob,
+              text_hash(masked_text), payload_bytes))
+        content_id = cur.lastrowid
+        
+        # Insert mask mappings if provided
+        if mask_mappings:
+            cur.executemany("""
+                INSERT INTO content_mask_mappings (content_id, original_text, masked_text, mask_type, priority)
+                VALUES (?, ?, ?, ?, ?)
+            """, [(
+                content_id,
+                mapping.get('originalText', ''),
+                mapping.get('maskedText', ''),
+                mapping.get('maskType', ''),
+                i  # Use index as priority
+            ) for i, mapping in enumerate(mask_mappings)])
+        return content_id
+
     def get_history(self, limit=100):
         conn = self.db.connect()
         cur = conn.cursor()
-        cur.execute("""
-            SELECT id, original_text, masked_text, source_process, timestamp, created_at
-            FROM clipboard_history 
-            ORDER BY created_at DESC 
+        cur.execute(HISTORY_SELECT + """
+            ORDER BY h.created_at DESC, h.id DESC
             LIMIT ?
         """, (limit,))
-        result = cur.fetchall()
+        result = [self._decode_history_row(row) for row in cur.fetchall()]
         cur.close()
         return result
 
-    def get_history_with_mappings(self, limit=100):
-        """Get history entries with their mask mappings"""
+    def get_history_with_mappings(self, limit=100, collapsed=False):
+        """
+        Get history entries with their mask mappings.
+        Expanded (default): one entry per copy.
+        Collapsed: one entry per distinct content, showing its latest copy with
+        'occurrenceCount' and the 'occurrences' (id, sourceProcess, timestamp, createdAt) newest first.
+        """
+        if not collapsed:
+            return self.get_history_page(page_size=limit)[0]
+        
         conn = self.db.connect()
         cur = conn.cursor()
         
-        # Get history entries
+        # One row per content: its latest copy (highest id) and the number of copies.
+        # Entries stored before deduplication are each their own group.
         cur.execute("""
-            SELECT id, original_text, masked_text, source_process, timestamp, created_at
-            FROM clipboard_history 
-            ORDER BY created_at DESC 
+            SELECT h.id,
+                   COALESCE(c.original_text, h.original_text), COALESCE(c.masked_text, h.masked_text),
+                   h.source_process, h.timestamp, h.created_at,
+                   c.original_blob, c.masked_blob,
+                   h.content_id, latest.occurrence_count
+            FROM (
+                SELECT MAX(id) AS id, COUNT(*) AS occurrence_count
+                FROM clipboard_history
+                GROUP BY COALESCE(content_id, -id)
+            ) latest
+            JOIN clipboard_history h ON h.id = latest.id
+            LEFT JOIN clipboard_contents c ON c.id = h.content_id
+            ORDER BY h.created_at DESC, h.id DESC
             LIMIT ?
         """, (limit,))
-        history_entries = cur.fetchall()
+        result = self._build_history_dicts(cur, cur.fetchall(), collapsed=True)
+        cur.close()
+        return result
+
+    def get_history_page(self, page_size=50, before=None):
+        """
+        Keyset-paginated history, newest first.
+        `before` is the cursor returned with the previous page (None for the first page).
+        Returns (entries, next_cursor); next_cursor is None when there are no older entries.
+        Each page is an index range scan on (created_at, id), so deep pages cost the same as the first.
+        """
+        conn = self.db.connect()
+        cur = conn.cursor()
+        if before is None:
+            cur.execute(HISTORY_SELECT + """
+                ORDER BY h.created_at DESC, h.id DESC
+                LIMIT ?
+            """, (page_size,))
+        else:
+            cur.execute(HISTORY_SELECT + """
+                WHERE (h.created_at, h.id) < (?, ?)
+                ORDER BY h.created_at DESC, h.id DESC
+                LIMIT ?
+            """, (before[0], before[1], page_size))
+        rows = cur.fetchall()
+        result = self._build_history_dicts(cur, rows)
+        cur.close()
         
+        next_cursor = (rows[-1][5], rows[-1][0]) if len(rows) == page_size else None
+        return result, next_cursor
+
+    def _build_history_dicts(self, cur, history_rows, collapsed=False):
+        """Convert joined history rows into dicts with their mask mappings"""
         # Get mask mappings for each entry
         result = []
-        for entry in history_entries:
-            history_id = entry[0]
-            cur.execute("""
-                SELECT original_text, masked_text, mask_type, priority
-                FROM mask_mappings 
-                WHERE history_id = ?
-                ORDER BY priority
-            """, (history_id,))
+        for row in history_rows:
+            entry = self._decode_history_row(row)
+            content_id = row[8]
+            cur.execute(MAPPINGS_SELECT, (content_id, entry[0]))
             mappings = cur.fetchall()
             
             # Convert to list of dictionaries
@@ -94,21 +191,38 @@ class ClipboardRepository:
                 'createdAt': entry[5],
                 'maskMappings': mask_mappings
             }
+            if collapsed:
+                history_dict['occurrenceCount'] = row[9]
+                history_dict['occurrences'] = self._get_occurrences(cur, content_id, entry)
             result.append(history_dict)
-        
-        cur.close()
         return result
 
+    def _get_occurrences(self, cur, content_id, entry):
+        """Copies of one content, newest first"""
+        if content_id is None:
+            occurrences = [entry[0:1] + entry[3:6]]
+        else:
+            cur.execute("""
+                SELECT id, source_process, timestamp, created_at
+                FROM clipboard_history
+                WHERE content_id = ?
+                ORDER BY created_at DESC, id DESC
+            """, (content_id,))
+            occurrences = cur.fetchall()
+        return [{
+            'id': occurrence[0],
+            'sourceProcess': occurrence[1],
+            'timestamp': occurrence[2],
+            'createdAt': occurrence[3]
+        } for occurrence in occurrences]
+
     def get_mask_mappings_for_history(self, history_id):
         """Get mask mappings for a specific history entry"""
         conn = self.db.connect()
         cur = conn.cursor()
-        cur.execute("""
-            SELECT original_text, masked_text, mask_type, priority
-            FROM mask_mappings 
-            WHERE history_id = ?
-            ORDER BY priority
-        """, (history_id,))
+        cur.execute("SELECT content_id FROM clipboard_history WHERE id = ?", (history_id,))
+        row = cur.fetchone()
+        cur.execute(MAPPINGS_SELECT, (row[0] if row else None, history_id))
         result = cur.fetchall()
         cur.close()
         
@@ -126,6 +240,7 @@ class ClipboardRepository:
         conn = self.db.connect()
         cur = conn.cursor()
         cur.execute("DELETE FROM clipboard_history")
+        cur.execute("DELETE FROM clipboard_contents")
         conn.commit()
         cur.close()
 
@@ -137,6 +252,12 @@ class ClipboardRepository:
         conn.commit()
         cur.close()
 
+    def add_categories(self, names):
+        """Insert many categories in one transaction, skipping existing names"""
+        conn = self.db.connect()
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO categories (name) VALUES (?)", [(name,) for name in names])
+
     def get_categories(self):
         conn = self.db.connect()
         cur = conn.cursor()
@@ -192,15 +313,13 @@ class ClipboardRepository:
         """Get history entries for a specific category"""
         conn = self.db.connect()
         cur = conn.cursor()
-        cur.execute("""
-            SELECT h.id, h.original_text, h.masked_text, h.source_process, h.timestamp, h.created_at
-            FROM clipboard_history h
+        cur.execute(HISTORY_SELECT + """
             JOIN history_categories hc ON h.id = hc.history_id
             WHERE hc.category_id = ?
             ORDER BY h.created_at DESC 
             LIMIT ?
         """, (category_id, limit))
-        result = cur.fetchall()
+        result = [self._decode_history_row(row) for row in cur.fetchall()]
         cur.close()
         return result
 
@@ -209,18 +328,106 @@ class ClipboardRepository:
         """Check if masked text exists in history"""
         conn = self.db.connect()
         cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) FROM clipboard_history WHERE masked_text = ?", (masked_text,))
-        count = cur.fetchone()[0]
+        masked_hash = text_hash(masked_text)
+        cur.execute("SELECT 1 FROM clipboard_contents WHERE masked_hash = ? LIMIT 1", (masked_hash,))
+        found = cur.fetchone() is not None
+        if not found:
+            # Entries stored before deduplication keep their text in clipboard_history
+            cur.execute("SELECT 1 FROM clipboard_history WHERE content_id IS NULL AND masked_text = ? LIMIT 1",
+                        (masked_text,))
+            found = cur.fetchone() is not None
         cur.close()
-        return count > 0
+        return found
 
     def get_original_text(self, masked_text):
         """Get original text for a masked text"""
         conn = self.db.connect()
         cur = conn.cursor()
-        cur.execute("SELECT original_text FROM clipboard_history WHERE masked_text = ? LIMIT 1", (masked_text,))
+        masked_hash = text_hash(masked_text)
+        cur.execute("""
+            SELECT original_text, original_blob FROM clipboard_contents
+            WHERE masked_hash = ?
+            ORDER BY id DESC
+            LIMIT 1
+        """, (masked_hash,))
         result = cur.fetchone()
+        if result is None:
+            cur.execute("""
+                SELECT original_text, NULL FROM clipboard_history
+                WHERE content_id IS NULL AND masked_text = ?
+                LIMIT 1
+            """, (masked_text,))
+            result = cur.fetchone()
+        cur.close()
+        return decode_text(result[0], result[1]) if result else None
+
+    # Retention and compaction
+    def get_history_size(self):
+        """Return (history entry count, total stored payload bytes including shared contents)"""
+        conn = self.db.connect()
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT COUNT(*), COALESCE(SUM(length(CAST(original_text AS BLOB)) + length(CAST(masked_text AS BLOB))), 0)
+            FROM clipboard_history
+        """)
+        rows, history_bytes = cur.fetchone()
+        cur.execute("SELECT COALESCE(SUM(payload_bytes), 0) FROM clipboard_contents")
+        content_bytes = cur.fetchone()[0]
+        cur.close()
+        return rows, history_bytes + content_bytes
+
+    def delete_oldest_history(self, batch_size, older_than_days=None):
+        """
+        Delete up to batch_size of the oldest entries (optionally only those older than
+        older_than_days) in one short transaction. Mask mappings cascade and
+        contents no longer referenced by any entry are removed as well.
+        Returns the number of deleted rows.
+        """
+        conn = self.db.connect()
+        cur = conn.cursor()
+        if older_than_days is None:
+            cur.execute("""
+                DELETE FROM clipboard_history WHERE id IN (
+                    SELECT id FROM clipboard_history ORDER BY id LIMIT ?
+                )
+            """, (batch_size,))
+        else:
+            cur.execute("""
+                DELETE FROM clipboard_history WHERE id IN (
+                    SELECT id FROM clipboard_history
+                    WHERE created_at < datetime('now', ?)
+                    ORDER BY id LIMIT ?
+                )
+            """, (f"-{int(older_than_days)} days", batch_size))
+        deleted = cur.rowcount
+        if deleted:
+            cur.execute("""
+                DELETE FROM clipboard_contents
+                WHERE NOT EXISTS (SELECT 1 FROM clipboard_history h WHERE h.content_id = clipboard_contents.id)
+            """)
+        conn.commit()
+        cur.close()
+        return deleted
+
+    def enable_incremental_vacuum(self):
+        """
+        Switch an existing database to incremental auto-vacuum (one-time full VACUUM).
+        Maintenance action for startup only: the VACUUM locks the whole database while it runs.
+        """
+        conn = self.db.connect()
+        cur = conn.cursor()
+        cur.execute("PRAGMA auto_vacuum")
+        if cur.fetchone()[0] != 2:  # 2 = INCREMENTAL
+            cur.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            cur.execute("VACUUM")
+        cur.close()
+
+    def incremental_vacuum(self, pages=1000):
+        """Release up to `pages` free pages back to the file system"""
+        conn = self.db.connect()
+        cur = conn.cursor()
+        cur.execute(f"PRAGMA incremental_vacuum({int(pages)})")
+        cur.fetchall()
         cur.close()
-        return result[0] if result else None
 
     
\ No newline at end of file
@@ -1,9 +1,66 @@
 from src.db.connection import DBConnection
 
+# Tables returned by load_all, in the column order of `SELECT *`
+CONFIG_TABLES = (
+    "ai_processing_types",
+    "trusted_programs",
+    "code_protection_types",
+    "custom_regex_patterns",
+    "spacy_models",
+    "custom_terms",
+    "tree_sitter_languages",
+)
+
 class ConfigRepository:
     def __init__(self):
         self.db = DBConnection()
 
+    def _bulk_insert(self, table, columns, rows, conflict_column=None, update_columns=()):
+        """
+        Insert many rows with one executemany in a single transaction.
+        With conflict_column, existing rows are kept (ON CONFLICT DO NOTHING) unless
+        update_columns are given, in which case those columns are overwritten.
+        Returns the number of rows passed in.
+        """
+        rows = list(rows)
+        if not rows:
+            return 0
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+        if conflict_column:
+            if update_columns:
+                assignments = ', '.join(f"{c} = excluded.{c}" for c in update_columns)
+                sql += f" ON CONFLICT({conflict_column}) DO UPDATE SET {assignments}"
+            else:
+                sql += f" ON CONFLICT({conflict_column}) DO NOTHING"
+        conn = self.db.connect()
+        with conn:  # One transaction, committed once (rolled back on error)
+            conn.executemany(sql, rows)
+        return len(rows)
+
+    def load_all(self):
+        """
+        Read the settings row and every config table in one read transaction.
+        Returns a dict with 'settings' (tuple or None) and one list of rows per table in CONFIG_TABLES.
+        """
+        conn = self.db.connect()
+        cur = conn.cursor()
+        result = {}
+        # A transaction the caller already has open gives the same consistent view; it is left to the caller
+        own_transaction = not conn.in_transaction
+        try:
+            if own_transaction:
+                cur.execute("BEGIN")  # Consistent view across all tables
+            cur.execute("SELECT * FROM config LIMIT 1")
+            result["settings"] = cur.fetchone()
+            for table in CONFIG_TABLES:
+                cur.execute(f"SELECT * FROM {table}")
+                result[table] = cur.fetchall()
+        finally:
+            if own_transaction and conn.in_transaction:
+                conn.rollback()  # Nothing was written; this only ends the read transaction
+            cur.close()
+        return result
+
     # Settings CRUD
     def get_settings(self):
         conn = self.db.connect()
@@ -57,6 +114,15 @@ class ConfigRepository:
         cur.close()
         return result[0] if result else None
 
+    def add_ai_processing_types(self, rows, overwrite=False):
+        """Bulk upsert of (ai_mask_option, description, short_description, enabled) rows"""
+        return self._bulk_insert(
+            "ai_processing_types",
+            ("ai_mask_option", "ai_mask_option_description", "ai_mask_option_short_description", "enabled"),
+            rows, conflict_column="ai_mask_option",
+            update_columns=("ai_mask_option_description", "ai_mask_option_short_description", "enabled") if overwrite else ()
+        )
+
     def get_ai_processing_types(self):
         conn = self.db.connect()
         cur = conn.cursor()
@@ -97,6 +163,13 @@ class ConfigRepository:
         cur.close()
         return result[0] if result else None
 
+    def add_trusted_programs(self, rows, overwrite=False):
+        """Bulk upsert of (program_name, enabled, deleted) rows; existing flags are kept unless overwrite"""
+        return self._bulk_insert(
+            "trusted_programs", ("program_name", "enabled", "deleted"),
+            rows, conflict_column="program_name", update_columns=("enabled", "deleted") if overwrite else ()
+        )
+
     def get_trusted_programs(self):
         conn = self.db.connect()
         cur = conn.cursor()
@@ -140,6 +213,13 @@ class ConfigRepository:
         cur.close()
         return result[0] if result else None
 
+    def add_code_protection_types(self, rows, overwrite=False):
+        """Bulk upsert of (type_name, enabled) rows"""
+        return self._bulk_insert(
+            "code_protection_types", ("type_name", "enabled"),
+            rows, conflict_column="type_name", update_columns=("enabled",) if overwrite else ()
+        )
+
     def get_code_protection_types(self):
         conn = self.db.connect()
         cur = conn.cursor()
@@ -178,6 +258,14 @@ class ConfigRepository:
         cur.close()
         return result[0] if result else None
 
+    def add_custom_regex_patterns(self, rows, overwrite=False):
+        """Bulk upsert of (regex, replacement, apply_for, first_priority, enabled) rows"""
+        return self._bulk_insert(
+            "custom_regex_patterns", ("regex", "replacement", "apply_for", "first_priority", "enabled"),
+            rows, conflict_column="regex",
+            update_columns=("replacement", "apply_for", "first_priority", "enabled") if overwrite else ()
+        )
+
     def get_custom_regex_patterns(self):
         conn = self.db.connect()
         cur = conn.cursor()
@@ -220,6 +308,14 @@ class ConfigRepository:
         cur.close()
         return result
 
+    def add_spacy_models(self, rows):
+        """Bulk insert of (language, name, path, short_name, description, size, enabled, downloaded) rows"""
+        return self._bulk_insert(
+            "spacy_models",
+            ("model_language", "model_name", "model_path", "model_short_name", "model_description", "model_size", "enabled", "downloaded"),
+            rows
+        )
+
     def get_spacy_models(self):
         conn = self.db.connect()
         cur = conn.cursor()
@@ -283,6 +379,14 @@ class ConfigRepository:
         cur.close()
         return result
 
+    def add_tree_sitter_languages(self, rows):
+        """Bulk insert of (name, library_name, remote_path, local_path, enabled, downloaded) rows"""
+        return self._bulk_insert(
+            "tree_sitter_languages",
+            ("language_name", "language_library_name", "language_remote_path", "language_local_path", "enabled", "downloaded"),
+            rows
+        )
+
     def get_tree_sitter_languages(self):
         conn = self.db.connect()
         cur = conn.cursor()
@@ -1,6 +1,12 @@
 import os
 import sqlite3
 
+# Columns added after the first release: (table, column, declaration).
+# Existing databases get them via ALTER TABLE before schema.sql runs.
+MIGRATION_COLUMNS = [
+    ("clipboard_history", "content_id", "INTEGER REFERENCES clipboard_contents(id)"),
+]
+
 class DBConnection:
     def __init__(self):
         self.conn = None
@@ -22,8 +28,24 @@ class DBConnection:
         schema_path = os.path.join(os.path.dirname(__file__), 'schema.sql')
         with open(schema_path, 'r', encoding='utf-8') as f:
             schema_sql = f.read()
+        self.migrate_schema()
         conn = self.connect()
         cur = conn.cursor()
         cur.executescript(schema_sql)
         conn.commit()
+        cur.close()
+
+    def migrate_schema(self):
+        """Add columns introduced after a database was created"""
+        conn = self.connect()
+        cur = conn.cursor()
+        for table, column, declaration in MIGRATION_COLUMNS:
+            cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+            if cur.fetchone() is None:
+                continue  # Table is created by schema.sql with the column included
+            cur.execute(f"PRAGMA table_info({table})")
+            existing_columns = {row[1] for row in cur.fetchall()}
+            if column not in existing_columns:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+        conn.commit()
         cur.close() 
\ No newline at end of file
@@ -76,9 +76,9 @@ def initialize_database():
     print("Initializing database schema...")
     db.initialize_schema()
     
-    # Check if settings table has any data
-    config = config_repo.get_config()
-    if config is None:
+    # Read every config table at once to see which ones still need defaults
+    existing = config_repo.load_all()
+    if existing["settings"] is None:
         print("Inserting default settings...")
         # Insert default settings
         conn = db.connect()
@@ -100,46 +100,41 @@ def initialize_database():
         conn.commit()
         cur.close()
 
-    # AI Processing Types
-    if not config_repo.get_ai_processing_types():
+    # Default rows are written with one bulk statement per table
+    if not existing["ai_processing_types"]:
         print("Inserting AI processing types...")
-        for ai_mask_option, desc, short_desc, enabled in DEFAULT_AI_PROCESSING_TYPES:
-            config_repo.add_ai_processing_type(ai_mask_option, desc, short_desc, enabled)
+        config_repo.add_ai_processing_types(DEFAULT_AI_PROCESSING_TYPES)
 
-    # Trusted Programs
-    if not config_repo.get_trusted_programs():
+    if not existing["trusted_programs"]:
         print("Inserting trusted programs...")
-        for program_name, enabled, deleted in DEFAULT_TRUSTED_PROGRAMS:
-            config_repo.add_trusted_program(program_name, enabled, deleted)
+        config_repo.add_trusted_programs(DEFAULT_TRUSTED_PROGRAMS)
 
-    # Code Protection Types
-    if not config_repo.get_code_protection_types():
+    if not existing["code_protection_types"]:
         print("Inserting code protection types...")
-        for type_name, enabled in DEFAULT_CODE_PROTECTION_TYPES:
-            config_repo.add_code_protection_type(type_name, enabled)
+        config_repo.add_code_protection_types(DEFAULT_CODE_PROTECTION_TYPES)
 
-    # Custom Regex Patterns
-    if not config_repo.get_custom_regex_patterns():
+    if not existing["custom_regex_patterns"]:
         print("Inserting custom regex patterns...")
-        for regex, replacement, apply_for, first_priority, enabled in DEFAULT_CUSTOM_REGEX_PATTERNS:
-            config_repo.add_custom_regex_pattern(regex, replacement, apply_for, first_priority, enabled)
+        config_repo.add_custom_regex_patterns(DEFAULT_CUSTOM_REGEX_PATTERNS)
 
-    # SpaCy Models
-    if not config_repo.get_spacy_models():
+    if not existing["spacy_models"]:
         print("Inserting SpaCy models...")
-        for lang, name, path, short_name, desc, size, enabled, downloaded in DEFAULT_SPACY_MODELS:
-            config_repo.add_spacy_model(lang, name, path, short_name, desc, size, enabled, downloaded)
+        config_repo.add_spacy_models(DEFAULT_SPACY_MODELS)
 
-    # Tree Sitter Languages
-    if not config_repo.get_tree_sitter_languages():
+    if not existing["tree_sitter_languages"]:
         print("Inserting Tree Sitter languages...")
-        for lang_name, lib_name, remote_path, local_path, enabled, downloaded in DEFAULT_TREE_SITTER_LANGUAGES:
-            config_repo.add_tree_sitter_language(lang_name, lib_name, remote_path, local_path, enabled, downloaded)
+        config_repo.add_tree_sitter_languages(DEFAULT_TREE_SITTER_LANGUAGES)
 
     # Categories
     if not repo.get_categories():
         print("Inserting default categories...")
-        for category_name in DEFAULT_CATEGORIES:
-            repo.add_category(category_name)
+        repo.add_categories(DEFAULT_CATEGORIES)
+
+    # One-time switch of older databases to incremental auto-vacuum. This rewrites the
+    # whole file, so it runs here, before the clipboard monitor and compactor start.
+    try:
+        repo.enable_incremental_vacuum()
+    except Exception as e:
+        print(f"Could not enable incremental vacuum: {e}")
     
     print("Database initialized successfully with default data.") 
\ No newline at end of file
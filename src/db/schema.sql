@@ -1,3 +1,6 @@
+-- Allow the history compactor to return freed pages with PRAGMA incremental_vacuum
+PRAGMA auto_vacuum = INCREMENTAL;
+
 -- Config table
 CREATE TABLE IF NOT EXISTS config (
     id INTEGER PRIMARY KEY,
@@ -67,16 +70,39 @@ CREATE TABLE IF NOT EXISTS categories (
     name TEXT NOT NULL UNIQUE
 );
 
--- Clipboard history table
+-- Deduplicated clipboard payloads, shared by every history entry with the same content
+CREATE TABLE IF NOT EXISTS clipboard_contents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    content_hash TEXT NOT NULL UNIQUE, -- SHA-256 of original and masked text
+    original_text TEXT NOT NULL,
+    masked_text TEXT NOT NULL,
+    original_blob BLOB, -- compressed original_text for large payloads (original_text is then '')
+    masked_blob BLOB, -- compressed masked_text for large payloads (masked_text is then '')
+    masked_hash TEXT NOT NULL, -- SHA-256 of masked text, used for unmask lookups
+    payload_bytes INTEGER NOT NULL,
+    created_at TEXT DEFAULT (datetime('now'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_clipboard_contents_masked_hash ON clipboard_contents(masked_hash);
+
+-- Clipboard history table (one row per copy; content_id rows keep their text in clipboard_contents)
 CREATE TABLE IF NOT EXISTS clipboard_history (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     original_text TEXT NOT NULL,
     masked_text TEXT NOT NULL,
     source_process TEXT NOT NULL,
     timestamp TEXT NOT NULL,
-    created_at TEXT DEFAULT (datetime('now'))
+    created_at TEXT DEFAULT (datetime('now')),
+    content_id INTEGER REFERENCES clipboard_contents(id) -- NULL for entries stored before deduplication
 );
 
+-- Unmask lookups of entries stored before deduplication (the only rows with text here)
+CREATE INDEX IF NOT EXISTS idx_clipboard_history_legacy_masked_text ON clipboard_history(masked_text)
+    WHERE content_id IS NULL;
+CREATE INDEX IF NOT EXISTS idx_clipboard_history_content_id ON clipboard_history(content_id);
+-- Keyset pagination of history pages (newest first)
+CREATE INDEX IF NOT EXISTS idx_clipboard_history_created_at_id ON clipboard_history(created_at, id);
+
 -- Junction table for history-categories many-to-many relationship
 CREATE TABLE IF NOT EXISTS history_categories (
     history_id INTEGER,
@@ -97,6 +123,19 @@ CREATE TABLE IF NOT EXISTS mask_mappings (
     FOREIGN KEY (history_id) REFERENCES clipboard_history(id) ON DELETE CASCADE
 );
 
+-- Mask mappings of deduplicated contents, shared by all of their history entries
+CREATE TABLE IF NOT EXISTS content_mask_mappings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    content_id INTEGER NOT NULL,
+    original_text TEXT NOT NULL,
+    masked_text TEXT NOT NULL,
+    mask_type TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    FOREIGN KEY (content_id) REFERENCES clipboard_contents(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_content_mask_mappings_content_id ON content_mask_mappings(content_id);
+
 -- Spacy models table
 CREATE TABLE IF NOT EXISTS spacy_models (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -0,0 +1,48 @@
+import hashlib
+import zlib
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+# One-byte header identifying how a stored payload is encoded
+ZLIB_HEADER = b'z'
+ZSTD_HEADER = b's'
+
+# Payloads smaller than this are stored as plain TEXT
+DEFAULT_COMPRESS_MIN_BYTES = 4096
+
+
+def text_hash(text: str) -> str:
+    """Return the hex SHA-256 of a text, used to look up compressed payloads"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def encode_text(text: str, min_bytes: int = DEFAULT_COMPRESS_MIN_BYTES):
+    """
+    Encode a payload for storage.
+    Returns (plain_text, blob): large payloads are compressed into blob and
+    plain_text is empty, small payloads are kept as plain text with no blob.
+    """
+    raw = text.encode('utf-8')
+    if len(raw) < min_bytes:
+        return text, None
+    if ZSTD_AVAILABLE:
+        return "", ZSTD_HEADER + zstandard.ZstdCompressor(level=6).compress(raw)
+    return "", ZLIB_HEADER + zlib.compress(raw, 6)
+
+
+def decode_text(plain_text, blob) -> str:
+    """Inverse of encode_text; rows without a blob return their plain text"""
+    if blob is None:
+        return plain_text if plain_text is not None else ""
+    blob = bytes(blob)
+    header, payload = blob[:1], blob[1:]
+    if header == ZSTD_HEADER:
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("zstandard is required to read this history entry")
+        return zstandard.ZstdDecompressor().decompress(payload).decode('utf-8')
+    return zlib.decompress(payload).decode('utf-8')
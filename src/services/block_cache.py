@@ -0,0 +1,53 @@
+import hashlib
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class BlockCache:
+    """
+    Bounded LRU cache for per-block analysis results.
+    Entries are keyed by the processing stage, the hash of the block content and
+    an optional signature describing the settings the result depends on.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def hash_block(block_text: str) -> str:
+        """Return a stable content hash for a block"""
+        return hashlib.sha1(block_text.encode('utf-8')).hexdigest()
+
+    def get(self, stage: str, block_hash: str, signature: Hashable = None) -> Optional[Any]:
+        """Return the cached result for a block or None if it is not cached"""
+        key = (stage, block_hash, signature)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, stage: str, block_hash: str, value: Any, signature: Hashable = None):
+        """Store a result for a block, evicting the least recently used entries"""
+        key = (stage, block_hash, signature)
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all cached results"""
+        self._entries.clear()
+
+    def get_statistics(self) -> dict:
+        """Return cache size and hit/miss counters"""
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses
+        }
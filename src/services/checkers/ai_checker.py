@@ -1,33 +1,88 @@
+import threading
 
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
-
-model_name = "microsoft/codebert-base"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForSequenceClassification.from_pretrained(model_name)
+# Local model directory or Hugging Face cache name; never downloaded (local_files_only)
+DEFAULT_CODEBERT_MODEL = "microsoft/codebert-base"
+# Token limit per block (the classification head was trained on inputs of this length)
+MAX_SEQUENCE_LENGTH = 256
 
 
 class AIChecker:
-    def __init__(self):
-        pass
+    """
+    CodeBERT CODE/TEXT classifier backend with the CodeClassifier interface
+    (is_code, predict, predict_with_confidence, predict_batch).
+    torch and transformers are imported and the model is loaded on first use, from local
+    files only, so constructing or importing the checker costs nothing until it classifies.
+    """
+
+    def __init__(self, model_path: str = DEFAULT_CODEBERT_MODEL, batch_size: int = 8):
+        self.model_path = model_path
+        self.batch_size = max(1, batch_size)
+        self.model_version = f"codebert:{model_path}"
+        self.tokenizer = None
+        self.model = None
+        self._torch = None
+        self._load_lock = threading.Lock()
+        self._inference_lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self.model is not None:
+            return
+        with self._load_lock:
+            if self.model is not None:
+                return
+            import torch
+            from transformers import AutoTokenizer, AutoModelForSequenceClassification
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_path, local_files_only=True)
+            model = AutoModelForSequenceClassification.from_pretrained(self.model_path, local_files_only=True)
+            model.eval()
+            self._torch = torch
+            self.model = model
+            print(f"Successfully loaded CodeBERT model from: {self.model_path}")
+
+    def is_loaded(self) -> bool:
+        return self.model is not None
+
+    def is_code(self, text: str) -> bool:
+        return self.predict_with_confidence(text)["is_code"]
+
+    def predict(self, text: str) -> bool:
+        return self.predict_with_confidence(text)["is_code"]
 
     def is_code_block(self, text):
-        inputs = tokenizer(text, return_tensors="pt", truncation=True)
-        with torch.no_grad():
-            logits = model(**inputs).logits
-            prediction = torch.argmax(logits, dim=-1).item()
-        return prediction == 1  # 1 = code, 0 = text
+        return self.is_code(text)
+
+    def predict_with_confidence(self, text: str) -> dict:
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts: list) -> list:
+        """Predict several blocks, running them through the model in batches of at most batch_size"""
+        self._ensure_loaded()
+        torch = self._torch
+        results = []
+        with self._inference_lock, torch.inference_mode():
+            for start in range(0, len(texts), self.batch_size):
+                inputs = self.tokenizer(texts[start:start + self.batch_size], return_tensors="pt", padding=True,
+                                        truncation=True, max_length=MAX_SEQUENCE_LENGTH)
+                probabilities = torch.softmax(self.model(**inputs).logits, dim=-1)
+                predicted = torch.argmax(probabilities, dim=-1).tolist()
+                for row, label in enumerate(predicted):
+                    results.append({
+                        "prediction": "CODE" if label == 1 else "TEXT",  # 1 = code, 0 = text
+                        "confidence": probabilities[row][label].item(),
+                        "is_code": label == 1
+                    })
+        return results
 
     def extract_code_blocks(self, content):
         blocks = [block.strip() for block in content.split("\n\n") if block.strip()]
         print(f"found {len(blocks)} blocks................")
-        code_blocks = [block for block in blocks if self.is_code_block(block)]
+        code_blocks = [block for block, result in zip(blocks, self.predict_batch(blocks)) if result["is_code"]]
         print(f"code blocks: {code_blocks}")
         return code_blocks
-    
+
     def print_code_blocks(self, content):
         print(f"starting to check for code blocks................")
         code_blocks = self.extract_code_blocks(content)
         print(f"found {len(code_blocks)} code blocks................")
         for i, block in enumerate(code_blocks):
-            print(f"\n--- Code Block {i+1} ---\n{block}")
\ No newline at end of file
+            print(f"\n--- Code Block {i+1} ---\n{block}")
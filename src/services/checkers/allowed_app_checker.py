@@ -21,28 +21,25 @@ class AllowedAppChecker:
         if last_dot != -1:
             program_name = program_name[:last_dot]
         
+        # Read one config version for the whole check
+        snapshot = self.config.get_snapshot()
+        
         if program_name == "":
-            if getattr(self.config, 'debugMode', False):
+            if snapshot.debugMode:
                 print("Program name is empty")
             return True  # Allow empty program names
         
-        if self.config.debugMode:
+        if snapshot.debugMode:
             print(f"Extracted program_name: '{program_name}' from window_title: '{window_title}'")
         
         # Check if program is in trusted list
-        trusted_programs = getattr(self.config, 'trustedPrograms', [])
-        
-        # Sort by name length (longest first) to prioritize exact/longer matches
-        sorted_trusted_programs = sorted(trusted_programs, 
-                                       key=lambda x: len(x.get('programName', '')), 
-                                       reverse=True)
-        
-        for trusted_program in sorted_trusted_programs:
-            trusted_name = trusted_program.get('programName', '')
-            if program_name.lower() in trusted_name.lower() or trusted_name.lower() in program_name.lower():
+        # (pre-sorted by name length, longest first, and lowercased in the snapshot)
+        program_name = program_name.lower()
+        for trusted_name, trusted_program in snapshot.sorted_trusted_programs:
+            if program_name in trusted_name or trusted_name in program_name:
                 if trusted_program.get('deleted', True):
                     return False  # Program is deleted, not trusted
-                if self.config.debugMode:
+                if snapshot.debugMode:
                     print(f"Program is trusted: {trusted_program.get('enabled')} - {trusted_program.get('programName')}")
                 return trusted_program.get('enabled', True)  # Return enabled status
         return False  # Program not found in trusted list, not trusted
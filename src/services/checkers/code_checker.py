@@ -1,24 +1,51 @@
+import os
 import re
-from src.services.code_classifier.model_predictor import CodeClassifier
+from src.services.code_classifier.long_blocks import LONG_BLOCK_CHARS, sample_windows
+from src.services.code_classifier.cascade import CodeClassifierCascade
 from src.services.checkers.manual_code_checker import ManualCodeChecker
+from src.services.checkers.ai_checker import AIChecker, DEFAULT_CODEBERT_MODEL
 
 class CodeChecker:
-    def __init__(self):
+    def __init__(self, config=None):
         self.code_classifier = None
+        self.classifier_cascade = None
         self.manual_code_checker = ManualCodeChecker()
         self.model_available = False
         self._setup_language_patterns()
         
         # Try to initialize the model classifier
         try:
-            self.code_classifier = CodeClassifier()
+            backend = getattr(config, 'code_classifier_backend', 'distilbert')
+            if backend == 'codebert':
+                # Loaded on first use; a load failure then falls back to the manual checker
+                self.code_classifier = AIChecker(model_path=getattr(config, 'codebert_model_path', DEFAULT_CODEBERT_MODEL),
+                                                 batch_size=getattr(config, 'classifier_batch_size', 8))
+            else:
+                # Imported here so torch/transformers load only when this backend is chosen
+                from src.services.code_classifier.model_predictor import CodeClassifier
+                self.code_classifier = CodeClassifier(**self._classifier_options(config))
+            # Heuristics decide the obvious blocks; only ambiguous ones reach the transformer
+            self.classifier_cascade = CodeClassifierCascade(self.manual_code_checker, self.code_classifier)
             self.model_available = True
-            print("✅ Code classifier model loaded successfully")
+            print(f"✅ Code classifier model ({backend}) ready")
         except Exception as e:
             print(f"⚠️ Failed to load code classifier model: {e}")
             print("🔄 Falling back to manual code checker")
             self.model_available = False
 
+    @staticmethod
+    def _classifier_options(config) -> dict:
+        """CodeClassifier thread, batch and warm-up settings from the config"""
+        intra_op_threads = getattr(config, 'classifier_intra_op_threads', 0)
+        if not intra_op_threads:
+            intra_op_threads = max(1, min(4, (os.cpu_count() or 2) // 2))
+        return {
+            "intra_op_threads": intra_op_threads,
+            "inter_op_threads": getattr(config, 'classifier_inter_op_threads', 1),
+            "batch_size": getattr(config, 'classifier_batch_size', 8),
+            "warmup": getattr(config, 'classifier_warmup', True)
+        }
+
     def _setup_language_patterns(self):
         """Setup language-specific patterns for accurate code parsing"""
         self.language_patterns = {
@@ -166,10 +193,60 @@ class CodeChecker:
         else:
             return 'python'  # Default fallback
 
+    def classification_signature(self) -> tuple:
+        """
+        Identifies what currently decides predictions: the model (or the manual fallback)
+        and the cascade thresholds. Cached classifications are only valid for one signature.
+        """
+        if not (self.model_available and self.classifier_cascade):
+            return ("manual",)
+        return (getattr(self.code_classifier, 'model_version', type(self.code_classifier).__name__),
+                self.classifier_cascade.text_threshold, self.classifier_cascade.code_threshold)
+
+    def predict_with_confidence(self, text: str) -> dict:
+        """Classify a block as CODE or TEXT with the cascade, or with heuristics alone if the model is unavailable"""
+        if self.model_available and self.classifier_cascade:
+            try:
+                return self.classifier_cascade.predict_with_confidence(text)
+            except Exception as e:
+                self._disable_model(e)
+        return self._manual_predict(text)
+
+    def predict_batch(self, texts: list) -> list:
+        """predict_with_confidence for several blocks, batching the model calls"""
+        if self.model_available and self.classifier_cascade:
+            try:
+                return self.classifier_cascade.predict_batch(texts)
+            except Exception as e:
+                self._disable_model(e)
+        return [self._manual_predict(text) for text in texts]
+
+    def _disable_model(self, error: Exception):
+        """A lazily loaded backend failed (e.g. model files missing): use the manual checker from now on"""
+        print(f"⚠️ Code classifier model failed: {error}")
+        print("🔄 Falling back to manual code checker")
+        self.model_available = False
+
+    def _manual_predict(self, text: str) -> dict:
+        """Heuristic prediction; long blocks are judged by their sampled windows like in the model"""
+        if len(text) <= LONG_BLOCK_CHARS:
+            return self.manual_code_checker.predict_with_confidence(text)
+        predictions = [self.manual_code_checker.predict_with_confidence(window)
+                       for window in sample_windows(text)]
+        code_votes = sum(p["is_code"] for p in predictions)
+        is_code = code_votes * 2 > len(predictions)
+        return {
+            "prediction": "CODE" if is_code else "TEXT",
+            "confidence": min(p["confidence"] for p in predictions if p["is_code"] == is_code),
+            "is_code": is_code,
+            "windows": len(predictions),
+            "mixed": 0 < code_votes < len(predictions)
+        }
+
     def contains_code(self, text: str) -> bool:
         """Check if text contains code patterns"""
-        if self.model_available and self.code_classifier:
-            return self.code_classifier.predict(text)
+        if self.model_available and self.classifier_cascade:
+            return self.classifier_cascade.predict_with_confidence(text)["is_code"]
         else:
             return self.manual_code_checker.contains_code(text)
 
@@ -178,7 +255,7 @@ class CodeChecker:
         if self.model_available and self.code_classifier:
             code_blocks = []
             for i, block in enumerate(text.split("\n\n")):
-                prediction = self.code_classifier.predict_with_confidence(block)
+                prediction = self.classifier_cascade.predict_with_confidence(block)
                 print(f"prediction: {prediction}")
                 if prediction["is_code"]:
                     code_blocks.append({"start": i, "end": i+len(block), "text": block})
@@ -0,0 +1,164 @@
+from typing import Dict, List, Tuple
+
+
+class CustomTermMatcher:
+    """
+    Case-insensitive multi-word matcher for custom terms (Aho-Corasick automaton).
+    The text is scanned once regardless of the number of terms, with runs of whitespace
+    treated as a single space, and matches are reported only on word boundaries.
+    Terms can be added and removed without re-inserting the others; only the failure
+    links are recomputed (lazily, on the next match) after a change.
+    Does not depend on spaCy, so it also works when AI masking is off.
+    """
+
+    def __init__(self, terms: Dict[str, str] = None):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output_link: List[int] = [0]  # Nearest node on the failure chain that ends a term
+        self._term_at: List[str] = [None]  # Normalized term ending at each node
+        self._replacements: Dict[str, str] = {}
+        self._dirty = False
+        if terms:
+            self.update_terms(terms)
+
+    @staticmethod
+    def normalize_term(term: str) -> str:
+        return " ".join(term.lower().split())
+
+    def update_terms(self, terms: Dict[str, str]) -> bool:
+        """
+        Make the matcher hold exactly the given {term: replacement} map.
+        Only added, removed or changed terms are touched. Returns True if anything changed.
+        """
+        wanted = {}
+        for term, replacement in terms.items():
+            key = self.normalize_term(term or "")
+            if key:
+                wanted[key] = replacement
+
+        changed = False
+        for key in [k for k in self._replacements if k not in wanted]:
+            self.remove_term(key)
+            changed = True
+        for key, replacement in wanted.items():
+            if self._replacements.get(key) != replacement:
+                self.add_term(key, replacement)
+                changed = True
+        return changed
+
+    def add_term(self, term: str, replacement: str):
+        key = self.normalize_term(term)
+        if not key:
+            return
+        node = 0
+        for char in key:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output_link.append(0)
+                self._term_at.append(None)
+            node = next_node
+        self._term_at[node] = key
+        self._replacements[key] = replacement
+        self._dirty = True
+
+    def remove_term(self, term: str):
+        key = self.normalize_term(term)
+        if key not in self._replacements:
+            return
+        node = 0
+        for char in key:
+            node = self._goto[node][char]
+        self._term_at[node] = None  # Trie nodes are kept; they are reused if the term comes back
+        del self._replacements[key]
+        self._dirty = True
+
+    def __len__(self) -> int:
+        return len(self._replacements)
+
+    def find_matches(self, text: str) -> List[Tuple[int, int, str]]:
+        """
+        Return (start, end, replacement) for every term occurrence in text,
+        leftmost-longest and non-overlapping, with offsets into the original text.
+        """
+        if not self._replacements or not text:
+            return []
+        if self._dirty:
+            self._build_links()
+
+        normalized, offsets = self._normalize_text(text)
+        matches = []
+        goto, fail, output_link, term_at = self._goto, self._fail, self._output_link, self._term_at
+        state = 0
+        for position, char in enumerate(normalized):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            node = state if term_at[state] is not None else output_link[state]
+            while node:
+                term = term_at[node]
+                start = position - len(term) + 1
+                if self._is_boundary(normalized, start, position + 1):
+                    matches.append((start, position + 1, term))
+                node = output_link[node]
+
+        # Leftmost first, longest on equal starts; drop overlaps
+        matches.sort(key=lambda m: (m[0], -(m[1] - m[0])))
+        result = []
+        last_end = 0
+        for start, end, term in matches:
+            if start >= last_end:
+                result.append((offsets[start], offsets[end - 1] + 1, self._replacements[term]))
+                last_end = end
+        return result
+
+    def _build_links(self):
+        """Recompute failure and output links breadth-first over the trie"""
+        self._fail = [0] * len(self._goto)
+        self._output_link = [0] * len(self._goto)
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                failed = self._fail[child]
+                self._output_link[child] = failed if self._term_at[failed] is not None else self._output_link[failed]
+                queue.append(child)
+        self._dirty = False
+
+    @staticmethod
+    def _normalize_text(text: str):
+        """Lowercase and collapse whitespace runs; returns the text and each character's original offset"""
+        chars = []
+        offsets = []
+        previous_space = False
+        for index, char in enumerate(text):
+            if char.isspace():
+                if previous_space:
+                    continue
+                previous_space = True
+                chars.append(" ")
+            else:
+                previous_space = False
+                lowered = char.lower()
+                # Keep offsets aligned when lowercasing expands a character
+                chars.append(lowered if len(lowered) == 1 else char)
+            offsets.append(index)
+        return "".join(chars), offsets
+
+    @staticmethod
+    def _is_boundary(text: str, start: int, end: int) -> bool:
+        if start > 0 and text[start - 1].isalnum() and text[start].isalnum():
+            return False
+        if end < len(text) and text[end].isalnum() and text[end - 1].isalnum():
+            return False
+        return True
@@ -4,14 +4,15 @@ class EmailChecker:
     def __init__(self):
         # Email regex pattern
         self.email_pattern = r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+"
+        self.email_regex = re.compile(self.email_pattern)
 
     def contains_email(self, text: str) -> bool:
         """Check if text contains email addresses"""
-        return bool(re.search(self.email_pattern, text))
+        return bool(self.email_regex.search(text))
 
     def find_emails(self, text: str) -> list:
         """Find all email addresses in text"""
-        return re.findall(self.email_pattern, text)
+        return self.email_regex.findall(text)
 
     def mask_email(self, email: str, mask_type: int, defined_text: str = "") -> str:
         """
@@ -1,6 +1,14 @@
 import re
+import math
 from typing import Dict, List, Any
 
+# Common English function words; their share of a block's words is the main prose signal
+PROSE_WORDS = frozenset({
+    'the', 'and', 'but', 'in', 'on', 'at', 'to', 'of', 'with', 'by', 'about', 'like', 'is', 'are', 'was',
+    'were', 'be', 'been', 'being', 'a', 'an', 'that', 'this', 'it', 'i', 'you', 'he', 'she', 'we', 'they',
+    'my', 'your', 'have', 'has', 'had', 'will', 'would', 'can', 'could', 'should', 'there', 'what', 'which'
+})
+
 class ManualCodeChecker:
     """
     Manual code checker that uses heuristics and pattern matching
@@ -168,6 +176,16 @@ class ManualCodeChecker:
             r'\b\d+\.?\d*\b',  # Numbers
             r'\b[a-zA-Z_]\w*\s*[=\(]',  # Variable assignments or function calls
         ]
+        self._compiled_indicators = [re.compile(pattern, re.MULTILINE | re.DOTALL) for pattern in self.code_indicators]
+        
+        # Line-level signals used by code_score
+        self._code_line_pattern = re.compile(
+            r'[;{}]\s*$|[:,(\[]\s*$|^\s*[}\])]'
+            r'|^\s*(def|class|function|return|import|from|#include|public|private|protected|if|elif|else|for|while'
+            r'|var|let|const|func|package|using|try|catch|except)\b'
+            r'|^\s*[\w.\[\]]+\s*[-+*/]?=\s*\S'
+        )
+        self._word_pattern = re.compile(r'[A-Za-z]+')
     
     def detect_language(self, text: str) -> str:
         """Detect programming language from code text using heuristics"""
@@ -194,17 +212,40 @@ class ManualCodeChecker:
     def contains_code(self, text: str) -> bool:
         """Check if text contains code patterns using heuristics"""
         # Count how many code indicators are present
-        indicator_count = 0
+        indicator_count = self._count_indicators(text)
         total_indicators = len(self.code_indicators)
         
-        for pattern in self.code_indicators:
-            if re.search(pattern, text, re.MULTILINE | re.DOTALL):
-                indicator_count += 1
-        
         # If more than 30% of indicators are present, consider it code
         threshold = 0.3
         return (indicator_count / total_indicators) >= threshold
     
+    def _count_indicators(self, text: str) -> int:
+        return sum(1 for pattern in self._compiled_indicators if pattern.search(text))
+    
+    def code_score(self, text: str) -> float:
+        """
+        Fast 0..1 estimate of how code-like a block is, from the code indicators,
+        the share of code-shaped lines, symbol density and the share of prose words.
+        Used as the first stage of the classifier cascade.
+        """
+        stripped = text.strip()
+        if not stripped:
+            return 0.0
+        
+        indicator_fraction = self._count_indicators(stripped) / len(self.code_indicators)
+        
+        lines = [line for line in stripped.splitlines() if line.strip()]
+        code_lines = sum(1 for line in lines if self._code_line_pattern.search(line))
+        code_line_ratio = code_lines / len(lines)
+        
+        words = self._word_pattern.findall(stripped)
+        prose_ratio = sum(1 for word in words if word.lower() in PROSE_WORDS) / len(words) if words else 0.0
+        
+        symbol_density = sum(1 for char in stripped if char in '{}();=[]<>') / len(stripped)
+        
+        z = -3.0 + 4.0 * indicator_fraction + 3.0 * code_line_ratio + 12.0 * symbol_density - 8.0 * prose_ratio
+        return 1.0 / (1.0 + math.exp(-z))
+    
     def get_code_blocks(self, text: str) -> List[Dict[str, Any]]:
         """Get code blocks from text using heuristics"""
         code_blocks = []
@@ -365,13 +406,9 @@ class ManualCodeChecker:
     
     def predict_with_confidence(self, text: str) -> Dict[str, Any]:
         """Predict with confidence scores using heuristics"""
-        is_code = self.contains_code(text)
-        
         # Calculate a confidence score based on the number of code indicators found
-        indicator_count = 0
-        for pattern in self.code_indicators:
-            if re.search(pattern, text, re.MULTILINE | re.DOTALL):
-                indicator_count += 1
+        indicator_count = self._count_indicators(text)
+        is_code = (indicator_count / len(self.code_indicators)) >= 0.3
         
         # Normalize confidence (0.5 to 1.0 range)
         confidence = min(0.5 + (indicator_count / len(self.code_indicators)) * 0.5, 1.0)
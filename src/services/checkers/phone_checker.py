@@ -2,16 +2,18 @@ import re
 
 class PhoneChecker:
     def __init__(self):
-        # Phone number regex pattern - matches various formats
+        # Phone number regex pattern - matches various formats.
+        # No lookbehind: the continuation of a long digit run must be matched (and masked) too.
         self.phone_pattern = r"\+?\d{1,4}?[-.\s]?\(?\d{1,3}?\)?[-.\s]?\d{1,4}[-.\s]?\d{1,4}[-.\s]?\d{1,9}"
+        self.phone_regex = re.compile(self.phone_pattern)
 
     def contains_phone(self, text: str) -> bool:
         """Check if text contains phone numbers"""
-        return bool(re.search(self.phone_pattern, text))
+        return bool(self.phone_regex.search(text))
 
     def find_phone_numbers(self, text: str) -> list:
         """Find all phone numbers in text"""
-        return re.findall(self.phone_pattern, text)
+        return self.phone_regex.findall(text)
 
     def mask_phone(self, phone: str, mask_type: int, defined_text: str = "") -> str:
         """
@@ -0,0 +1,187 @@
+import re
+import time
+from typing import List, Dict, Any
+
+try:
+    import regex as regex_module
+    REGEX_MODULE_AVAILABLE = True
+except ImportError:
+    regex_module = None
+    REGEX_MODULE_AVAILABLE = False
+
+# Patterns using backreferences or global inline flags cannot be wrapped into a shared alternation
+_BACKREFERENCE_PATTERN = re.compile(r'\\[1-9]|\(\?P=')
+_GLOBAL_FLAGS_PATTERN = re.compile(r'^\(\?[aiLmsux]+\)')
+
+
+class PIIScanner:
+    """
+    Single-pass scanner for email, phone and custom regex detectors.
+    All compatible detectors are compiled into one alternation of named groups,
+    so the text is scanned once and every match is reported as a typed span.
+    When the optional `regex` module is installed each scan is bounded by a
+    hard timeout; with the standard `re` module the deadline is checked between matches,
+    and untrusted (user-supplied) patterns run in the RegexSandbox worker instead.
+    """
+
+    def __init__(self, timeout: float = 0.5, sandbox=None):
+        self.timeout = timeout
+        self.sandbox = sandbox
+        self.detectors: List[Dict[str, Any]] = []
+        self.timed_out = set()  # Detector names that exceeded the timeout in the last scan
+        self._engine = None
+        self._separate_detectors: List[Dict[str, Any]] = []
+        self._sandboxed_detectors: List[Dict[str, Any]] = []
+        self._compiled = False
+
+    def add_detector(self, name: str, span_type: str, pattern: str, data: Any = None, trusted: bool = True) -> bool:
+        """
+        Register a detector. Untrusted patterns can only be bounded by a hard timeout,
+        so they go to the sandbox unless the `regex` module is available.
+        Returns False if the pattern does not compile.
+        """
+        try:
+            compiled = self._compile(pattern)
+        except Exception as e:
+            print(f"Invalid regex pattern for detector {name}: {e}")
+            return False
+
+        self.detectors.append({
+            "name": name,
+            "type": span_type,
+            "pattern": pattern,
+            "compiled": compiled,
+            "data": data,
+            "trusted": trusted,
+            "order": len(self.detectors)
+        })
+        self._compiled = False
+        return True
+
+    def compile(self):
+        """Build the combined engine from all registered detectors"""
+        combinable = []
+        self._separate_detectors = []
+        self._sandboxed_detectors = []
+        self._compiled = True
+        for detector in self.detectors:
+            if not detector["trusted"] and not REGEX_MODULE_AVAILABLE and self.sandbox is not None:
+                self._sandboxed_detectors.append(detector)
+            elif self._is_combinable(detector["pattern"]):
+                combinable.append(detector)
+            else:
+                self._separate_detectors.append(detector)
+
+        self._engine = None
+        if combinable:
+            joined = "|".join(f"(?P<d{d['order']}>{d['pattern']})" for d in combinable)
+            try:
+                self._engine = self._compile(joined)
+            except Exception:
+                # Conflicting group names etc. - scan every detector on its own instead
+                self._separate_detectors.extend(combinable)
+        return self
+
+    def scan(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Scan text once and return non-overlapping spans ordered by position.
+        Each span is a dict with type, detector, start, end, text and data.
+        """
+        self.timed_out = set()
+        if not self.detectors or not text:
+            return []
+        if not self._compiled:
+            self.compile()
+
+        spans = []
+        separate = list(self._separate_detectors)
+        if self._engine is not None:
+            try:
+                for match in self._finditer(self._engine, text):
+                    if match.end() > match.start():
+                        detector = self.detectors[int(match.lastgroup[1:])]
+                        spans.append(self._make_span(detector, match.start(), match.end(), text))
+            except TimeoutError:
+                # Find the slow detector(s) by scanning each combined detector individually
+                spans = []
+                separate = [d for d in self.detectors if d not in self._sandboxed_detectors]
+
+        for detector in separate:
+            try:
+                for match in self._finditer(detector["compiled"], text):
+                    if match.end() > match.start():
+                        spans.append(self._make_span(detector, match.start(), match.end(), text))
+            except TimeoutError:
+                self.timed_out.add(detector["name"])
+                print(f"Regex detector {detector['name']} timed out after {self.timeout}s, skipping")
+
+        if self._sandboxed_detectors:
+            results, timed_out = self.sandbox.scan([d["pattern"] for d in self._sandboxed_detectors], text, self.timeout)
+            for detector, matches in zip(self._sandboxed_detectors, results):
+                for start, end in matches:
+                    if end > start:
+                        spans.append(self._make_span(detector, start, end, text))
+            for index in timed_out:
+                self.timed_out.add(self._sandboxed_detectors[index]["name"])
+                print(f"Regex detector {self._sandboxed_detectors[index]['name']} timed out after {self.timeout}s, skipping")
+
+        return self._resolve_overlaps(spans)
+
+    def remove_detector(self, name: str) -> bool:
+        """Unregister a detector; the engine is rebuilt on the next scan. Returns False if there was none"""
+        remaining = [d for d in self.detectors if d["name"] != name]
+        if len(remaining) == len(self.detectors):
+            return False
+        # Orders index self.detectors (combined group names), so they are renumbered
+        for order, detector in enumerate(remaining):
+            detector["order"] = order
+        self.detectors = remaining
+        self._compiled = False
+        return True
+
+    def get_detector(self, name: str):
+        """Return the detector registered under name, or None"""
+        for detector in self.detectors:
+            if detector["name"] == name:
+                return detector
+        return None
+
+    def _compile(self, pattern: str):
+        if REGEX_MODULE_AVAILABLE:
+            return regex_module.compile(pattern, regex_module.VERSION0)
+        return re.compile(pattern)
+
+    def _is_combinable(self, pattern: str) -> bool:
+        return not (_BACKREFERENCE_PATTERN.search(pattern) or _GLOBAL_FLAGS_PATTERN.match(pattern))
+
+    def _finditer(self, compiled, text: str):
+        if REGEX_MODULE_AVAILABLE:
+            yield from compiled.finditer(text, timeout=self.timeout)
+            return
+        deadline = time.monotonic() + self.timeout
+        for match in compiled.finditer(text):
+            yield match
+            if time.monotonic() > deadline:
+                raise TimeoutError()
+
+    def _make_span(self, detector: Dict[str, Any], start: int, end: int, text: str) -> Dict[str, Any]:
+        return {
+            "type": detector["type"],
+            "detector": detector["name"],
+            "order": detector["order"],
+            "start": start,
+            "end": end,
+            "text": text[start:end],
+            "data": detector["data"]
+        }
+
+    def _resolve_overlaps(self, spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Keep the leftmost span; on equal starts the earlier registered detector wins"""
+        spans.sort(key=lambda s: (s["start"], s["order"]))
+        resolved = []
+        last_end = -1
+        for span in spans:
+            if span["start"] >= last_end:
+                resolved.append(span)
+                last_end = span["end"]
+        return resolved
@@ -0,0 +1,229 @@
+import re
+import threading
+import multiprocessing
+from typing import List, Dict, Any, Tuple
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+
+def _regex_worker(conn):
+    """Worker process loop: run each requested pattern over the text and send back match spans"""
+    compiled = {}
+    while True:
+        try:
+            patterns, text = conn.recv()
+        except (EOFError, OSError):
+            return
+        for pattern in patterns:
+            try:
+                if pattern not in compiled:
+                    compiled[pattern] = re.compile(pattern)
+                conn.send([(m.start(), m.end()) for m in compiled[pattern].finditer(text)])
+            except re.error:
+                conn.send([])
+
+
+class RegexSandbox:
+    """
+    Runs untrusted regex scans in a separate worker process.
+    The standard `re` engine cannot be interrupted, so a pattern that misses its
+    deadline is stopped by killing the worker, which is restarted on the next call.
+    """
+
+    def __init__(self):
+        self._process = None
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def scan(self, patterns: List[str], text: str, timeout: float) -> Tuple[List[List[Tuple[int, int]]], List[int]]:
+        """
+        Scan text with every pattern, each bounded by timeout seconds.
+        Returns (spans per pattern, indexes of patterns that timed out).
+        Timed-out patterns get an empty span list.
+        """
+        results: List[List[Tuple[int, int]]] = [[] for _ in patterns]
+        timed_out = []
+        with self._lock:
+            remaining = list(range(len(patterns)))
+            while remaining:
+                self._ensure_worker()
+                self._conn.send(([patterns[i] for i in remaining], text))
+                for position, index in enumerate(remaining):
+                    if self._conn.poll(timeout):
+                        try:
+                            results[index] = self._conn.recv()
+                            continue
+                        except (EOFError, OSError):
+                            pass  # Worker died while scanning, treat like a timeout
+                    # Deadline missed: kill the worker and continue with the patterns after this one
+                    timed_out.append(index)
+                    self._stop_worker()
+                    remaining = remaining[position + 1:]
+                    break
+                else:
+                    remaining = []
+        return results, timed_out
+
+    def close(self):
+        """Stop the worker process"""
+        with self._lock:
+            self._stop_worker()
+
+    def _ensure_worker(self):
+        if self._process is not None and self._process.is_alive():
+            return
+        parent_conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_regex_worker, args=(child_conn,), daemon=True)
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+
+    def _stop_worker(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.join(timeout=1)
+        if self._conn is not None:
+            self._conn.close()
+        self._process = None
+        self._conn = None
+
+
+class RegexGuard:
+    """
+    Save-time validation for user-supplied regex patterns.
+    Patterns are statically analyzed for backtracking-prone constructs and then
+    benchmarked in the sandbox against adversarial inputs derived from the pattern.
+    """
+
+    def __init__(self, sandbox: RegexSandbox = None, time_budget: float = 0.25):
+        self.sandbox = sandbox or RegexSandbox()
+        self.time_budget = time_budget
+
+    def validate_pattern(self, pattern: str) -> Dict[str, Any]:
+        """
+        Validate a pattern before it is saved.
+        Returns a dict with 'valid', 'error' and 'warnings'.
+        """
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            return {"valid": False, "error": f"Invalid regex: {e}", "warnings": []}
+
+        warnings = self.analyze_pattern(pattern)
+        slowest = self.benchmark_pattern(pattern)
+        if slowest is not None:
+            return {
+                "valid": False,
+                "error": f"Pattern is too slow on input like {slowest[:20]!r}... (possible catastrophic backtracking)",
+                "warnings": warnings
+            }
+        return {"valid": True, "error": "", "warnings": warnings}
+
+    def analyze_pattern(self, pattern: str) -> List[str]:
+        """Return warnings for nested unbounded quantifiers and quantified overlapping alternations"""
+        try:
+            parsed = sre_parse.parse(pattern)
+        except Exception:
+            return []
+        warnings = []
+        self._walk(parsed, False, warnings)
+        return warnings
+
+    def benchmark_pattern(self, pattern: str):
+        """Return the first adversarial input that exceeds the time budget, or None"""
+        for text in self.build_adversarial_inputs(pattern):
+            _, timed_out = self.sandbox.scan([pattern], text, self.time_budget)
+            if timed_out:
+                return text
+        return None
+
+    def build_adversarial_inputs(self, pattern: str) -> List[str]:
+        """Repeated runs of characters the pattern accepts, followed by a character that breaks the match"""
+        characters = self._collect_characters(pattern)[:6] or ["a"]
+        inputs = []
+        for char in characters:
+            for suffix in ("\x00", "\n"):
+                inputs.append(char * 28 + suffix)
+                inputs.append(char * 5000 + suffix)
+        for first, second in zip(characters, characters[1:]):
+            inputs.append((first + second) * 14 + "\x00")
+        return inputs
+
+    def _walk(self, parsed, inside_unbounded: bool, warnings: List[str]):
+        for op, av in parsed:
+            if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+                low, high, sub = av
+                unbounded = high == sre_constants.MAXREPEAT
+                if inside_unbounded and high > low:
+                    warnings.append("Nested quantifiers, e.g. (a+)+, can cause catastrophic backtracking")
+                if unbounded and self._has_overlapping_branches(sub):
+                    warnings.append("Quantified alternation with overlapping branches, e.g. (a|aa)*")
+                self._walk(sub, inside_unbounded or unbounded, warnings)
+            elif op == sre_constants.SUBPATTERN:
+                self._walk(av[-1], inside_unbounded, warnings)
+            elif op == sre_constants.BRANCH:
+                for branch in av[1]:
+                    self._walk(branch, inside_unbounded, warnings)
+            elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+                self._walk(av[1], inside_unbounded, warnings)
+
+    def _has_overlapping_branches(self, parsed) -> bool:
+        for op, av in parsed:
+            if op == sre_constants.SUBPATTERN:
+                return self._has_overlapping_branches(av[-1])
+            if op == sre_constants.BRANCH:
+                firsts = [self._first_literal(branch) for branch in av[1]]
+                known = [f for f in firsts if f is not None]
+                return len(known) != len(set(known)) or None in firsts
+        return False
+
+    def _first_literal(self, parsed):
+        for op, av in parsed:
+            if op == sre_constants.LITERAL:
+                return av
+            return None
+        return None
+
+    def _collect_characters(self, pattern: str) -> List[str]:
+        """Characters accepted by the pattern's atoms, most specific first"""
+        try:
+            parsed = sre_parse.parse(pattern)
+        except Exception:
+            return []
+        found = []
+        self._collect(parsed, found)
+        return list(dict.fromkeys(found))
+
+    def _collect(self, parsed, found: List[str]):
+        category_samples = {
+            sre_constants.CATEGORY_DIGIT: "1",
+            sre_constants.CATEGORY_WORD: "a",
+            sre_constants.CATEGORY_SPACE: " ",
+            sre_constants.CATEGORY_NOT_DIGIT: "a",
+            sre_constants.CATEGORY_NOT_WORD: " ",
+            sre_constants.CATEGORY_NOT_SPACE: "a",
+        }
+        for op, av in parsed:
+            if op == sre_constants.LITERAL:
+                found.append(chr(av))
+            elif op == sre_constants.ANY:
+                found.append("a")
+            elif op == sre_constants.IN:
+                for item_op, item_av in av:
+                    if item_op == sre_constants.LITERAL:
+                        found.append(chr(item_av))
+                    elif item_op == sre_constants.RANGE:
+                        found.append(chr(item_av[0]))
+                    elif item_op == sre_constants.CATEGORY and item_av in category_samples:
+                        found.append(category_samples[item_av])
+            elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+                self._collect(av[2], found)
+            elif op == sre_constants.SUBPATTERN:
+                self._collect(av[-1], found)
+            elif op == sre_constants.BRANCH:
+                for branch in av[1]:
+                    self._collect(branch, found)
@@ -2,7 +2,11 @@
 import sys
 import os
 import traceback
+import time
+import threading
 import importlib.util
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from src.services.checkers.spacy_model_index import SpacyModelIndex
 
 try:
     import spacy
@@ -13,13 +17,24 @@ except ImportError:
     print("spaCy not available - AI features will be disabled")
 
 class SpacyChecker:
-    def __init__(self):
+    def __init__(self, load_default_model=True):
         self.nlp = None
         self.nlp_models = {}
         self.custom_terms = {}
+        # Bumped whenever loaded models change so cached results can be invalidated
+        self.version = 0
+        # Installed pipelines from package metadata, cached on disk
+        self.model_index = SpacyModelIndex()
+        # Ensemble of nlp_models: merge policy, latency budget and per-model latency estimates
+        self.ensemble_policy = "union"
+        self.latency_budget = None
+        self._model_latency = {}
+        self._model_locks = {}  # One lock per model so a pipeline never runs two texts at once
+        self._ensemble_lock = threading.Lock()
+        self._executor = None
         
         # Try to load default model if spaCy is available
-        if SPACY_AVAILABLE:
+        if SPACY_AVAILABLE and load_default_model:
             try:
                 self.nlp = spacy.load("en_core_web_sm")
                 print("Successfully loaded spaCy model: en_core_web_sm")
@@ -34,10 +49,7 @@ class SpacyChecker:
         if not SPACY_AVAILABLE:
             return False
         try:
-            import spacy.cli
-            info = spacy.cli.info()
-            pipelines = set((info or {}).get("pipelines", {}).keys())
-            return model_name in pipelines
+            return self.model_index.is_installed(model_name)
         except Exception:
             # Fallback: attempt to import package
             try:
@@ -47,6 +59,12 @@ class SpacyChecker:
                 return False
 
     def download_spacy_model(self, model_name):
+        downloaded = self._download_spacy_model(model_name)
+        if downloaded:
+            self.model_index.refresh()
+        return downloaded
+
+    def _download_spacy_model(self, model_name):
         if not SPACY_AVAILABLE:
             print("SpaCy is not available. Cannot download model.")
             return False
@@ -130,6 +148,7 @@ class SpacyChecker:
             result = subprocess.run([sys.executable, "-m", "pip", "uninstall", "-y", model_name], capture_output=True, text=True)
             if result.returncode == 0:
                 print(f"Uninstalled spaCy model: {model_name}")
+                self.model_index.refresh()
                 return True
             print("pip uninstall failed.")
             print(f"stdout: {result.stdout}")
@@ -147,6 +166,7 @@ class SpacyChecker:
             
         try:
             self.nlp = spacy.load(model_name)
+            self.version += 1
             print(f"Loaded spaCy model: {model_name} successfully.")
             return True
         except OSError as e:
@@ -175,6 +195,12 @@ class SpacyChecker:
                 
             # Clear existing models and load new ones
             self.nlp_models = {}
+            with self._ensemble_lock:
+                self._model_latency = {}
+                self._model_locks = {}
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
             
             for model_name in model_names:
                 try:
@@ -184,6 +210,7 @@ class SpacyChecker:
                     print(f"Error loading model {model_name}: {str(e)}")
                     # Continue loading other models even if one fails
             
+            self.version += 1
             if not self.nlp_models:
                 print("Failed to load any models")
                 return False
@@ -196,72 +223,190 @@ class SpacyChecker:
             return False
 
     def analyze_and_replace_entities(self, text):
+        return self.analyze_entities(text)[0]
+
+    def analyze_entities(self, text):
+        """
+        Return (replacements, complete). complete is False when the result is degraded:
+        an ensemble model was skipped, missed the latency budget or failed, or analysis
+        errored. Such results must not be cached.
+        """
         if not SPACY_AVAILABLE:
             print("SpaCy is not available. Cannot analyze text.")
-            return {}
+            return {}, False
             
         if not self.nlp_models and not self.nlp:
             print("No models loaded. Cannot analyze text.")
-            return {}
+            return {}, False
             
-        replacements = {}
-        
         try:
+            # Several models loaded: run them as an ensemble
+            if len(self.nlp_models) > 1:
+                return self._analyze_with_ensemble(text)
+            
             # Use single model if available
             if self.nlp:
                 return self._analyze_with_model(self.nlp, text)
             
-            # Use multiple models if available
-            if self.nlp_models:
-                for lang, nlp in self.nlp_models.items():
-                    try:
-                        model_replacements = self._analyze_with_model(nlp, text)
-                        replacements.update(model_replacements)
-                    except Exception as e:
-                        print(f"Error processing with model {lang}: {str(e)}")
-                        # Continue with other models even if one fails
-            
-            return replacements
+            return self._analyze_with_model(next(iter(self.nlp_models.values())), text)
             
         except Exception as e:
             error_msg = f"Error in analyze_and_replace_entities: {str(e)}"
             print(error_msg)
             traceback.print_exc()
-            return {} # Return empty dict on error
+            return {}, False # Return empty dict on error
 
     def _analyze_with_model(self, nlp, text):
         """Helper method to analyze text with a single spaCy model"""
-        replacements = {}
-        
         try:
             # Process the text with spaCy
             doc = nlp(text)
-            
-            # Keep track of entity counts for numbering
-            entity_counts = defaultdict(int)
-            
-            # Custom terms processing
-            for token in doc:
-                token_lower = token.text.lower()  # Convert to lowercase for normalization
-                if token_lower in self.custom_terms:
-                    if token.text not in replacements:
-                        replacements[token.text] = self.custom_terms[token_lower]
-            
-            # First pass: count entities and create replacements
-            for ent in doc.ents:
-                entity_counts[ent.label_] += 1
-                replacement = f"{ent.label_}{entity_counts[ent.label_]}"
-                if ent.text not in replacements:
-                    replacements[ent.text] = replacement
-            
-            return replacements
+            spans = [(ent.start_char, ent.end_char, ent.label_) for ent in doc.ents]
+            return self._build_replacements(doc, spans), True
             
         except Exception as e:
             print(f"Error in _analyze_with_model: {str(e)}")
-            return {}
+            return {}, False
+
+    def _build_replacements(self, doc, spans):
+        """
+        Numbered entity replacements for a doc and (start, end, label) entity spans.
+        Custom terms are not matched here: TextProcessor replaces them before NER runs.
+        """
+        replacements = {}
+        
+        # Keep track of entity counts for numbering
+        entity_counts = defaultdict(int)
+        
+        # First pass: count entities and create replacements
+        for start, end, label in spans:
+            entity_text = doc.text[start:end]
+            entity_counts[label] += 1
+            replacement = f"{label}{entity_counts[label]}"
+            if entity_text not in replacements:
+                replacements[entity_text] = replacement
+        
+        return replacements
+
+    def configure_ensemble(self, policy="union", latency_budget=None):
+        """
+        Set how nlp_models are combined.
+        policy: "union" keeps an entity found by any model, "majority" one found by more than half of them.
+        latency_budget: seconds to wait for the models; models slower than that are skipped.
+        """
+        if policy not in ("union", "majority"):
+            print(f"Unknown ensemble policy '{policy}', using 'union'")
+            policy = "union"
+        if policy != self.ensemble_policy or latency_budget != self.latency_budget:
+            self.ensemble_policy = policy
+            self.latency_budget = latency_budget
+            self.version += 1
+
+    def _analyze_with_ensemble(self, text):
+        """
+        Run every loaded model concurrently over the text and merge their entity spans.
+        Models are in priority order (the order they were loaded in). With a latency budget,
+        models whose recent latency exceeds it (or that are still busy with an earlier text)
+        are skipped, and models that miss the deadline are left out of this result.
+        """
+        models = list(self.nlp_models.items())
+        candidates = models
+        if self.latency_budget:
+            with self._ensemble_lock:
+                fast = [(name, nlp) for name, nlp in models
+                        if self._model_latency.get(name, 0.0) <= self.latency_budget
+                        and not self._get_model_lock(name).locked()]
+                # Always run at least the model with the lowest latency estimate
+                candidates = fast or [min(models, key=lambda m: self._model_latency.get(m[0], 0.0))]
+        
+        executor = self._get_executor()
+        futures = {executor.submit(self._run_model, name, nlp, text): name for name, nlp in candidates}
+        done, not_done = wait(futures, timeout=self.latency_budget)
+        if not done:
+            # Nothing met the budget: take the first model to finish rather than returning nothing
+            done, not_done = wait(futures, return_when=FIRST_COMPLETED)
+        
+        priority = {name: index for index, (name, _) in enumerate(models)}
+        complete = len(candidates) == len(models) and not not_done
+        results = []
+        for future in done:
+            name = futures[future]
+            try:
+                doc = future.result()
+            except Exception as e:
+                print(f"Error processing with model {name}: {str(e)}")
+                complete = False
+                continue
+            results.append((priority[name], name, doc))
+        if len(candidates) < len(models) or (not_done and self.latency_budget):
+            finished = {futures[f] for f in done}
+            skipped = [name for name, _ in models if name not in finished]
+            print(f"NER ensemble skipped slow models: {skipped}")
+        if not results:
+            return {}, False
+        
+        results.sort()
+        spans = self._merge_entity_spans(
+            [[(ent.start_char, ent.end_char, ent.label_) for ent in doc.ents] for _, _, doc in results]
+        )
+        return self._build_replacements(results[0][2], spans), complete
+
+    def _run_model(self, name, nlp, text):
+        with self._get_model_lock(name):
+            started = time.perf_counter()
+            doc = nlp(text)
+            elapsed = time.perf_counter() - started
+        with self._ensemble_lock:
+            previous = self._model_latency.get(name)
+            # Exponential moving average of the model's latency
+            self._model_latency[name] = elapsed if previous is None else 0.7 * previous + 0.3 * elapsed
+        return doc
+
+    def _get_model_lock(self, name):
+        lock = self._model_locks.get(name)
+        if lock is None:
+            lock = self._model_locks.setdefault(name, threading.Lock())
+        return lock
+
+    def _merge_entity_spans(self, model_spans):
+        """
+        Merge per-model (start, end, label) spans, given in model priority order.
+        Identical offsets are voted on: the label with most votes wins, ties go to the
+        higher-priority model. Overlapping spans are resolved by votes, then length, then priority.
+        """
+        votes = {}
+        for model_rank, spans in enumerate(model_spans):
+            for start, end, label in spans:
+                labels = votes.setdefault((start, end), {})
+                count, best_rank = labels.get(label, (0, model_rank))
+                labels[label] = (count + 1, min(best_rank, model_rank))
+        
+        min_votes = len(model_spans) // 2 + 1 if self.ensemble_policy == "majority" else 1
+        candidates = []
+        for (start, end), labels in votes.items():
+            total = sum(count for count, _ in labels.values())
+            if total < min_votes:
+                continue
+            label, (_, rank) = max(labels.items(), key=lambda item: (item[1][0], -item[1][1]))
+            candidates.append((total, end - start, -rank, start, end, label))
+        
+        # Greedily keep the strongest spans that don't overlap an already kept one
+        candidates.sort(reverse=True)
+        kept = []
+        for _, _, _, start, end, label in candidates:
+            if all(end <= kept_start or start >= kept_end for kept_start, kept_end, _ in kept):
+                kept.append((start, end, label))
+        kept.sort()
+        return kept
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=max(2, len(self.nlp_models)), thread_name_prefix="spacy-ner")
+        return self._executor
 
     def set_custom_terms(self, terms_map):
         try:
+            # Kept for callers reading them back; matching is done by TextProcessor.custom_term_matcher
             self.custom_terms = terms_map
             print(f"Set {len(self.custom_terms)} custom terms")
             return True
@@ -280,14 +425,12 @@ class SpacyChecker:
                 print("SpaCy is not available. Cannot get downloaded models.")
                 return json.dumps({"error": "spaCy not available", "models": []})
             
-            # Try to get installed models directly from spaCy
+            # Try the cached package-metadata index first
             try:
-                import spacy.cli
-                #print("Using spaCy directly to get model info")
-                installed_models = list(spacy.cli.info()["pipelines"].keys())
+                installed_models = sorted(self.model_index.get_installed_models())
                 return json.dumps({"models": installed_models})
             except Exception as e:
-                print(f"Error getting models directly from spaCy: {str(e)}")
+                print(f"Error getting models from the model index: {str(e)}")
                 print("Falling back to subprocess method")
             
             # Fall back to subprocess method
@@ -0,0 +1,109 @@
+import os
+import sys
+import json
+import site
+import importlib
+import importlib.metadata
+
+# On-disk cache of installed spaCy pipelines (next to clipboard_settings.db)
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'spacy_models_index.json')
+
+
+class SpacyModelIndex:
+    """
+    Index of spaCy pipelines installed in the current environment.
+    Built from package metadata (importlib.metadata) instead of spacy.cli.info(), and
+    cached on disk keyed by the modification times of the site-packages directories,
+    which change whenever a package is installed or removed.
+    """
+
+    def __init__(self, cache_path: str = DEFAULT_CACHE_PATH):
+        self.cache_path = cache_path
+        self._key = None
+        self._models = None
+
+    def get_installed_models(self) -> set:
+        """Return the names of the installed spaCy pipelines"""
+        key = self._environment_key()
+        if self._models is not None and key == self._key:
+            return set(self._models)
+
+        models = self._read_cache(key)
+        if models is None:
+            models = self._scan()
+            self._write_cache(key, models)
+        self._key = key
+        self._models = models
+        return set(models)
+
+    def is_installed(self, model_name: str) -> bool:
+        """Return True if the spaCy pipeline is installed"""
+        return model_name in self.get_installed_models()
+
+    def refresh(self) -> set:
+        """Rescan the environment (after a download or uninstall) and rewrite the cache"""
+        importlib.invalidate_caches()
+        key = self._environment_key()
+        models = self._scan()
+        self._write_cache(key, models)
+        self._key = key
+        self._models = models
+        return set(models)
+
+    def _environment_key(self):
+        """(path, mtime) of every site-packages directory on sys.path"""
+        paths = set(p for p in sys.path if p and os.path.basename(os.path.normpath(p)) in ("site-packages", "dist-packages"))
+        try:
+            paths.update(site.getsitepackages())
+        except AttributeError:  # Not available in some virtualenv/embedded interpreters
+            pass
+        user_site = getattr(site, "USER_SITE", None)
+        if user_site:
+            paths.add(user_site)
+
+        key = []
+        for path in sorted(paths):
+            try:
+                key.append([os.path.abspath(path), os.stat(path).st_mtime_ns])
+            except OSError:
+                continue
+        return key
+
+    def _scan(self) -> list:
+        """Find distributions that depend on spaCy and ship a pipeline meta.json"""
+        models = set()
+        spacy_installed = False
+        for dist in importlib.metadata.distributions():
+            name = (dist.metadata.get('Name') or '').replace('-', '_').lower()
+            if name == 'spacy':
+                spacy_installed = True
+                continue
+            if not name or name.startswith('spacy'):
+                continue  # spaCy itself and its plugins (spacy_legacy, spacy_loggers, ...)
+            requires = dist.requires or []
+            if not any(req.lower().startswith('spacy') for req in requires):
+                continue
+            files = dist.files or []
+            if any(f.name == 'meta.json' and f.parts[0].lower() == name for f in files):
+                models.add(name)
+        # Pipelines can't be loaded without spaCy itself
+        return sorted(models) if spacy_installed else []
+
+    def _read_cache(self, key):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('key') == key:
+                return list(data.get('models', []))
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def _write_cache(self, key, models):
+        try:
+            tmp_path = self.cache_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'key': key, 'models': list(models)}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Could not write spaCy model index cache: {e}")
@@ -32,7 +32,16 @@ class ClipboardService:
         self.monitor_thread = None
         self.platform_utils = PlatformUtils()
         self.allowed_app_checker = AllowedAppChecker(config)
+        # The config DB connection belongs to the Tk thread; config writes from the monitor go there
+        self.text_processor.config_dispatcher = self.run_on_ui_thread
         
+    def run_on_ui_thread(self, callback):
+        """Run callback on the Tk thread (directly when there is no GUI)"""
+        if self.gui is not None and hasattr(self.gui, 'run_on_ui_thread'):
+            self.gui.run_on_ui_thread(callback)
+        else:
+            callback()
+
     def start_monitor(self):
         """Start the clipboard monitoring thread"""
         pyperclip.copy("")
@@ -92,15 +101,17 @@ class ClipboardService:
         try:
             state = self.state
             
+            snapshot = self.config.get_snapshot()
+            
             # Check if masking is disabled
-            if self.config.disable_masking:
+            if snapshot.disable_masking:
                 # Just save to database without processing
                 self.text_processor.process_text(clipboard_text, state.last_mask_mapping, active_process)
                 state.last_given_text = clipboard_text
                 return
             
             # New text - check for unmasking
-            if state.last_mask_mapping and not self.config.unMaskManual:
+            if state.last_mask_mapping and not snapshot.unMaskManual:
                 match_count = 0
                 for mapping in state.last_mask_mapping:
                     if mapping.get('maskedText') and mapping['maskedText'] in clipboard_text:
@@ -134,8 +145,10 @@ class ClipboardService:
         try:
             state = self.state
             
+            snapshot = self.config.get_snapshot()
+            
             # If masking is disabled, do nothing
-            if self.config.disable_masking:
+            if snapshot.disable_masking:
                 return
             
             # Check if this is the same process as where we copied from
@@ -148,7 +161,7 @@ class ClipboardService:
             else:
                 # Different app - check if trusted
                 is_trusted = self.allowed_app_checker.is_trusted_app(active_window)
-                if self.config.debugMode:
+                if snapshot.debugMode:
                     print(f"Different app - Is trusted: {is_trusted}")
                 
                 if is_trusted:
@@ -156,14 +169,14 @@ class ClipboardService:
                     if state.last_given_text != state.last_original_text:
                         pyperclip.copy(state.last_original_text)
                         state.last_given_text = state.last_original_text
-                        if self.config.debugMode:
+                        if snapshot.debugMode:
                             print(f"Trusted app - showing original text")
                 else:
                     # Untrusted app - show processed/masked text
                     if state.last_given_text != state.last_masked_text:
                         pyperclip.copy(state.last_masked_text)
                         state.last_given_text = state.last_masked_text
-                        if self.config.debugMode:
+                        if snapshot.debugMode:
                             print(f"Untrusted app - showing masked text")
                         
         except Exception as e:
@@ -178,8 +191,13 @@ class ClipboardService:
         self.running = False
         if self.monitor_thread and self.monitor_thread.is_alive():
             self.monitor_thread.join()
+        self.text_processor.regex_sandbox.close()
         print("Clipboard monitoring stopped")
 
-    def get_history(self, limit=100):
-        """Get clipboard history from database with mask mappings"""
-        return self.db.get_history_with_mappings(limit=limit) 
\ No newline at end of file
+    def get_history(self, limit=100, collapsed=False):
+        """Get clipboard history from database with mask mappings (collapsed: one entry per distinct content)"""
+        return self.db.get_history_with_mappings(limit=limit, collapsed=collapsed)
+
+    def get_history_page(self, page_size=50, before=None):
+        """Get one page of clipboard history, newest first. Returns (entries, next_cursor)"""
+        return self.db.get_history_page(page_size=page_size, before=before)
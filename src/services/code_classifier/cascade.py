@@ -0,0 +1,175 @@
+import os
+import json
+import time
+from typing import Any, Dict, List, Optional
+from src.services.code_classifier.long_blocks import LONG_BLOCK_CHARS, sample_windows
+
+# Tuned thresholds, written by ModelTrainer.tune_cascade next to the saved model
+DEFAULT_THRESHOLDS_PATH = "./src/services/code_classifier/model_data_fetch/model/cascade_thresholds.json"
+
+
+class CodeClassifierCascade:
+    """
+    Two-stage CODE/TEXT classifier.
+    The heuristic scorer (ManualCodeChecker.code_score) decides blocks whose score is at or
+    below text_threshold or at or above code_threshold; only the ambiguous blocks in
+    between reach the transformer classifier.
+    """
+
+    # Thresholds stay outside [0.3, 0.7] so heuristic decisions pass the 0.7 confidence cut in classify_block
+    TEXT_THRESHOLD_GRID = [i / 40 for i in range(0, 12)]      # 0.0 .. 0.275
+    CODE_THRESHOLD_GRID = [i / 40 for i in range(29, 41)]     # 0.725 .. 1.0
+
+    def __init__(self, scorer, classifier, text_threshold: float = 0.1, code_threshold: float = 0.9,
+                 thresholds_path: str = DEFAULT_THRESHOLDS_PATH):
+        self.scorer = scorer
+        self.classifier = classifier
+        self.text_threshold = text_threshold
+        self.code_threshold = code_threshold
+        self.thresholds_path = thresholds_path
+        self.heuristic_decisions = 0
+        self.model_decisions = 0
+        if thresholds_path:
+            self.load_thresholds(thresholds_path)
+
+    def predict_with_confidence(self, text: str) -> Dict[str, Any]:
+        """Predict with confidence scores, calling the transformer only for ambiguous blocks"""
+        result = self._heuristic_decision(text)
+        if result is not None:
+            self.heuristic_decisions += 1
+            return result
+
+        self.model_decisions += 1
+        return self.classifier.predict_with_confidence(text)
+
+    def _heuristic_decision(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        The heuristic result if the score is outside the thresholds, else None.
+        Long blocks are scored by the classifier's sampled windows and decided here only if
+        every window is decided the same way.
+        """
+        if len(text) <= LONG_BLOCK_CHARS:
+            scores = [self.scorer.code_score(text)]
+        else:
+            scores = [self.scorer.code_score(window) for window in sample_windows(text)]
+        if all(score <= self.text_threshold for score in scores):
+            return {"prediction": "TEXT", "confidence": 1.0 - max(scores), "is_code": False}
+        if all(score >= self.code_threshold for score in scores):
+            return {"prediction": "CODE", "confidence": min(scores), "is_code": True}
+        return None
+
+    def predict_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Like predict_with_confidence for several blocks; the ambiguous ones reach the transformer in one batch"""
+        results = [None] * len(texts)
+        ambiguous = []
+        for i, text in enumerate(texts):
+            results[i] = self._heuristic_decision(text)
+            if results[i] is None:
+                ambiguous.append(i)
+        self.heuristic_decisions += len(texts) - len(ambiguous)
+        self.model_decisions += len(ambiguous)
+        if ambiguous:
+            for i, result in zip(ambiguous, self.classifier.predict_batch([texts[i] for i in ambiguous])):
+                results[i] = result
+        return results
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Return the thresholds and how many blocks each stage decided"""
+        total = self.heuristic_decisions + self.model_decisions
+        return {
+            "text_threshold": self.text_threshold,
+            "code_threshold": self.code_threshold,
+            "heuristic_decisions": self.heuristic_decisions,
+            "model_decisions": self.model_decisions,
+            "heuristic_rate": self.heuristic_decisions / total if total else 0.0
+        }
+
+    def load_thresholds(self, path: str) -> bool:
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.text_threshold = float(data["text_threshold"])
+            self.code_threshold = float(data["code_threshold"])
+            return True
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not load cascade thresholds from {path}: {e}")
+            return False
+
+    def save_thresholds(self, path: str, report: Dict[str, Any] = None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "text_threshold": self.text_threshold,
+                "code_threshold": self.code_threshold,
+                "report": report or {}
+            }, f, indent=2)
+
+    def tune_thresholds(self, samples: List[Dict[str, Any]], max_accuracy_drop: float = 0.005) -> Dict[str, Any]:
+        """
+        Pick the thresholds that send the fewest blocks to the transformer while keeping
+        accuracy within max_accuracy_drop of the transformer alone.
+        samples: [{"text": ..., "label": 1 for CODE / 0 for TEXT}] (as returned by ModelTrainer.load_data)
+        Returns a report with the chosen thresholds and the accuracy/latency of every candidate.
+        """
+        if not samples:
+            return {}
+
+        # Score and classify every sample once; the threshold sweep then only replays the results
+        scores, model_predictions, scorer_latency, model_latency, labels = [], [], [], [], []
+        for sample in samples:
+            start = time.perf_counter()
+            scores.append(self.scorer.code_score(sample["text"]))
+            scorer_latency.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            model_predictions.append(self.classifier.predict_with_confidence(sample["text"])["is_code"])
+            model_latency.append(time.perf_counter() - start)
+            labels.append(sample["label"] == 1)
+
+        count = len(samples)
+        model_accuracy = sum(p == y for p, y in zip(model_predictions, labels)) / count
+        candidates = []
+        for text_threshold in self.TEXT_THRESHOLD_GRID:
+            for code_threshold in self.CODE_THRESHOLD_GRID:
+                correct = 0
+                routed = 0
+                latency = 0.0
+                for i in range(count):
+                    latency += scorer_latency[i]
+                    if scores[i] <= text_threshold:
+                        predicted = False
+                    elif scores[i] >= code_threshold:
+                        predicted = True
+                    else:
+                        predicted = model_predictions[i]
+                        routed += 1
+                        latency += model_latency[i]
+                    correct += predicted == labels[i]
+                candidates.append({
+                    "text_threshold": text_threshold,
+                    "code_threshold": code_threshold,
+                    "accuracy": correct / count,
+                    "model_rate": routed / count,
+                    "mean_latency_ms": latency / count * 1000
+                })
+
+        eligible = [c for c in candidates if c["accuracy"] >= model_accuracy - max_accuracy_drop]
+        if not eligible:
+            eligible = [max(candidates, key=lambda c: c["accuracy"])]
+        best = min(eligible, key=lambda c: (c["model_rate"], -c["accuracy"]))
+        self.text_threshold = best["text_threshold"]
+        self.code_threshold = best["code_threshold"]
+
+        return {
+            "samples": count,
+            "model_only": {
+                "accuracy": model_accuracy,
+                "mean_latency_ms": (sum(model_latency) / count) * 1000
+            },
+            "chosen": best,
+            "candidates": candidates
+        }
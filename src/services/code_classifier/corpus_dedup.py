@@ -0,0 +1,208 @@
+import os
+import json
+import glob
+import zlib
+import hashlib
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+FILE_SUFFIX = "_code_text_pairs.jsonl"
+REPORT_NAME = "dedup_report.json"
+_MASK64 = (1 << 64) - 1
+
+
+class MinHasher:
+    """
+    One-permutation MinHash over character shingles of the lowercased, whitespace-collapsed text.
+    Each shingle is hashed once and kept as the minimum of one of num_perm bins; empty bins
+    are filled from the next non-empty bin (rotation densification), so the cost is linear
+    in the text length rather than in text length x num_perm.
+    """
+
+    def __init__(self, num_perm: int = 32, shingle_size: int = 5):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._bin_range = (_MASK64 // num_perm) + 1
+
+    def signature(self, text: str) -> array:
+        normalized = " ".join(text.lower().split())
+        k = self.shingle_size
+        shingles = {normalized[i:i + k] for i in range(max(1, len(normalized) - k + 1))}
+
+        empty = _MASK64
+        bins = [empty] * self.num_perm
+        for shingle in shingles:
+            # crc32 is fast and stable across runs; the multiply spreads it over 64 bits
+            h = (zlib.crc32(shingle.encode("utf-8")) * 0x9E3779B97F4A7C15 + len(shingle)) & _MASK64
+            index = h % self.num_perm
+            value = h // self.num_perm
+            if value < bins[index]:
+                bins[index] = value
+
+        if empty in bins and any(v != empty for v in bins):
+            filled = list(bins)
+            for i in range(self.num_perm):
+                if bins[i] != empty:
+                    continue
+                distance = 1
+                while bins[(i + distance) % self.num_perm] == empty:
+                    distance += 1
+                filled[i] = (bins[(i + distance) % self.num_perm] + distance * self._bin_range) & _MASK64
+            bins = filled
+        return array("Q", bins)
+
+    @staticmethod
+    def similarity(a: array, b: array) -> float:
+        """Estimated Jaccard similarity: share of equal bins"""
+        return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+class CorpusDeduplicator:
+    """
+    Streaming dedup of the *_code_text_pairs.jsonl files.
+    - Exact duplicates (same whitespace-collapsed text) are dropped.
+    - Near duplicates (estimated Jaccard >= threshold, found with MinHash LSH) join the
+      cluster of the first such segment; at most max_cluster_size members are kept.
+    - Each kept segment gets its cluster id and a split ("train"/"test") derived from the
+      cluster, so near duplicates never land on both sides of the evaluation.
+    Cleaned files keep the input format and are written to output_dir with a report.
+    """
+
+    def __init__(self, input_dir: str, output_dir: str, threshold: float = 0.8, num_perm: int = 32,
+                 bands: int = 8, shingle_size: int = 5, max_cluster_size: int = 3, test_size: float = 0.2):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_cluster_size = max_cluster_size
+        self.test_size = test_size
+        self.hasher = MinHasher(num_perm=num_perm, shingle_size=shingle_size)
+
+        self._exact: Dict[str, Tuple[str, int]] = {}  # text hash -> (cluster id, label)
+        self._cluster_sizes: Dict[str, int] = {}
+        self._representatives: List[Tuple[str, array]] = []  # (cluster id, signature) of each cluster's first member
+        self._buckets: Dict[int, Any] = {}  # LSH band hash -> representative index or list of indexes
+
+    def run(self) -> Dict[str, Any]:
+        """Deduplicate every language file and write the cleaned files and the report"""
+        files = sorted(glob.glob(os.path.join(self.input_dir, "*" + FILE_SUFFIX)))
+        if not files:
+            print(f"❌ No data files found in {self.input_dir}")
+            return {}
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        report = {"settings": {
+            "threshold": self.threshold, "num_perm": self.hasher.num_perm, "bands": self.bands,
+            "shingle_size": self.hasher.shingle_size, "max_cluster_size": self.max_cluster_size,
+            "test_size": self.test_size
+        }, "languages": {}}
+        for file_path in files:
+            language = os.path.basename(file_path).replace(FILE_SUFFIX, "")
+            print(f"🧹 Deduplicating {language}...")
+            report["languages"][language] = self._process_file(file_path, os.path.join(self.output_dir, os.path.basename(file_path)))
+
+        totals = {}
+        for stats in report["languages"].values():
+            for key, value in stats.items():
+                totals[key] = totals.get(key, 0) + value
+        totals["clusters"] = len(self._cluster_sizes)
+        report["total"] = totals
+
+        with open(os.path.join(self.output_dir, REPORT_NAME), "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+        if totals.get("segments_in"):
+            removed = totals["segments_in"] - totals["segments_out"]
+            print(f"✅ Dedup: {totals['segments_in']:,} -> {totals['segments_out']:,} segments "
+                  f"({removed / totals['segments_in']:.1%} removed: {totals['exact_duplicates']:,} exact, "
+                  f"{totals['near_duplicates_dropped']:,} near), {totals['clusters']:,} clusters, "
+                  f"{totals['train_segments']:,} train / {totals['test_segments']:,} test")
+        return report
+
+    def _process_file(self, input_path: str, output_path: str) -> Dict[str, int]:
+        stats = {key: 0 for key in ("questions_in", "questions_out", "segments_in", "segments_out", "exact_duplicates",
+                                    "near_duplicates_kept", "near_duplicates_dropped", "label_conflicts",
+                                    "train_segments", "test_segments")}
+        tmp_path = output_path + ".tmp"
+        with open(input_path, "r", encoding="utf-8") as infile, open(tmp_path, "w", encoding="utf-8") as outfile:
+            for line in infile:
+                try:
+                    data = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                stats["questions_in"] += 1
+                kept_segments = []
+                for segment in data.get("segments", []):
+                    text = segment.get("text", "").strip()
+                    if not text:
+                        continue
+                    stats["segments_in"] += 1
+                    label = 1 if segment.get("type", "TEXT") == "CODE" else 0
+                    cluster_id, outcome = self._assign(text, label)
+                    if outcome is not None:
+                        stats[outcome] += 1
+                    if cluster_id is None:
+                        continue
+                    split = self.split_for_cluster(cluster_id)
+                    stats[f"{split}_segments"] += 1
+                    kept_segments.append({"type": segment.get("type", "TEXT"), "text": text,
+                                          "cluster": cluster_id, "split": split})
+                if kept_segments:
+                    data["segments"] = kept_segments
+                    outfile.write(json.dumps(data, ensure_ascii=False) + "\n")
+                    stats["questions_out"] += 1
+                    stats["segments_out"] += len(kept_segments)
+        os.replace(tmp_path, output_path)
+        return stats
+
+    def _assign(self, text: str, label: int) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Return (cluster id or None if the segment is dropped, statistics key of the outcome).
+        """
+        text_hash = hashlib.sha1(" ".join(text.split()).encode("utf-8")).hexdigest()
+        exact = self._exact.get(text_hash)
+        if exact is not None:
+            return None, "label_conflicts" if exact[1] != label else "exact_duplicates"
+
+        signature = self.hasher.signature(text)
+        band_keys = [hash((band, tuple(signature[band * self.rows:(band + 1) * self.rows])))
+                     for band in range(self.bands)]
+        checked = set()
+        for key in band_keys:
+            entry = self._buckets.get(key)
+            if entry is None:
+                continue
+            for index in (entry if isinstance(entry, list) else (entry,)):
+                if index in checked:
+                    continue
+                checked.add(index)
+                cluster_id, candidate = self._representatives[index]
+                if self.hasher.similarity(signature, candidate) >= self.threshold:
+                    self._exact[text_hash] = (cluster_id, label)
+                    if self._cluster_sizes[cluster_id] >= self.max_cluster_size:
+                        return None, "near_duplicates_dropped"
+                    self._cluster_sizes[cluster_id] += 1
+                    return cluster_id, "near_duplicates_kept"
+
+        # First member of a new cluster
+        cluster_id = text_hash[:16]
+        self._exact[text_hash] = (cluster_id, label)
+        self._cluster_sizes[cluster_id] = 1
+        index = len(self._representatives)
+        self._representatives.append((cluster_id, signature))
+        for key in band_keys:
+            entry = self._buckets.get(key)
+            if entry is None:
+                self._buckets[key] = index
+            elif isinstance(entry, list):
+                entry.append(index)
+            else:
+                self._buckets[key] = [entry, index]
+        return cluster_id, None
+
+    def split_for_cluster(self, cluster_id: str) -> str:
+        """Deterministic split for a whole cluster"""
+        return "test" if int(cluster_id[:8], 16) % 10000 < self.test_size * 10000 else "train"
@@ -0,0 +1,192 @@
+import os
+import json
+import glob
+import hashlib
+import datasets
+import pyarrow as pa
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+FILE_SUFFIX = "_code_text_pairs.jsonl"
+# "split" is set by CorpusDeduplicator ("train"/"test", grouped by duplicate cluster), "" otherwise
+SHARD_SCHEMA = pa.schema([("text", pa.string()), ("label", pa.int64()), ("split", pa.string())])
+# Part of the shard key, so shards written with an older schema are rebuilt
+SHARD_FORMAT_VERSION = 2
+
+
+def _record_batch(texts: List[str], labels: List[int], splits: List[str]) -> pa.RecordBatch:
+    return pa.record_batch([pa.array(texts, pa.string()), pa.array(labels, pa.int64()), pa.array(splits, pa.string())],
+                           schema=SHARD_SCHEMA)
+
+
+def parse_language_file(file_path: str, shard_path: str, batch_rows: int = 10000) -> Dict[str, Any]:
+    """
+    Stream one *_code_text_pairs.jsonl file into an Arrow shard, one segment per row
+    (CODE=1, TEXT=0). Only batch_rows rows are held in memory at a time.
+    Runs in a worker process; returns the file's statistics.
+    """
+    language = os.path.basename(file_path).replace(FILE_SUFFIX, "")
+    stats = {"language": language, "questions": 0, "segments": 0, "examples": 0, "code_examples": 0, "errors": 0}
+    content_digest = hashlib.sha1()
+    texts, labels, splits = [], [], []
+    tmp_path = shard_path + ".tmp"
+
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_stream(sink, SHARD_SCHEMA) as writer:
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                content_digest.update(line.encode("utf-8"))
+                try:
+                    data = json.loads(line.strip())
+                except json.JSONDecodeError:
+                    stats["errors"] += 1
+                    continue
+                segments = data.get("segments", [])
+                stats["questions"] += 1
+                stats["segments"] += len(segments)
+                for segment in segments:
+                    text = segment.get("text", "").strip()
+                    if not text:
+                        continue
+                    label = 1 if segment.get("type", "TEXT") == "CODE" else 0
+                    texts.append(text)
+                    labels.append(label)
+                    splits.append(segment.get("split", ""))
+                    stats["code_examples"] += label
+                if len(texts) >= batch_rows:
+                    writer.write_batch(_record_batch(texts, labels, splits))
+                    stats["examples"] += len(texts)
+                    texts, labels, splits = [], [], []
+        if texts:
+            writer.write_batch(_record_batch(texts, labels, splits))
+            stats["examples"] += len(texts)
+
+    # Content hash keys the tokenized caches, which survive a touch that leaves the data unchanged
+    stats["sha1"] = content_digest.hexdigest()
+    os.replace(tmp_path, shard_path)
+    with open(shard_path + ".json", "w", encoding="utf-8") as f:
+        json.dump(stats, f)
+    return stats
+
+
+class DatasetShardLoader:
+    """
+    Builds a memory-mapped Arrow dataset from the *_code_text_pairs.jsonl files.
+    Each language file is parsed (in parallel, one process per file) into its own shard in
+    cache_dir, keyed by the file's size and modification time, so unchanged files are never
+    re-parsed. Tokenized shards are cached in cache_dir/tokenized by data content hash
+    and tokenizer fingerprint.
+    """
+
+    def __init__(self, data_dir: str, cache_dir: Optional[str] = None, max_workers: Optional[int] = None):
+        self.data_dir = data_dir
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(data_dir)), "cache")
+        self.max_workers = max_workers
+
+    def find_files(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.data_dir, "*" + FILE_SUFFIX)))
+
+    def shard_path(self, file_path: str) -> str:
+        """Shard location for the current contents of a data file"""
+        stat = os.stat(file_path)
+        key = hashlib.sha1(f"{os.path.abspath(file_path)}:{stat.st_size}:{stat.st_mtime_ns}:{SHARD_FORMAT_VERSION}".encode("utf-8")).hexdigest()[:16]
+        language = os.path.basename(file_path).replace(FILE_SUFFIX, "")
+        return os.path.join(self.cache_dir, f"{language}-{key}.arrow")
+
+    def load_shards(self) -> List[Dict[str, Any]]:
+        """
+        Return [{"path", "stats", "dataset"}] for every data file, parsing only new or changed files.
+        """
+        files = self.find_files()
+        if not files:
+            return []
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        shard_paths = {file_path: self.shard_path(file_path) for file_path in files}
+        stale = [f for f in files if not os.path.exists(shard_paths[f]) or not os.path.exists(shard_paths[f] + ".json")]
+        if stale:
+            print(f"🧩 Parsing {len(stale)} changed file(s), {len(files) - len(stale)} cached")
+            workers = self.max_workers or min(len(stale), os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(parse_language_file, stale, [shard_paths[f] for f in stale]))
+            self._remove_stale_shards(set(shard_paths.values()))
+
+        shards = []
+        for file_path in files:
+            path = shard_paths[file_path]
+            with open(path + ".json", "r", encoding="utf-8") as f:
+                stats = json.load(f)
+            shards.append({"path": path, "stats": stats, "dataset": datasets.Dataset.from_file(path)})
+        return shards
+
+    def load_dataset(self) -> Optional[datasets.Dataset]:
+        """All shards concatenated into one memory-mapped dataset with "text" and "label" columns"""
+        shards = self.load_shards()
+        shards = [shard for shard in shards if shard["stats"]["examples"] > 0]
+        if not shards:
+            return None
+        return datasets.concatenate_datasets([shard["dataset"] for shard in shards])
+
+    def load_tokenized_dataset(self, tokenize_fn, tokenizer_key: str) -> Optional[datasets.Dataset]:
+        """
+        Like load_dataset, with tokenize_fn applied per shard. Tokenized shards are cached by the
+        shard's content hash and tokenizer_key, so only new or changed data is tokenized again.
+        """
+        shards = [shard for shard in self.load_shards() if shard["stats"]["examples"] > 0]
+        if not shards:
+            return None
+        tokenized_dir = os.path.join(self.cache_dir, "tokenized")
+        os.makedirs(tokenized_dir, exist_ok=True)
+        # The shard format is part of the key: tokenized shards keep the raw shard's columns
+        tokenizer_hash = hashlib.sha1(f"{tokenizer_key}:{SHARD_FORMAT_VERSION}".encode("utf-8")).hexdigest()[:16]
+
+        tokenized = []
+        data_hashes = set()
+        for shard in shards:
+            data_hash = shard["stats"].get("sha1", os.path.basename(shard["path"]))[:16]
+            data_hashes.add(data_hash)
+            cache_file = os.path.join(tokenized_dir, f"{data_hash}-{tokenizer_hash}.arrow")
+            tokenized.append(shard["dataset"].map(tokenize_fn, batched=True, cache_file_name=cache_file,
+                                                  desc=f"Tokenizing {shard['stats']['language']}"))
+
+        # Tokenized data of files that no longer exist in this form is never read again
+        for path in glob.glob(os.path.join(tokenized_dir, "*.arrow")):
+            if os.path.basename(path).split("-")[0] not in data_hashes:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"Could not remove stale tokenized shard {path}: {e}")
+        return datasets.concatenate_datasets(tokenized)
+
+    @staticmethod
+    def split_dataset(dataset: datasets.Dataset, test_size: float = 0.2, seed: int = 42) -> datasets.DatasetDict:
+        """
+        Train/test split. Deduplicated data carries a per-cluster "split" column, which is used
+        as is so near duplicates stay on one side; other data is split randomly (seeded).
+        """
+        if "split" in dataset.column_names:
+            splits = dataset.unique("split")
+            if "train" in splits and "test" in splits:
+                return datasets.DatasetDict({
+                    "train": dataset.filter(lambda batch: [s == "train" for s in batch["split"]], batched=True),
+                    "test": dataset.filter(lambda batch: [s == "test" for s in batch["split"]], batched=True)
+                })
+        return dataset.train_test_split(test_size=test_size, seed=seed)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Per-language and total statistics, read from the shard sidecars"""
+        shards = self.load_shards()
+        totals = {"languages": len(shards), "questions": 0, "segments": 0, "examples": 0, "code_examples": 0}
+        for shard in shards:
+            for key in ("questions", "segments", "examples", "code_examples"):
+                totals[key] += shard["stats"][key]
+        return {"languages": [shard["stats"] for shard in shards], "total": totals}
+
+    def _remove_stale_shards(self, current_paths: set):
+        """Delete shards of files that changed or were removed"""
+        current_prefixes = tuple(path[:-len(".arrow")] for path in current_paths)
+        for path in glob.glob(os.path.join(self.cache_dir, "*.arrow*")):  # Top level only, not tokenized/
+            if not path.startswith(current_prefixes):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"Could not remove stale shard {path}: {e}")
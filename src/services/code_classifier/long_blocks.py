@@ -0,0 +1,23 @@
+from typing import List
+
+# Token limit of one model input (ModelTrainer trains with the same length)
+MAX_SEQUENCE_LENGTH = 256
+# Conservative characters per DistilBERT token for code, where punctuation and identifiers split finely
+CHARS_PER_TOKEN = 2.5
+# Blocks longer than this likely exceed MAX_SEQUENCE_LENGTH and would be truncated;
+# they are judged by sampled windows instead
+LONG_BLOCK_CHARS = int(MAX_SEQUENCE_LENGTH * CHARS_PER_TOKEN)
+# Size of each sampled window (fits in one model input)
+WINDOW_CHARS = LONG_BLOCK_CHARS
+
+
+def sample_windows(text: str, window_chars: int = WINDOW_CHARS) -> List[str]:
+    """Head, middle and tail windows of a long block, moved to line starts where one is close"""
+    windows = []
+    for offset in (0, (len(text) - window_chars) // 2, len(text) - window_chars):
+        if offset > 0:
+            line_start = text.find("\n", offset, offset + window_chars // 4)
+            if line_start != -1:
+                offset = line_start + 1
+        windows.append(text[offset:offset + window_chars])
+    return windows
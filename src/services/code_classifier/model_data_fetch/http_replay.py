@@ -0,0 +1,62 @@
+import os
+import json
+import hashlib
+import requests
+from typing import Any, Dict, Tuple
+
+# Query parameters that don't change the response and must not end up in fixtures
+IGNORED_PARAMS = ("key", "access_token")
+
+
+def fixture_key(url: str, params: Dict[str, Any]) -> str:
+    """Stable name for a request: hash of the URL and its sorted parameters"""
+    relevant = sorted((k, str(v)) for k, v in params.items() if k not in IGNORED_PARAMS)
+    return hashlib.sha1(json.dumps([url, relevant]).encode("utf-8")).hexdigest()
+
+
+class LiveTransport:
+    """Performs real HTTP GET requests"""
+
+    def __init__(self, timeout: float = 30):
+        self.session = requests.Session()
+        self.timeout = timeout
+
+    def get(self, url: str, params: Dict[str, Any]) -> Tuple[int, str]:
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        return response.status_code, response.text
+
+
+class RecordingTransport:
+    """Performs real requests through another transport and saves every response as a fixture"""
+
+    def __init__(self, fixtures_dir: str, inner=None):
+        self.fixtures_dir = fixtures_dir
+        self.inner = inner or LiveTransport()
+        os.makedirs(fixtures_dir, exist_ok=True)
+
+    def get(self, url: str, params: Dict[str, Any]) -> Tuple[int, str]:
+        status, text = self.inner.get(url, params)
+        path = os.path.join(self.fixtures_dir, fixture_key(url, params) + ".json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "url": url,
+                "params": {k: v for k, v in params.items() if k not in IGNORED_PARAMS},
+                "status": status,
+                "body": text
+            }, f, ensure_ascii=False)
+        return status, text
+
+
+class ReplayTransport:
+    """Answers requests from recorded fixtures, without network access (404 for unknown requests)"""
+
+    def __init__(self, fixtures_dir: str):
+        self.fixtures_dir = fixtures_dir
+
+    def get(self, url: str, params: Dict[str, Any]) -> Tuple[int, str]:
+        path = os.path.join(self.fixtures_dir, fixture_key(url, params) + ".json")
+        if not os.path.exists(path):
+            return 404, json.dumps({"error_id": 404, "error_message": f"No recorded fixture for {url} {params}"})
+        with open(path, "r", encoding="utf-8") as f:
+            fixture = json.load(f)
+        return fixture["status"], fixture["body"]
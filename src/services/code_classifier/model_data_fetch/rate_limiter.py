@@ -0,0 +1,44 @@
+import math
+import time
+import asyncio
+from typing import Dict
+
+
+class TokenBucket:
+    """
+    Asyncio token bucket: up to capacity requests in a burst, refilled at rate per second.
+    pause() blocks one API method for the number of seconds given by the API's backoff field
+    while other methods keep going.
+    """
+
+    def __init__(self, rate: float, capacity: int = 5):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self._backoff_until: Dict[str, float] = {}
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, method: str = ""):
+        """Wait until a request to method is allowed, then take a token"""
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                backoff_wait = self._backoff_until.get(method, 0) - now
+                if backoff_wait <= 0:
+                    if math.isinf(self.rate):
+                        return
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                    self.updated_at = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    wait = backoff_wait
+            await asyncio.sleep(wait)
+
+    def pause(self, method: str, seconds: float):
+        """Don't allow requests to method for the next seconds (API "backoff")"""
+        until = time.monotonic() + seconds
+        self._backoff_until[method] = max(self._backoff_until.get(method, 0), until)
@@ -1,29 +1,136 @@
 import requests
-import time
 import json
 import os
-from bs4 import BeautifulSoup
+import sys
+from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4.element import PreformattedString
 import asyncio
 import re
+import multiprocessing
 from datetime import datetime
 from typing import List, Dict, Any, Optional
+from src.services.code_classifier.model_data_fetch.http_replay import LiveTransport, RecordingTransport, ReplayTransport
+from src.services.code_classifier.model_data_fetch.rate_limiter import TokenBucket
+from src.services.code_classifier.corpus_dedup import CorpusDeduplicator
+
+try:
+    import lxml  # noqa: F401
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# lxml is several times faster than the built-in parser and is used when installed
+HTML_PARSER = "lxml" if LXML_AVAILABLE else "html.parser"
+CODE_TAGS = ("pre", "code")
+
+
+def extract_segments(html: str) -> List[Dict]:
+    """
+    Extract CODE and TEXT segments from a post body in a single traversal.
+    An outermost <pre>/<code> element with more than one word becomes a CODE segment and
+    its subtree is not visited; every other text node becomes a TEXT segment.
+    Duplicate code blocks are kept once.
+    """
+    soup = BeautifulSoup(html, HTML_PARSER)
+    segments = []
+    code_texts = set()  # Track code texts to avoid duplicates
+    
+    stack = [soup]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Tag):
+            if node.name in CODE_TAGS:
+                text = node.get_text().strip()
+                if len(text.split()) > 1:
+                    if text not in code_texts:
+                        segments.append({"type": "CODE", "text": text})
+                        code_texts.add(text)
+                    continue  # Nothing inside a code block is text
+            # Children in reverse so they are popped in document order
+            stack.extend(reversed(node.contents))
+        elif isinstance(node, NavigableString) and not isinstance(node, PreformattedString):
+            text = node.strip()  # Comments, CDATA and doctypes are skipped above
+            if text:
+                segments.append({"type": "TEXT", "text": text})
+    
+    return segments
+
+
+def process_raw_line(line: str, language: str) -> Optional[str]:
+    """Turn one raw JSONL question into a code_text_pairs JSONL line, or None to skip it (pool worker)"""
+    data = json.loads(line)
+    body = data.get("body", "")
+    if not body.strip():
+        return None
+    
+    segments = extract_segments(body)
+    # Skip if no segments found
+    if not segments:
+        return None
+    
+    result = {
+        "raw_content": body.strip(),
+        "language": language,
+        "question_id": data.get("question_id"),
+        "title": data.get("title"),
+        "score": data.get("score", 0),
+        "answer_count": data.get("answer_count", 0),
+        "view_count": data.get("view_count", 0),
+        "creation_date": data.get("creation_date", 0),
+        "segments": segments
+    }
+    return json.dumps(result, ensure_ascii=False)
+
+
+def _process_raw_line_safe(args):
+    """Pool entry point: (line_num, line, language) -> (line_num, output line or None, error or None)"""
+    line_num, line, language = args
+    try:
+        return line_num, process_raw_line(line, language), None
+    except json.JSONDecodeError as e:
+        return line_num, None, f"JSON error: {e}"
+    except Exception as e:
+        return line_num, None, f"Error: {e}"
 
 class StackOverflowScraper:
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, http_mode: str = "live", fixtures_dir: Optional[str] = None,
+                 max_concurrent_tags: int = 4, model_root: Optional[str] = None):
         self.api_key = api_key
         self.base_url = "https://api.stackexchange.com/2.3"
-        self.session = requests.Session()
         self.request_count = 0
         self.max_requests = 10000
+        # Daily quota reported by the API (quota_remaining); collection stops when it runs out
+        self.quota_remaining = None
         self.rate_limit_delay = 0.1 if api_key else 1.5  # Faster with API key
+        self.max_concurrent_tags = max_concurrent_tags
+        
+        # HTTP layer: "live", "record" (live + save fixtures) or "replay" (fixtures only, offline)
+        self.http_mode = http_mode
+        self.fixtures_dir = fixtures_dir or os.path.join("model", "data", "http_fixtures")
+        if http_mode == "replay":
+            self.transport = ReplayTransport(self.fixtures_dir)
+        elif http_mode == "record":
+            self.transport = RecordingTransport(self.fixtures_dir)
+        else:
+            self.transport = LiveTransport()
+        self.rate_limiter = None  # Created inside the event loop
         
         # Create directories for organized data storage
-        self.model_root = "model"
+        # Replayed runs write into a sandbox next to the fixtures, so they never touch the
+        # production raw data or move its cursors
+        if model_root is None:
+            model_root = os.path.join(self.fixtures_dir, "sandbox") if http_mode == "replay" else "model"
+        self.model_root = model_root
         self.data_dir = os.path.join(self.model_root, "data")
         self.raw_data_dir = os.path.join(self.data_dir, "raw_data")
         self.processed_data_dir = os.path.join(self.data_dir, "code_text_pairs")
+        # Exact and near-duplicate free copy of processed_data_dir, used for training
+        self.dedup_data_dir = os.path.join(self.data_dir, "code_text_pairs_dedup")
         self.saved_model_dir = os.path.join(self.model_root, "saved_model")
+        # Next page to fetch per tag, so an interrupted run resumes where it stopped
+        self.cursor_file = os.path.join(self.data_dir, "scrape_cursors.json")
         self.create_directories()
+        self.cursors = self.load_cursors()
         
         # Languages to fetch (prioritized by popularity)
         self.languages = [
@@ -38,7 +145,8 @@ class StackOverflowScraper:
         print(f"📊 Total requests available: {self.max_requests}")
         print(f"📊 Languages to fetch: {len(self.languages)}")
         print(f"📊 Requests per language: {self.requests_per_language}")
-        print(f"📊 Rate limit delay: {self.rate_limit_delay}s")
+        print(f"📊 Rate limit: {1 / self.rate_limit_delay:.1f} requests/s, {self.max_concurrent_tags} tags in parallel")
+        print(f"📊 HTTP mode: {self.http_mode}")
         print(f"📁 Model root: {self.model_root}")
         print(f"📁 Data directory: {self.data_dir}")
         print(f"📁 Raw data directory: {self.raw_data_dir}")
@@ -76,39 +184,75 @@ class StackOverflowScraper:
             print(f"❌ Error loading API key: {e}")
             return False
 
-    def make_request(self, endpoint: str, params: Dict[str, Any]) -> Optional[Dict]:
-        """Make API request with rate limiting and error handling"""
+    def load_cursors(self) -> Dict[str, Dict[str, Any]]:
+        """Load the per-tag cursors ({tag: {"next_page": int, "done": bool}})"""
+        try:
+            with open(self.cursor_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def save_cursors(self):
+        """Write the cursors atomically (after every saved page)"""
+        tmp_file = self.cursor_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.cursors, f, indent=2)
+        os.replace(tmp_file, self.cursor_file)
+
+    def reset_cursors(self, tags: Optional[List[str]] = None):
+        """Start the given tags (all tags if None) from page one on the next run"""
+        for tag in (tags if tags is not None else list(self.cursors)):
+            self.cursors.pop(tag, None)
+        self.save_cursors()
+
+    def has_quota(self) -> bool:
         if self.request_count >= self.max_requests:
-            print(f"⚠️  Reached maximum request limit ({self.max_requests})")
+            return False
+        return self.quota_remaining is None or self.quota_remaining > 0
+
+    async def make_request_async(self, endpoint: str, params: Dict[str, Any]) -> Optional[Dict]:
+        """Make an API request through the token bucket, honoring the API's backoff and quota"""
+        if not self.has_quota():
+            print(f"⚠️  Reached request limit (requests: {self.request_count}/{self.max_requests}, quota remaining: {self.quota_remaining})")
             return None
         
+        if self.rate_limiter is None:
+            # Replayed fixtures need no rate limiting
+            rate = float("inf") if self.http_mode == "replay" else 1 / self.rate_limit_delay
+            self.rate_limiter = TokenBucket(rate=rate, capacity=5)
+        await self.rate_limiter.acquire(endpoint)
+        
         # Add API key if available
         if self.api_key:
             params["key"] = self.api_key
         
         try:
             url = f"{self.base_url}/{endpoint}"
-            response = self.session.get(url, params=params, timeout=30)
+            # requests is blocking; run it in a worker thread so other tags keep going
+            status_code, text = await asyncio.to_thread(self.transport.get, url, params)
             
             self.request_count += 1
             
-            if response.status_code == 200:
-                data = response.json()
+            if status_code == 200:
+                data = json.loads(text)
                 
                 # Check for API errors
                 if "error_id" in data:
                     print(f"❌ API Error: {data.get('error_message', 'Unknown error')}")
                     return None
                 
-                # Check rate limiting
+                if "quota_remaining" in data:
+                    self.quota_remaining = data["quota_remaining"]
+                
+                # Rate limiting: the API asks us not to call this method again for "backoff" seconds
                 if "backoff" in data:
                     backoff_time = data["backoff"]
-                    print(f"⏳ Rate limited, waiting {backoff_time} seconds...")
-                    time.sleep(backoff_time)
+                    print(f"⏳ Backoff requested for /{endpoint}: {backoff_time} seconds")
+                    self.rate_limiter.pause(endpoint, backoff_time)
                 
                 return data
             else:
-                print(f"❌ HTTP Error {response.status_code}: {response.text}")
+                print(f"❌ HTTP Error {status_code}: {text}")
                 return None
                 
         except requests.exceptions.RequestException as e:
@@ -117,8 +261,18 @@ class StackOverflowScraper:
         except json.JSONDecodeError as e:
             print(f"❌ JSON decode error: {e}")
             return None
+
+    def make_request(self, endpoint: str, params: Dict[str, Any]) -> Optional[Dict]:
+        """Make API request with rate limiting and error handling"""
+        return asyncio.run(self._run_with_fresh_limiter(self.make_request_async(endpoint, params)))
+
+    async def _run_with_fresh_limiter(self, coroutine):
+        # asyncio primitives are bound to the loop that created them
+        self.rate_limiter = None
+        try:
+            return await coroutine
         finally:
-            time.sleep(self.rate_limit_delay)
+            self.rate_limiter = None
 
     def save_questions_continuously(self, questions: List[Dict], language: str):
         """Save questions to language-specific file continuously"""
@@ -134,21 +288,26 @@ class StackOverflowScraper:
         except Exception as e:
             print(f"❌ Error saving questions for {language}: {e}")
 
-    def fetch_questions(self, tag: str, pagesize: int = 100, max_pages: Optional[int] = None) -> List[Dict]:
-        """Fetch questions for a specific language tag with continuous saving"""
+    async def fetch_questions_async(self, tag: str, pagesize: int = 100, max_pages: Optional[int] = None) -> List[Dict]:
+        """Fetch questions for a language tag, resuming from its cursor and saving every page"""
         all_data = []
         
         # Calculate max pages based on requests per language
         if max_pages is None:
             max_pages = self.requests_per_language
         
-        print(f"\n🔍 Fetching {tag} questions...")
+        cursor = self.cursors.setdefault(tag, {"next_page": 1, "done": False})
+        if cursor.get("done"):
+            print(f"✅ {tag}: already complete (cursor), skipping")
+            return all_data
+        first_page = cursor.get("next_page", 1)
+        
+        print(f"\n🔍 Fetching {tag} questions from page {first_page}...")
         print(f"   Max pages: {max_pages}")
         print(f"   Page size: {pagesize}")
-        print(f"   Expected questions: {max_pages * pagesize}")
         
-        for page in range(1, max_pages + 1):
-            if self.request_count >= self.max_requests:
+        for page in range(first_page, max_pages + 1):
+            if not self.has_quota():
                 print(f"⚠️  Reached request limit while fetching {tag}")
                 break
             
@@ -162,7 +321,7 @@ class StackOverflowScraper:
                 "page": page
             }
             
-            data = self.make_request("questions", params)
+            data = await self.make_request_async("questions", params)
             
             if not data or "items" not in data:
                 print(f"⚠️  No data received for {tag} page {page}")
@@ -171,6 +330,8 @@ class StackOverflowScraper:
             items = data.get("items", [])
             if not items:
                 print(f"✅ No more questions for {tag} (page {page})")
+                cursor["done"] = True
+                self.save_cursors()
                 break
             
             # Process and save this page's questions immediately
@@ -189,10 +350,13 @@ class StackOverflowScraper:
                 page_questions.append(question_data)
                 all_data.append(question_data)
             
-            # Save this page's questions immediately
+            # Save this page's questions immediately, then move the cursor past it
             self.save_questions_continuously(page_questions, tag)
+            cursor["next_page"] = page + 1
+            cursor["done"] = not data.get("has_more", False)
+            self.save_cursors()
             
-            print(f"   📄 Page {page}: {len(items)} questions (Total: {len(all_data)})")
+            print(f"   📄 {tag} page {page}: {len(items)} questions (Total: {len(all_data)})")
             
             # Check if we have more pages
             if not data.get("has_more", False):
@@ -202,43 +366,39 @@ class StackOverflowScraper:
         print(f"✅ Fetched {len(all_data)} questions for {tag}")
         return all_data
 
-    def fetch_all_languages(self) -> List[Dict]:
-        """Fetch questions for all languages with continuous saving"""
+    def fetch_questions(self, tag: str, pagesize: int = 100, max_pages: Optional[int] = None) -> List[Dict]:
+        """Fetch questions for a specific language tag with continuous saving"""
+        return asyncio.run(self._run_with_fresh_limiter(self.fetch_questions_async(tag, pagesize, max_pages)))
+
+    async def fetch_all_languages_async(self) -> List[Dict]:
+        """Fetch all language tags concurrently (max_concurrent_tags at a time), sharing one rate limiter"""
         all_questions = []
         start_time = datetime.now()
+        semaphore = asyncio.Semaphore(self.max_concurrent_tags)
+        completed = 0
         
         print(f"\n🚀 Starting data collection at {start_time.strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"📊 Requests used: {self.request_count}/{self.max_requests}")
         
-        for i, language in enumerate(self.languages, 1):
-            print(f"\n{'='*60}")
-            print(f"🌐 Language {i}/{len(self.languages)}: {language}")
-            print(f"{'='*60}")
-            
-            try:
-                questions = self.fetch_questions(tag=language)
-                all_questions.extend(questions)
-                
-                # Progress update
-                elapsed = datetime.now() - start_time
-                remaining_languages = len(self.languages) - i
-                avg_time_per_lang = elapsed / i if i > 0 else 0
-                estimated_remaining = avg_time_per_lang * remaining_languages
-                
-                print(f"📊 Progress: {i}/{len(self.languages)} languages")
-                print(f"📊 Total questions: {len(all_questions)}")
-                print(f"📊 Requests used: {self.request_count}/{self.max_requests}")
-                print(f"⏱️  Elapsed: {elapsed}")
-                print(f"⏱️  Estimated remaining: {estimated_remaining}")
-                
-                if self.request_count >= self.max_requests:
-                    print("⚠️  Reached maximum request limit")
-                    break
-                    
-            except Exception as e:
-                print(f"❌ Error fetching {language}: {e}")
-                print(f"⚠️  Continuing with next language...")
-                continue
+        async def fetch_language(language):
+            nonlocal completed
+            async with semaphore:
+                if not self.has_quota():
+                    return []
+                try:
+                    questions = await self.fetch_questions_async(tag=language)
+                except Exception as e:
+                    print(f"❌ Error fetching {language}: {e}")
+                    print(f"⚠️  Continuing with other languages...")
+                    return []
+                completed += 1
+                print(f"📊 Progress: {completed}/{len(self.languages)} languages, "
+                      f"requests used: {self.request_count}/{self.max_requests}, quota remaining: {self.quota_remaining}")
+                return questions
+        
+        results = await asyncio.gather(*(fetch_language(language) for language in self.languages))
+        for questions in results:
+            all_questions.extend(questions)
         
         end_time = datetime.now()
         total_time = end_time - start_time
@@ -252,8 +412,12 @@ class StackOverflowScraper:
         
         return all_questions
 
-    def process_language_data(self, language: str):
-        """Process raw data for a specific language"""
+    def fetch_all_languages(self) -> List[Dict]:
+        """Fetch questions for all languages with continuous saving"""
+        return asyncio.run(self._run_with_fresh_limiter(self.fetch_all_languages_async()))
+
+    def process_language_data(self, language: str, processes: Optional[int] = None):
+        """Process raw data for a specific language (parallel workers, output in input order)"""
         raw_file = os.path.join(self.raw_data_dir, f"{language}_raw_data.jsonl")
         processed_file = os.path.join(self.processed_data_dir, f"{language}_code_text_pairs.jsonl")
         
@@ -261,55 +425,30 @@ class StackOverflowScraper:
             print(f"⚠️  No raw data file found for {language}")
             return
         
-        print(f"\n🔄 Processing {language} data...")
+        print(f"\n🔄 Processing {language} data ({HTML_PARSER} parser)...")
         
         processed_count = 0
         skipped_count = 0
         
         try:
             with open(raw_file, "r", encoding="utf-8") as infile, \
-                 open(processed_file, "w", encoding="utf-8") as outfile:
-
-                for line_num, line in enumerate(infile, 1):
-                    try:
-                        data = json.loads(line)
-                        body = data.get("body", "")
-                        
-                        if not body.strip():
-                            skipped_count += 1
-                            continue
-
-                        segments = self.extract_code_and_text(body)
-
-                        # Skip if no segments found
-                        if not segments:
-                            skipped_count += 1
-                            continue
-
-                        result = {
-                            "raw_content": body.strip(),
-                            "language": language,
-                            "question_id": data.get("question_id"),
-                            "title": data.get("title"),
-                            "score": data.get("score", 0),
-                            "answer_count": data.get("answer_count", 0),
-                            "view_count": data.get("view_count", 0),
-                            "creation_date": data.get("creation_date", 0),
-                            "segments": segments
-                        }
-
-                        outfile.write(json.dumps(result, ensure_ascii=False) + "\n")
-                        processed_count += 1
-                        
-                        if line_num % 100 == 0:
-                            print(f"   📄 Processed {line_num} lines...")
-                            
-                    except json.JSONDecodeError as e:
-                        print(f"❌ JSON error on line {line_num}: {e}")
+                 open(processed_file, "w", encoding="utf-8") as outfile, \
+                 multiprocessing.Pool(processes=processes) as pool:
+                
+                tasks = ((line_num, line, language) for line_num, line in enumerate(infile, 1))
+                # imap keeps the input order while workers parse ahead
+                for line_num, output, error in pool.imap(_process_raw_line_safe, tasks, chunksize=64):
+                    if error:
+                        print(f"❌ {error} (line {line_num})")
                         skipped_count += 1
-                    except Exception as e:
-                        print(f"❌ Error processing line {line_num}: {e}")
+                    elif output is None:
                         skipped_count += 1
+                    else:
+                        outfile.write(output + "\n")
+                        processed_count += 1
+                    
+                    if line_num % 1000 == 0:
+                        print(f"   📄 Processed {line_num} lines...")
             
             print(f"✅ {language} processing completed!")
             print(f"📊 Processed: {processed_count} items")
@@ -331,39 +470,7 @@ class StackOverflowScraper:
 
     def extract_code_and_text(self, html: str) -> List[Dict]:
         """Extract code and text segments from HTML"""
-        soup = BeautifulSoup(html, "html.parser")
-        segments = []
-        code_texts = set()  # Track code texts to avoid duplicates
-        
-        # First pass: extract all code segments
-        for elem in soup.descendants:
-            if elem.name == "code" and len(elem.get_text().strip().split()) > 1:
-                text = elem.get_text().strip()
-                if text and text not in code_texts:
-                    segments.append({"type": "CODE", "text": text})
-                    code_texts.add(text)
-            elif elem.name == "pre" and len(elem.get_text().strip().split()) > 1:
-                text = elem.get_text().strip()
-                if text and text not in code_texts:
-                    segments.append({"type": "CODE", "text": text})
-                    code_texts.add(text)
-        
-        # Second pass: extract text segments, excluding code
-        for elem in soup.descendants:
-            if elem.name is None and elem.string:
-                text = elem.string.strip()
-                if text and text not in code_texts:
-                    # Check if this text is not part of any code block
-                    is_part_of_code = False
-                    for code_text in code_texts:
-                        if text in code_text or code_text in text:
-                            is_part_of_code = True
-                            break
-                    
-                    if not is_part_of_code:
-                        segments.append({"type": "TEXT", "text": text})
-
-        return segments
+        return extract_segments(html)
 
     def get_data_statistics(self):
         """Get comprehensive statistics about all processed data"""
@@ -472,7 +579,14 @@ class StackOverflowScraper:
 
 def main():
     """Main function to run the scraper"""
-    scraper = StackOverflowScraper()
+    # --record DIR saves every HTTP response as a fixture; --replay DIR runs offline from them
+    http_mode, fixtures_dir = "live", None
+    for mode in ("record", "replay"):
+        if f"--{mode}" in sys.argv:
+            http_mode = mode
+            index = sys.argv.index(f"--{mode}")
+            fixtures_dir = sys.argv[index + 1] if index + 1 < len(sys.argv) else None
+    scraper = StackOverflowScraper(http_mode=http_mode, fixtures_dir=fixtures_dir)
     
     # Try to load API key
     if not scraper.load_api_key():
@@ -487,6 +601,9 @@ def main():
     # Process all language data
     scraper.process_all_languages()
     
+    # Remove exact and near duplicates and assign cluster-grouped train/test splits
+    CorpusDeduplicator(scraper.processed_data_dir, scraper.dedup_data_dir).run()
+    
     # Display comprehensive statistics
     scraper.get_data_statistics()
     
@@ -1,17 +1,97 @@
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import torch
 import os
+import hashlib
+import threading
+from src.services.code_classifier.prediction_cache import PredictionCache, DEFAULT_CACHE_PATH
+from src.services.code_classifier.student_model import CharNgramClassifier
+from src.services.code_classifier.long_blocks import LONG_BLOCK_CHARS, WINDOW_CHARS, MAX_SEQUENCE_LENGTH, sample_windows
+
+# Blocks of different shapes run once at load, so lazy initialization doesn't hit the first real copy
+WARMUP_TEXTS = (
+    "def add(a, b):\n    return a + b",
+    "Thanks, that fixed it. The meeting moved to Thursday afternoon.",
+    "for (int i = 0; i < items.size(); i++) { total += items.get(i).getPrice(); } " * 8,
+)
 
 class CodeClassifier:
-    def __init__(self, model_path="./src/services/code_classifier/model_data_fetch/model/saved_model"):
+    def __init__(self, model_path="./src/services/code_classifier/model_data_fetch/model/saved_model",
+                 cache_size=2048, cache_path=DEFAULT_CACHE_PATH, intra_op_threads=None, inter_op_threads=None,
+                 batch_size=8, warmup=True):
         # Convert to absolute path to avoid path interpretation issues
         if not os.path.isabs(model_path):
             model_path = os.path.abspath(model_path)
         
+        # Thread pools are sized before the first inference (None keeps the torch defaults)
+        self._configure_threads(intra_op_threads, inter_op_threads)
+        
+        # Distilled student exported by ModelTrainer.run_distillation (no tokenizer needed)
+        self.student = None
+        if CharNgramClassifier.is_saved_model(model_path):
+            self.student = CharNgramClassifier.load(model_path)
+            self.tokenizer = None
+            self.model = self.student
+            self.model_version = self._compute_model_version(model_path)
+            print(f"Successfully loaded distilled student model from: {model_path}")
+        else:
+            self._load_transformer(model_path)
+        self.model.eval()
+        
+        # Tokenizer output is copied into these buffers instead of allocating new tensors per call;
+        # a batch uses the [:rows, :longest] view of them
+        self.batch_size = max(1, batch_size)
+        self._input_ids = None
+        self._attention_mask = None
+        if self.tokenizer is not None:
+            self._input_ids = torch.zeros((self.batch_size, MAX_SEQUENCE_LENGTH), dtype=torch.long)
+            self._attention_mask = torch.zeros((self.batch_size, MAX_SEQUENCE_LENGTH), dtype=torch.long)
+        # Serializes inference: the buffers are shared, and a real call waits for the warm-up instead of racing it
+        self._inference_lock = threading.Lock()
+        
+        # Predictions of recurring blocks, keyed by normalized block hash and model version
+        # (cache_path=None keeps the cache in memory only)
+        # The windowing limits are part of the version: they change what a long block's prediction is
+        self.prediction_cache = PredictionCache(f"{self.model_version}:windows={LONG_BLOCK_CHARS}/{WINDOW_CHARS}",
+                                                max_entries=cache_size, db_path=cache_path)
+        
+        self._ready = threading.Event()
+        if warmup:
+            threading.Thread(target=self._warmup, name="CodeClassifierWarmup", daemon=True).start()
+        else:
+            self._ready.set()
+
+    @staticmethod
+    def _configure_threads(intra_op_threads, inter_op_threads):
+        """Apply the intra/inter-op thread counts (process-wide torch settings)"""
+        if intra_op_threads:
+            torch.set_num_threads(intra_op_threads)
+        if inter_op_threads:
+            try:
+                torch.set_num_interop_threads(inter_op_threads)
+            except RuntimeError as e:
+                # Only settable once, before any inter-op work has started in the process
+                print(f"⚠️ Could not set inter-op threads to {inter_op_threads}: {e}")
+
+    def _warmup(self):
+        """Run full-size and small batches through the model once, bypassing the prediction cache"""
+        try:
+            self._predict_uncached(list(WARMUP_TEXTS[:1]))
+            self._predict_uncached([WARMUP_TEXTS[i % len(WARMUP_TEXTS)] for i in range(self.batch_size)])
+        except Exception as e:
+            print(f"⚠️ Code classifier warm-up failed: {e}")
+        finally:
+            self._ready.set()
+
+    def wait_until_ready(self, timeout=None) -> bool:
+        """Block until the warm-up pass has finished; False if timeout expired first"""
+        return self._ready.wait(timeout)
+
+    def _load_transformer(self, model_path: str):
         try:
             # Try to load the trained model and tokenizer
             self.tokenizer = AutoTokenizer.from_pretrained(pretrained_model_name_or_path=model_path, local_files_only=True)
             self.model = AutoModelForSequenceClassification.from_pretrained(pretrained_model_name_or_path=model_path, local_files_only=True)
+            self.model_version = self._compute_model_version(model_path)
             print(f"Successfully loaded trained model from: {model_path}")
         except Exception as e:
             print(f"Failed to load trained model from {model_path}: {e}")
@@ -19,37 +99,101 @@ class CodeClassifier:
             # Fallback to base model
             self.tokenizer = AutoTokenizer.from_pretrained(pretrained_model_name_or_path="distilbert-base-uncased", local_files_only=True)
             self.model = AutoModelForSequenceClassification.from_pretrained(pretrained_model_name_or_path="distilbert-base-uncased", local_files_only=True)
+            self.model_version = "distilbert-base-uncased"
+
+    @staticmethod
+    def _compute_model_version(model_path: str) -> str:
+        """Identify the saved model by its files' names, sizes and modification times"""
+        digest = hashlib.sha1(os.path.normcase(model_path).encode('utf-8'))
+        for name in sorted(os.listdir(model_path)):
+            stat = os.stat(os.path.join(model_path, name))
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8'))
+        return digest.hexdigest()
 
     def is_code(self, text: str) -> bool:
-        inputs = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=256)
-        with torch.no_grad():
-            logits = self.model(**inputs).logits
-        predicted = torch.argmax(logits, dim=-1).item()
-        return predicted == 1
+        return self.predict_with_confidence(text)["is_code"]
 
     def predict(self, text: str) -> bool:
-        inputs = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=256)
-        with torch.no_grad():
-            logits = self.model(**inputs).logits
-        predicted = torch.argmax(logits, dim=-1).item()
-        return predicted == 1
+        return self.predict_with_confidence(text)["is_code"]
     
     def predict_with_confidence(self, text: str) -> dict:
-        """Predict with confidence scores"""
-        inputs = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=256)
-        with torch.no_grad():
-            logits = self.model(**inputs).logits
-            probabilities = torch.softmax(logits, dim=-1)
-        
-        predicted = torch.argmax(logits, dim=-1).item()
-        confidence = probabilities[0][predicted].item()
+        """Predict with confidence scores; recurring blocks are answered from the prediction cache"""
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts: list) -> list:
+        """
+        Predict several blocks; cached blocks are answered from the prediction cache and the
+        rest run through the model in batches of at most batch_size.
+        Blocks over LONG_BLOCK_CHARS are classified by their sampled windows (see _predict_long_block).
+        """
+        results = [None] * len(texts)
+        keys = [self.prediction_cache.make_key(text) for text in texts]
+        pending = []
+        for i, key in enumerate(keys):
+            cached = self.prediction_cache.get(key)
+            if cached is not None:
+                results[i] = cached
+            elif len(texts[i]) > LONG_BLOCK_CHARS:
+                results[i] = self._predict_long_block(texts[i])
+                self.prediction_cache.put(key, results[i])
+            else:
+                pending.append(i)
         
+        for start in range(0, len(pending), self.batch_size):
+            chunk = pending[start:start + self.batch_size]
+            probabilities = self._predict_uncached([texts[i] for i in chunk])
+            for row, i in enumerate(chunk):
+                results[i] = self._make_result(probabilities[row][1].item())
+                self.prediction_cache.put(keys[i], results[i])
+        return results
+
+    @staticmethod
+    def _make_result(code_probability: float) -> dict:
+        is_code = code_probability > 0.5
         return {
-            "prediction": "CODE" if predicted == 1 else "TEXT",
-            "confidence": confidence,
-            "is_code": predicted == 1
+            "prediction": "CODE" if is_code else "TEXT",
+            "confidence": code_probability if is_code else 1.0 - code_probability,
+            "is_code": is_code
         }
 
+    def _predict_long_block(self, text: str) -> dict:
+        """
+        Classify a long block by its head, middle and tail windows in one batch, so the cost doesn't
+        grow with the block's length. The CODE probability is the windows' mean; "mixed" is set when
+        the windows disagree, i.e. the block likely holds both code and prose.
+        """
+        windows = sample_windows(text)
+        code_probabilities = []
+        for start in range(0, len(windows), self.batch_size):
+            code_probabilities.extend(self._predict_uncached(windows[start:start + self.batch_size])[:, 1].tolist())
+        result = self._make_result(sum(code_probabilities) / len(code_probabilities))
+        result["windows"] = len(windows)
+        result["mixed"] = len({p > 0.5 for p in code_probabilities}) > 1
+        return result
+
+    def _predict_uncached(self, texts: list):
+        """Class probabilities (TEXT, CODE) for at most batch_size texts"""
+        with self._inference_lock, torch.inference_mode():
+            if self.student is not None:
+                return self.student.predict_proba(texts)
+            
+            encoded = self.tokenizer(texts, truncation=True, max_length=MAX_SEQUENCE_LENGTH)
+            rows = len(texts)
+            longest = max(len(ids) for ids in encoded["input_ids"])
+            input_ids = self._input_ids[:rows, :longest]
+            attention_mask = self._attention_mask[:rows, :longest]
+            input_ids.fill_(self.tokenizer.pad_token_id or 0)
+            attention_mask.zero_()
+            for row, ids in enumerate(encoded["input_ids"]):
+                input_ids[row, :len(ids)] = torch.as_tensor(ids, dtype=torch.long)
+                attention_mask[row, :len(ids)] = 1
+            logits = self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+            return torch.softmax(logits, dim=-1)
+
+    def get_cache_statistics(self) -> dict:
+        """Return prediction cache size and hit/miss counters"""
+        return self.prediction_cache.get_statistics()
+
 if __name__ == "__main__":
     classifier = CodeClassifier()
     test_texts = [
@@ -69,3 +213,4 @@ if __name__ == "__main__":
     for t in test_texts:
         result = classifier.predict_with_confidence(t)
         print(f"{result}")
+    print(f"Prediction cache: {classifier.get_cache_statistics()}")
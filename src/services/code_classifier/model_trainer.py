@@ -1,107 +1,103 @@
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, Trainer, TrainingArguments
+from transformers import AutoTokenizer, AutoModelForSequenceClassification, Trainer, TrainingArguments, DataCollatorWithPadding, EarlyStoppingCallback
+from transformers.trainer_utils import get_last_checkpoint
 import torch
 import os
-import datasets
+import sys
 import json
-import glob
+import shutil
+import hashlib
+import time
+import random
 from typing import List, Dict, Any
+from src.services.code_classifier.model_predictor import CodeClassifier
+from src.services.code_classifier.long_blocks import MAX_SEQUENCE_LENGTH
+from src.services.code_classifier.cascade import CodeClassifierCascade
+from src.services.code_classifier.student_model import CharNgramClassifier
+from src.services.code_classifier.dataset_shards import DatasetShardLoader
+from src.services.checkers.manual_code_checker import ManualCodeChecker
+
+# Written next to the promoted model: eval metrics, latency and training details
+METRICS_MANIFEST_NAME = "metrics_manifest.json"
+# Written in checkpoint_dir: which data the checkpoints belong to and whether their run finished
+RUN_INFO_NAME = "run_info.json"
 
 class ModelTrainer:
     def __init__(self, model_name="distilbert-base-uncased", 
                  save_dir="model/saved_model", 
-                 data_dir="model/data/code_text_pairs"):
+                 data_dir="model/data/code_text_pairs",
+                 cache_dir=None,
+                 checkpoint_dir=None):
         self.model_name = model_name
         self.save_dir = save_dir
         self.data_dir = data_dir
+        # Trainer checkpoints live outside save_dir so an interrupted run never touches the promoted model
+        self.checkpoint_dir = checkpoint_dir or os.path.join(os.path.dirname(os.path.abspath(save_dir)), "checkpoints")
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        # Parsed/tokenized Arrow shards per language file (default: model/data/cache)
+        self.shard_loader = DatasetShardLoader(data_dir, cache_dir)
 
-    def load_data_from_directory(self):
-        """Load data from all language files in the data directory"""
-        texts, labels = [], []
-        
-        # Find all language files
-        pattern = os.path.join(self.data_dir, "*_code_text_pairs.jsonl")
-        language_files = glob.glob(pattern)
-        
-        if not language_files:
+    def load_dataset(self, tokenize=False):
+        """
+        Load all language files as one memory-mapped Arrow dataset with "text" and "label"
+        (CODE=1, TEXT=0) columns, plus the tokenizer columns if tokenize is True.
+        Files are parsed in parallel into cached shards; unchanged files are not parsed again.
+        """
+        stats = self.shard_loader.get_statistics()
+        if not stats["languages"]:
+            pattern = os.path.join(self.data_dir, "*_code_text_pairs.jsonl")
             print(f"❌ No data files found in {self.data_dir}")
             print(f"💡 Expected pattern: {pattern}")
-            return []
-        
-        print(f"📁 Found {len(language_files)} language files:")
-        for file in language_files:
-            print(f"   - {os.path.basename(file)}")
-        
-        total_questions = 0
-        total_segments = 0
-        
-        for file_path in language_files:
-            language = os.path.basename(file_path).replace("_code_text_pairs.jsonl", "")
-            print(f"\n📖 Loading {language} data from {os.path.basename(file_path)}...")
-            
-            file_questions = 0
-            file_segments = 0
-            
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    for line_num, line in enumerate(f, 1):
-                        try:
-                            data = json.loads(line.strip())
-                            segments = data.get("segments", [])
-                            
-                            file_questions += 1
-                            file_segments += len(segments)
-                            
-                            # Extract each segment as a separate training example
-                            for segment in segments:
-                                text = segment.get("text", "").strip()
-                                segment_type = segment.get("type", "TEXT")
-                                
-                                # Skip empty text
-                                if not text:
-                                    continue
-                                
-                                # Convert segment type to label (CODE=1, TEXT=0)
-                                label = 1 if segment_type == "CODE" else 0
-                                
-                                texts.append(text)
-                                labels.append(label)
-                                
-                        except json.JSONDecodeError as e:
-                            print(f"⚠️  Warning: Skipping invalid JSON line {line_num} in {language}: {e}")
-                            continue
-                        except Exception as e:
-                            print(f"⚠️  Warning: Error processing line {line_num} in {language}: {e}")
-                            continue
-                
-                total_questions += file_questions
-                total_segments += file_segments
-                
-                print(f"   ✅ {language}: {file_questions} questions, {file_segments} segments")
-                
-            except Exception as e:
-                print(f"❌ Error loading {language} data: {e}")
-                continue
+            return None
+        
+        print(f"📁 Found {len(stats['languages'])} language files:")
+        for language_stats in stats["languages"]:
+            print(f"   - {language_stats['language']}: {language_stats['questions']} questions, "
+                  f"{language_stats['segments']} segments")
+            if language_stats["errors"]:
+                print(f"⚠️  Warning: Skipped {language_stats['errors']} invalid JSON lines in {language_stats['language']}")
         
+        total = stats["total"]
         print(f"\n📊 Data Loading Summary:")
-        print(f"   Total questions: {total_questions:,}")
-        print(f"   Total segments: {total_segments:,}")
-        print(f"   Training examples: {len(texts):,}")
-        print(f"   Code examples: {sum(labels):,}")
-        print(f"   Text examples: {len(labels) - sum(labels):,}")
+        print(f"   Total questions: {total['questions']:,}")
+        print(f"   Total segments: {total['segments']:,}")
+        print(f"   Training examples: {total['examples']:,}")
+        print(f"   Code examples: {total['code_examples']:,}")
+        print(f"   Text examples: {total['examples'] - total['code_examples']:,}")
         
-        if len(texts) == 0:
+        if total["examples"] == 0:
             print("❌ No training data found!")
-            return []
+            return None
         
-        return [{"text": t, "label": l} for t, l in zip(texts, labels)]
+        if tokenize:
+            return self.shard_loader.load_tokenized_dataset(self.tokenize_batch, self.get_tokenizer_fingerprint())
+        return self.shard_loader.load_dataset()
+
+    def load_data_from_directory(self):
+        """Load data from all language files as a list of {"text", "label"} dicts"""
+        dataset = self.load_dataset()
+        return dataset.to_list() if dataset is not None else []
 
     def load_data(self):
         """Backward compatibility method - now uses directory loading"""
         return self.load_data_from_directory()
 
     def tokenize_batch(self, batch):
-        return self.tokenizer(batch["text"], padding=True, truncation=True, max_length=256)
+        # No padding here: the collator pads each batch to its own longest member.
+        # "length" feeds the length-grouped sampler.
+        encoded = self.tokenizer(batch["text"], truncation=True, max_length=MAX_SEQUENCE_LENGTH)
+        encoded["length"] = [len(ids) for ids in encoded["input_ids"]]
+        return encoded
+
+    def get_tokenizer_fingerprint(self):
+        """Hash of everything that changes tokenize_batch output: tokenizer class, vocabulary, settings and max length"""
+        digest = hashlib.sha1()
+        digest.update(type(self.tokenizer).__name__.encode("utf-8"))
+        digest.update(json.dumps(sorted(self.tokenizer.get_vocab().items())).encode("utf-8"))
+        # File locations differ between machines and don't change the output
+        settings = {k: v for k, v in self.tokenizer.init_kwargs.items() if not k.endswith("_file") and k != "name_or_path"}
+        digest.update(json.dumps(settings, sort_keys=True, default=str).encode("utf-8"))
+        digest.update(f"max_length={MAX_SEQUENCE_LENGTH}:unpadded:length".encode("utf-8"))
+        return digest.hexdigest()
     
     def get_optimal_batch_size(self):
         """Determine optimal batch size based on GPU memory"""
@@ -117,7 +113,30 @@ class ModelTrainer:
         else:  # Smaller GPU
             return 8
 
-    def run(self):
+    def compute_metrics(self, eval_pred):
+        """Accuracy, precision, recall and F1 (CODE = positive class) for Trainer evaluation"""
+        logits, labels = eval_pred
+        predictions = torch.as_tensor(logits).argmax(dim=-1)
+        labels = torch.as_tensor(labels)
+        true_positives = int(((predictions == 1) & (labels == 1)).sum())
+        false_positives = int(((predictions == 1) & (labels == 0)).sum())
+        false_negatives = int(((predictions == 0) & (labels == 1)).sum())
+        precision = true_positives / (true_positives + false_positives) if true_positives + false_positives else 0.0
+        recall = true_positives / (true_positives + false_negatives) if true_positives + false_negatives else 0.0
+        return {
+            "accuracy": float((predictions == labels).float().mean()) if len(labels) else 0.0,
+            "precision": precision,
+            "recall": recall,
+            "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        }
+
+    def run(self, epochs=10, early_stopping_patience=2, resume=True, force_promote=False):
+        """
+        Fine-tune with per-epoch evaluation, keeping the best epoch by eval F1 and stopping after
+        early_stopping_patience epochs without improvement. An interrupted run resumes from its
+        latest checkpoint. The result replaces save_dir only if it beats the promoted model;
+        a promoted model that can't be loaded or evaluated is kept unless force_promote is set.
+        """
         # Check GPU availability
         device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         print(f"🚀 Using device: {device}")
@@ -125,17 +144,23 @@ class ModelTrainer:
             print(f"📊 GPU: {torch.cuda.get_device_name(0)}")
             print(f"💾 GPU Memory: {torch.cuda.get_device_properties(0).total_memory / 1024**3:.1f} GB")
         
-        # Load data from organized directory structure
-        data = self.load_data_from_directory()
+        self._recover_interrupted_promote()
+        
+        # Load tokenized, memory-mapped shards (only new or changed files are parsed and tokenized)
+        dataset = self.load_dataset(tokenize=True)
         
-        if not data:
+        if dataset is None:
             print("❌ No training data available. Please run the scraper first.")
             return
         
-        # Create train/test split
-        dataset_dict = datasets.Dataset.from_list(data).train_test_split(test_size=0.2)
-        dataset_dict = dataset_dict.map(self.tokenize_batch, batched=True)
-        dataset_dict.set_format("torch", columns=["input_ids", "attention_mask", "label"])
+        # Create train/test split (seeded, so a resumed run and the promote check see the same split)
+        # (deduplicated data uses its cluster-grouped split instead)
+        dataset_dict = self.shard_loader.split_dataset(dataset, test_size=0.2, seed=42)
+        latency_texts = dataset_dict["test"].select(range(min(200, len(dataset_dict["test"]))))["text"]
+        # The collator builds the tensors, so no torch format is needed
+        dataset_dict = dataset_dict.remove_columns([c for c in ("text", "split") if c in dataset_dict["train"].column_names])
+        # Evaluation order doesn't matter: sorting by length keeps each eval batch's padding minimal
+        dataset_dict["test"] = dataset_dict["test"].sort("length")
 
         model = AutoModelForSequenceClassification.from_pretrained(self.model_name, num_labels=2)
         # Move model to GPU if available
@@ -145,22 +170,36 @@ class ModelTrainer:
         optimal_batch_size = self.get_optimal_batch_size()
         print(f"📦 Using batch size: {optimal_batch_size}")
         
+        # "evaluation_strategy" was renamed to "eval_strategy" in newer transformers releases
+        eval_strategy_argument = "eval_strategy" if "eval_strategy" in TrainingArguments.__dataclass_fields__ else "evaluation_strategy"
         training_args = TrainingArguments(
-            output_dir=self.save_dir,
+            output_dir=self.checkpoint_dir,
             per_device_train_batch_size=optimal_batch_size,
             per_device_eval_batch_size=optimal_batch_size,
-            num_train_epochs=3,
+            num_train_epochs=epochs,
             save_strategy="epoch",
+            save_total_limit=2,  # Latest and best checkpoint
+            # Evaluate every epoch and reload the best epoch when training ends
+            **{eval_strategy_argument: "epoch"},
+            load_best_model_at_end=True,
+            metric_for_best_model="f1",
+            greater_is_better=True,
             logging_dir="./logs",
             logging_steps=100,
             # GPU/CUDA settings
             no_cuda=False,  # Enable CUDA
-            dataloader_pin_memory=True,  # Faster data loading with GPU
+            dataloader_pin_memory=torch.cuda.is_available(),  # Faster data loading with GPU
             dataloader_num_workers=2,  # Parallel data loading
             # Memory optimization
             gradient_accumulation_steps=2,  # Accumulate gradients for larger effective batch size
             fp16=torch.cuda.is_available(),  # Use mixed precision if GPU available
+            # Batches of similar-length examples, so dynamic padding adds few pad tokens
+            group_by_length=True,
+            length_column_name="length",
         )
+        
+        # Pads each batch to its longest member (to a multiple of 8 for tensor cores on GPU)
+        data_collator = DataCollatorWithPadding(self.tokenizer, pad_to_multiple_of=8 if torch.cuda.is_available() else None)
 
         trainer = Trainer(
             model=model,
@@ -168,87 +207,333 @@ class ModelTrainer:
             train_dataset=dataset_dict["train"],
             eval_dataset=dataset_dict["test"],
             tokenizer=self.tokenizer,
+            data_collator=data_collator,
+            compute_metrics=self.compute_metrics,
+            callbacks=[EarlyStoppingCallback(early_stopping_patience=early_stopping_patience)],
         )
 
-        trainer.train()
-        model.save_pretrained(self.save_dir)
-        self.tokenizer.save_pretrained(self.save_dir)
-        print(f"✅ Model saved to {self.save_dir}")
+        last_checkpoint = self._prepare_checkpoint_dir(dataset._fingerprint, resume)
+        if last_checkpoint:
+            print(f"⏯️  Resuming from checkpoint: {last_checkpoint}")
+        trainer.train(resume_from_checkpoint=last_checkpoint)
+        self._write_run_info(dataset._fingerprint, completed=True)
+        
+        try:
+            return self._finish_run(trainer, dataset, dataset_dict, latency_texts, force_promote)
+        finally:
+            # Promoted or rejected, the run is over; its checkpoints must not be resumed
+            shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+
+    def _finish_run(self, trainer, dataset, dataset_dict, latency_texts, force_promote=False):
+        """Evaluate the trained model against the promoted one and promote it if it is better"""
+        # Best epoch is loaded; evaluate it and the currently promoted model on the same split
+        metrics = trainer.evaluate()
+        metrics["mean_latency_ms"] = self._measure_latency(trainer.model, latency_texts)
+        print(f"📊 New model: accuracy {metrics['eval_accuracy']:.2%}, F1 {metrics['eval_f1']:.4f}, "
+              f"{metrics['mean_latency_ms']:.2f} ms/block")
+        
+        try:
+            current_metrics = self._evaluate_promoted_model(trainer)
+        except Exception as e:
+            # E.g. a distilled student export: without a comparison it must not be overwritten silently
+            print(f"⚠️  Could not evaluate the promoted model in {self.save_dir}: {e}")
+            if not force_promote:
+                print("⏭️  Keeping it; run with force_promote=True to replace it anyway")
+                return metrics
+            print("⚠️  force_promote is set; replacing it without a comparison")
+            current_metrics = None
+        if current_metrics is not None:
+            print(f"📊 Promoted model: accuracy {current_metrics['eval_accuracy']:.2%}, F1 {current_metrics['eval_f1']:.4f}")
+            if current_metrics["eval_f1"] >= metrics["eval_f1"]:
+                print(f"⏭️  New model is not better; keeping {self.save_dir}")
+                return metrics
+        
+        self.promote_model(trainer.model, {
+            "metrics": metrics,
+            "previous_metrics": current_metrics,
+            "base_model": self.model_name,
+            "best_checkpoint": trainer.state.best_model_checkpoint,
+            "epochs_trained": trainer.state.epoch,
+            "train_examples": len(dataset_dict["train"]),
+            "eval_examples": len(dataset_dict["test"]),
+            "data_fingerprint": dataset._fingerprint,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+        })
+        return metrics
+
+    def _prepare_checkpoint_dir(self, data_fingerprint, resume=True):
+        """
+        Return the checkpoint to resume from: the latest one of an interrupted run on the same
+        data and base model. Checkpoints of completed runs or other data are deleted instead.
+        """
+        info_path = os.path.join(self.checkpoint_dir, RUN_INFO_NAME)
+        info = {}
+        if os.path.exists(info_path):
+            try:
+                with open(info_path, "r", encoding="utf-8") as f:
+                    info = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Could not read {info_path}: {e}")
+        
+        resumable = (resume and not info.get("completed", True) and info.get("data_fingerprint") == data_fingerprint
+                     and info.get("base_model") == self.model_name)
+        last_checkpoint = get_last_checkpoint(self.checkpoint_dir) if resumable else None
+        if last_checkpoint is None:
+            if os.path.isdir(self.checkpoint_dir):
+                print(f"🧹 Discarding checkpoints in {self.checkpoint_dir} (not an interrupted run on this data)")
+            shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+            self._write_run_info(data_fingerprint, completed=False)
+        return last_checkpoint
+
+    def _write_run_info(self, data_fingerprint, completed):
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        with open(os.path.join(self.checkpoint_dir, RUN_INFO_NAME), "w", encoding="utf-8") as f:
+            json.dump({"data_fingerprint": data_fingerprint, "base_model": self.model_name, "completed": completed}, f)
+
+    def _measure_latency(self, model, texts):
+        """Mean single-block inference latency in ms, as CodeClassifier runs it"""
+        if not texts:
+            return 0.0
+        model.eval()
+        device = next(model.parameters()).device
+        start = time.perf_counter()
+        with torch.inference_mode():
+            for text in texts:
+                inputs = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=MAX_SEQUENCE_LENGTH).to(device)
+                model(**inputs)
+        return (time.perf_counter() - start) / len(texts) * 1000
+
+    def _evaluate_promoted_model(self, trainer):
+        """
+        Eval metrics of the model currently in save_dir on the trainer's eval split, or None if there is none.
+        Raises if save_dir holds something that can't be loaded or evaluated as a sequence classifier.
+        """
+        if not os.path.isdir(self.save_dir):
+            return None
+        current_model = AutoModelForSequenceClassification.from_pretrained(self.save_dir, local_files_only=True)
+        current_model = current_model.to(trainer.model.device)
+        return Trainer(
+            model=current_model,
+            args=trainer.args,
+            eval_dataset=trainer.eval_dataset,
+            data_collator=trainer.data_collator,
+            compute_metrics=self.compute_metrics,
+        ).evaluate()
+
+    def _recover_interrupted_promote(self):
+        """Put the previous model back if a promote was interrupted between its two renames"""
+        save_dir = os.path.abspath(self.save_dir)
+        previous_dir = f"{save_dir}.previous"
+        if not os.path.isdir(save_dir) and os.path.isdir(previous_dir):
+            os.replace(previous_dir, save_dir)
+            print(f"♻️  Restored {self.save_dir} after an interrupted promote")
+
+    def promote_model(self, model, manifest):
+        """
+        Replace save_dir with the model, tokenizer and metrics manifest.
+        Everything is written to a temporary directory first and swapped in with renames,
+        so save_dir never holds a partially written model.
+        """
+        save_dir = os.path.abspath(self.save_dir)
+        staging_dir = f"{save_dir}.staging"
+        previous_dir = f"{save_dir}.previous"
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        
+        model.save_pretrained(staging_dir)
+        self.tokenizer.save_pretrained(staging_dir)
+        with open(os.path.join(staging_dir, METRICS_MANIFEST_NAME), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, default=str)
+        
+        shutil.rmtree(previous_dir, ignore_errors=True)
+        if os.path.isdir(save_dir):
+            os.replace(save_dir, previous_dir)
+        os.replace(staging_dir, save_dir)
+        shutil.rmtree(previous_dir, ignore_errors=True)
+        print(f"✅ Model promoted to {self.save_dir} (manifest: {METRICS_MANIFEST_NAME})")
+
+    def run_distillation(self, student_dir="model/student_model", epochs=5, batch_size=64, learning_rate=0.05,
+                         temperature=2.0, alpha=0.7, num_buckets=2 ** 18, test_size=0.2, max_eval_samples=1000):
+        """
+        Distill the fine-tuned DistilBERT teacher in save_dir into a character n-gram linear
+        student (CPU only) and export it to student_dir, loadable with CodeClassifier(model_path=student_dir).
+        The loss mixes the KL divergence to the teacher's softened probabilities (weight alpha)
+        with cross-entropy on the gold labels. Prints teacher vs student accuracy, latency and memory.
+        """
+        dataset = self.load_dataset()
+        if dataset is None:
+            print("❌ No training data available. Please run the scraper first.")
+            return None
+        
+        dataset_dict = self.shard_loader.split_dataset(dataset, test_size=test_size, seed=42)
+        train_data, test_data = dataset_dict["train"], dataset_dict["test"]
+        
+        teacher = CodeClassifier(model_path=self.save_dir, cache_path=None)
+        if teacher.student is not None:
+            print(f"❌ {self.save_dir} holds a student model; distillation needs the DistilBERT teacher.")
+            return None
+        
+        print(f"\n🧑‍🏫 Computing teacher logits for {len(train_data):,} training examples...")
+        teacher_logits = self._teacher_logits(teacher, train_data)
+        
+        student = CharNgramClassifier(num_buckets=num_buckets)
+        optimizer = torch.optim.Adagrad(student.parameters(), lr=learning_rate)
+        labels = torch.tensor(train_data["label"], dtype=torch.long)
+        
+        print(f"🎓 Training student ({num_buckets:,} n-gram buckets) for {epochs} epochs on CPU...")
+        order = list(range(len(train_data)))
+        for epoch in range(epochs):
+            random.Random(epoch).shuffle(order)
+            student.train()
+            total_loss = 0.0
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                ids, offsets = student.encode_batch(train_data[batch]["text"])
+                logits = student(ids, offsets)
+                soft_targets = torch.softmax(teacher_logits[batch] / temperature, dim=-1)
+                distill_loss = torch.nn.functional.kl_div(
+                    torch.log_softmax(logits / temperature, dim=-1), soft_targets, reduction="batchmean"
+                ) * temperature ** 2
+                hard_loss = torch.nn.functional.cross_entropy(logits, labels[batch])
+                loss = alpha * distill_loss + (1 - alpha) * hard_loss
+                optimizer.zero_grad()
+                loss.backward()
+                optimizer.step()
+                total_loss += loss.item() * len(batch)
+            print(f"   Epoch {epoch + 1}/{epochs}: loss {total_loss / len(order):.4f}")
+        
+        student.eval()
+        student.save(student_dir)
+        print(f"✅ Student model saved to {student_dir}")
+        
+        # Side-by-side evaluation through the same CodeClassifier interface the app uses
+        eval_data = test_data.select(range(min(max_eval_samples, len(test_data))))
+        student_classifier = CodeClassifier(model_path=student_dir, cache_path=None)
+        report = {
+            "eval_samples": len(eval_data),
+            "teacher": self._evaluate_classifier(teacher, eval_data, self.save_dir),
+            "student": self._evaluate_classifier(student_classifier, eval_data, student_dir)
+        }
+        
+        print(f"\n📊 Teacher vs Student ({len(eval_data):,} held-out examples):")
+        print(f"{'='*60}")
+        print(f"  {'':<10} {'accuracy':>9} {'ms/block':>9} {'params':>12} {'memory MB':>10} {'disk MB':>8}")
+        for name in ("teacher", "student"):
+            r = report[name]
+            print(f"  {name:<10} {r['accuracy']:>9.2%} {r['mean_latency_ms']:>9.2f} {r['parameters']:>12,} "
+                  f"{r['memory_mb']:>10.1f} {r['disk_mb']:>8.1f}")
+        if report["student"]["mean_latency_ms"] > 0:
+            speedup = report["teacher"]["mean_latency_ms"] / report["student"]["mean_latency_ms"]
+            print(f"  Speed-up: {speedup:.1f}x, accuracy change: "
+                  f"{(report['student']['accuracy'] - report['teacher']['accuracy']) * 100:+.2f} points")
+        
+        with open(os.path.join(student_dir, "distillation_report.json"), "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        return report
+
+    def _teacher_logits(self, teacher, dataset, batch_size=32):
+        """Batched teacher logits for the texts of a dataset, in dataset order"""
+        teacher.model.eval()
+        chunks = []
+        with torch.no_grad():
+            for batch in dataset.iter(batch_size=batch_size):
+                inputs = teacher.tokenizer(batch["text"], return_tensors="pt",
+                                           padding=True, truncation=True, max_length=MAX_SEQUENCE_LENGTH)
+                chunks.append(teacher.model(**inputs).logits.float())
+        return torch.cat(chunks)
+
+    def _evaluate_classifier(self, classifier, eval_data, model_dir):
+        """Accuracy, per-block latency and memory of a CodeClassifier on held-out data"""
+        correct = 0
+        start = time.perf_counter()
+        for sample in eval_data:
+            correct += classifier.predict_with_confidence(sample["text"])["is_code"] == (sample["label"] == 1)
+        elapsed = time.perf_counter() - start
+        
+        parameters = sum(p.numel() for p in classifier.model.parameters())
+        parameter_bytes = sum(p.numel() * p.element_size() for p in classifier.model.parameters())
+        disk_bytes = sum(os.path.getsize(os.path.join(model_dir, name)) for name in os.listdir(model_dir)
+                         if os.path.isfile(os.path.join(model_dir, name)))
+        return {
+            "accuracy": correct / len(eval_data) if eval_data else 0.0,
+            "mean_latency_ms": elapsed / len(eval_data) * 1000 if eval_data else 0.0,
+            "parameters": parameters,
+            "memory_mb": parameter_bytes / 1024 ** 2,
+            "disk_mb": disk_bytes / 1024 ** 2
+        }
+
+    def tune_cascade(self, max_samples=2000, max_accuracy_drop=0.005):
+        """
+        Tune the heuristic pre-filter thresholds of the classifier cascade on the code_text_pairs
+        data, print the accuracy/latency trade-off and save the chosen thresholds next to the model.
+        """
+        dataset = self.load_dataset()
+        if dataset is None:
+            print("❌ No data available for cascade tuning.")
+            return None
+        
+        samples = dataset.shuffle(seed=42).select(range(min(max_samples, len(dataset)))).to_list()
+        
+        print(f"\n🎯 Tuning cascade thresholds on {len(samples):,} samples...")
+        classifier = CodeClassifier(model_path=self.save_dir, cache_path=None)
+        cascade = CodeClassifierCascade(ManualCodeChecker(), classifier, thresholds_path=None)
+        report = cascade.tune_thresholds(samples, max_accuracy_drop=max_accuracy_drop)
+        
+        model_only = report["model_only"]
+        chosen = report["chosen"]
+        print(f"\n📊 Cascade Accuracy/Latency Trade-off:")
+        print(f"{'='*60}")
+        print(f"  {'text<=':>7} {'code>=':>7} {'accuracy':>9} {'to model':>9} {'latency ms':>11}")
+        # Best candidate for each share of blocks sent to the model
+        frontier = {}
+        for candidate in report["candidates"]:
+            bucket = round(candidate["model_rate"], 2)
+            if bucket not in frontier or candidate["accuracy"] > frontier[bucket]["accuracy"]:
+                frontier[bucket] = candidate
+        for bucket in sorted(frontier):
+            c = frontier[bucket]
+            marker = "  <- chosen" if c is chosen else ""
+            print(f"  {c['text_threshold']:>7.3f} {c['code_threshold']:>7.3f} {c['accuracy']:>9.2%} "
+                  f"{c['model_rate']:>9.1%} {c['mean_latency_ms']:>11.2f}{marker}")
+        print(f"\n  Transformer only: accuracy {model_only['accuracy']:.2%}, {model_only['mean_latency_ms']:.2f} ms/block")
+        print(f"  Cascade: accuracy {chosen['accuracy']:.2%}, {chosen['mean_latency_ms']:.2f} ms/block, "
+              f"{1 - chosen['model_rate']:.1%} of blocks decided by heuristics")
+        
+        thresholds_path = os.path.join(os.path.dirname(os.path.abspath(self.save_dir)), "cascade_thresholds.json")
+        cascade.save_thresholds(thresholds_path, {k: v for k, v in report.items() if k != "candidates"})
+        print(f"✅ Cascade thresholds saved to {thresholds_path}")
+        return report
 
     def get_data_statistics(self):
-        """Get statistics about available training data"""
+        """Get statistics about available training data (from the shard cache; changed files are parsed first)"""
         print(f"\n📊 Analyzing training data in {self.data_dir}...")
         
-        pattern = os.path.join(self.data_dir, "*_code_text_pairs.jsonl")
-        language_files = glob.glob(pattern)
-        
-        if not language_files:
+        stats = self.shard_loader.get_statistics()
+        if not stats["languages"]:
             print(f"❌ No data files found in {self.data_dir}")
             return
         
-        total_stats = {
-            "languages": 0,
-            "total_questions": 0,
-            "total_segments": 0,
-            "code_segments": 0,
-            "text_segments": 0
-        }
-        
         print(f"\n📊 Language Statistics:")
         print(f"{'='*60}")
         
-        for file_path in sorted(language_files):
-            language = os.path.basename(file_path).replace("_code_text_pairs.jsonl", "")
-            
-            language_stats = {
-                "questions": 0,
-                "segments": 0,
-                "code_segments": 0,
-                "text_segments": 0
-            }
-            
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    for line in f:
-                        data = json.loads(line)
-                        segments = data.get("segments", [])
-                        
-                        language_stats["questions"] += 1
-                        language_stats["segments"] += len(segments)
-                        
-                        for segment in segments:
-                            seg_type = segment.get("type", "UNKNOWN")
-                            if seg_type == "CODE":
-                                language_stats["code_segments"] += 1
-                                total_stats["code_segments"] += 1
-                            elif seg_type == "TEXT":
-                                language_stats["text_segments"] += 1
-                                total_stats["text_segments"] += 1
-                
-                total_stats["languages"] += 1
-                total_stats["total_questions"] += language_stats["questions"]
-                total_stats["total_segments"] += language_stats["segments"]
-                
-                print(f"  {language}:")
-                print(f"    Questions: {language_stats['questions']:,}")
-                print(f"    Segments: {language_stats['segments']:,}")
-                print(f"    Code: {language_stats['code_segments']:,}")
-                print(f"    Text: {language_stats['text_segments']:,}")
-                
-            except Exception as e:
-                print(f"❌ Error analyzing {language}: {e}")
+        for language_stats in sorted(stats["languages"], key=lambda l: l["language"]):
+            print(f"  {language_stats['language']}:")
+            print(f"    Questions: {language_stats['questions']:,}")
+            print(f"    Segments: {language_stats['segments']:,}")
+            print(f"    Code: {language_stats['code_examples']:,}")
+            print(f"    Text: {language_stats['examples'] - language_stats['code_examples']:,}")
         
+        total = stats["total"]
         print(f"\n📊 Total Statistics:")
         print(f"{'='*60}")
-        print(f"  Languages: {total_stats['languages']}")
-        print(f"  Total Questions: {total_stats['total_questions']:,}")
-        print(f"  Total Segments: {total_stats['total_segments']:,}")
-        print(f"  Code Segments: {total_stats['code_segments']:,}")
-        print(f"  Text Segments: {total_stats['text_segments']:,}")
-        
-        if total_stats['total_segments'] > 0:
-            code_percentage = (total_stats['code_segments'] / total_stats['total_segments']) * 100
-            text_percentage = (total_stats['text_segments'] / total_stats['total_segments']) * 100
+        print(f"  Languages: {total['languages']}")
+        print(f"  Total Questions: {total['questions']:,}")
+        print(f"  Total Segments: {total['segments']:,}")
+        print(f"  Code Segments: {total['code_examples']:,}")
+        print(f"  Text Segments: {total['examples'] - total['code_examples']:,}")
+        
+        if total['examples'] > 0:
+            code_percentage = (total['code_examples'] / total['examples']) * 100
+            text_percentage = 100 - code_percentage
             print(f"  Code/Text Ratio: {code_percentage:.1f}% / {text_percentage:.1f}%")
 
 
@@ -266,10 +551,13 @@ if __name__ == "__main__":
     
     print("-" * 60)
     
-    # Create trainer with organized data directory
+    # Create trainer with organized data directory (deduplicated data when the scraper produced it)
+    data_dir = "model/data/code_text_pairs_dedup"
+    if not os.path.isdir(data_dir):
+        data_dir = "model/data/code_text_pairs"
     trainer = ModelTrainer(
         save_dir="model/saved_model",
-        data_dir="model/data/code_text_pairs"
+        data_dir=data_dir
     )
     
     # Show data statistics before training
@@ -277,8 +565,15 @@ if __name__ == "__main__":
     
     print("-" * 60)
     
-    # Start training
-    trainer.run()
+    # Start training (--force-promote replaces a promoted model that can't be evaluated)
+    trainer.run(force_promote="--force-promote" in sys.argv)
+    
+    # Tune the heuristic pre-filter in front of the trained model
+    trainer.tune_cascade()
+    
+    # Optionally distill the trained model into the small CPU student
+    if "--distill" in sys.argv:
+        trainer.run_distillation(student_dir="model/student_model")
     
     print("✅ Training completed!")
     print(f"📁 Model saved to: {trainer.save_dir}")
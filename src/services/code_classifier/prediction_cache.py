@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+# Persisted predictions (next to clipboard_settings.db)
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'code_classifier_cache.db')
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of classifier predictions, optionally backed by SQLite so that
+    recurring blocks (signatures, license headers, stack traces) skip inference across restarts.
+    Entries are keyed by the hash of the whitespace-normalized block and the model version,
+    so a retrained model never reads predictions made by an older one.
+    """
+
+    def __init__(self, model_version: str, max_entries: int = 2048, db_path: Optional[str] = DEFAULT_CACHE_PATH,
+                 max_persisted_entries: int = 50000):
+        self.model_version = model_version
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.max_persisted_entries = max_persisted_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._inserts_since_trim = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if db_path:
+            self._open()
+
+    @staticmethod
+    def make_key(text: str) -> str:
+        """Hash of the block with whitespace runs collapsed (the tokenizer ignores them)"""
+        normalized = " ".join(text.split())
+        return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return a copy of the cached prediction or None"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(self._entries[key])
+
+            prediction = self._read(key)
+            if prediction is not None:
+                self.disk_hits += 1
+                self._store(key, prediction)
+                return dict(prediction)
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, prediction: dict):
+        """Store a prediction in memory and, when persistence is enabled, on disk"""
+        with self._lock:
+            self._store(key, dict(prediction))
+            self._write(key, prediction)
+
+    def clear(self):
+        """Drop all cached predictions, including persisted ones"""
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                try:
+                    with self._conn:
+                        self._conn.execute("DELETE FROM predictions")
+                except sqlite3.Error as e:
+                    print(f"Could not clear prediction cache: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get_statistics(self) -> dict:
+        """Return cache size and hit/miss counters"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "persistent": self._conn is not None
+        }
+
+    def _store(self, key: str, prediction: dict):
+        self._entries[key] = prediction
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _open(self):
+        try:
+            # May be shared between threads; access is serialized by _lock
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS predictions (
+                    block_hash TEXT NOT NULL,
+                    model_version TEXT NOT NULL,
+                    prediction TEXT NOT NULL,
+                    confidence REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    details TEXT,
+                    PRIMARY KEY (block_hash, model_version)
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_created_at ON predictions(created_at)")
+            # Predictions of older models are never read again
+            with self._conn:
+                self._conn.execute("DELETE FROM predictions WHERE model_version != ?", (self.model_version,))
+        except sqlite3.Error as e:
+            print(f"Prediction cache persistence disabled: {e}")
+            self._conn = None
+
+    def _read(self, key: str) -> Optional[dict]:
+        if self._conn is None:
+            return None
+        try:
+            row = self._conn.execute(
+                "SELECT prediction, confidence, details FROM predictions WHERE block_hash = ? AND model_version = ?",
+                (key, self.model_version)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error reading prediction cache: {e}")
+            return None
+        if row is None:
+            return None
+        prediction = {"prediction": row[0], "confidence": row[1], "is_code": row[0] == "CODE"}
+        if row[2]:
+            try:
+                prediction.update(json.loads(row[2]))
+            except ValueError:
+                pass
+        return prediction
+
+    @staticmethod
+    def _details(prediction: dict) -> Optional[str]:
+        """Fields besides prediction/confidence/is_code (e.g. long-block "mixed" and "windows") as JSON"""
+        details = {k: v for k, v in prediction.items() if k not in ("prediction", "confidence", "is_code")}
+        return json.dumps(details) if details else None
+
+    def _write(self, key: str, prediction: dict):
+        if self._conn is None:
+            return
+        try:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO predictions (block_hash, model_version, prediction, confidence, created_at, details) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, self.model_version, prediction["prediction"], float(prediction["confidence"]), time.time(),
+                     self._details(prediction))
+                )
+                self._inserts_since_trim += 1
+                if self._inserts_since_trim >= 1000:
+                    self._inserts_since_trim = 0
+                    self._conn.execute(
+                        "DELETE FROM predictions WHERE rowid IN "
+                        "(SELECT rowid FROM predictions ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                        (self.max_persisted_entries,)
+                    )
+        except sqlite3.Error as e:
+            print(f"Error writing prediction cache: {e}")
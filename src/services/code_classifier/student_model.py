@@ -0,0 +1,81 @@
+import os
+import json
+import zlib
+import torch
+from typing import List
+
+STUDENT_CONFIG_NAME = "student_config.json"
+STUDENT_WEIGHTS_NAME = "student_model.pt"
+
+
+class CharNgramClassifier(torch.nn.Module):
+    """
+    Distilled CODE/TEXT student: a linear model over hashed character n-grams.
+    Each n-gram of the block is hashed into one of num_buckets weight rows and the
+    logits are the mean of those rows plus a bias, so inference is a single EmbeddingBag
+    lookup and needs no tokenizer.
+    """
+
+    MODEL_TYPE = "char_ngram_linear"
+
+    def __init__(self, num_buckets: int = 2 ** 18, ngram_range=(2, 4), max_chars: int = 1024):
+        super().__init__()
+        self.num_buckets = num_buckets
+        self.ngram_range = tuple(ngram_range)
+        self.max_chars = max_chars
+        self.weights = torch.nn.EmbeddingBag(num_buckets, 2, mode="mean")
+        self.bias = torch.nn.Parameter(torch.zeros(2))
+        torch.nn.init.zeros_(self.weights.weight)
+
+    def featurize(self, text: str) -> List[int]:
+        """Hashed n-gram ids of a block (crc32, stable across processes)"""
+        padded = "\x02" + text[:self.max_chars] + "\x03"
+        ids = []
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(padded) - n + 1):
+                ids.append(zlib.crc32(padded[i:i + n].encode("utf-8")) % self.num_buckets)
+        return ids or [0]
+
+    def encode_batch(self, texts: List[str]):
+        """Flat id tensor and offsets for EmbeddingBag"""
+        ids, offsets = [], []
+        for text in texts:
+            offsets.append(len(ids))
+            ids.extend(self.featurize(text))
+        return torch.tensor(ids, dtype=torch.long), torch.tensor(offsets, dtype=torch.long)
+
+    def forward(self, ids, offsets):
+        return self.weights(ids, offsets) + self.bias
+
+    def predict_proba(self, texts: List[str]):
+        """Class probabilities (TEXT, CODE) for each text"""
+        ids, offsets = self.encode_batch(texts)
+        with torch.inference_mode():
+            return torch.softmax(self.forward(ids, offsets), dim=-1)
+
+    @staticmethod
+    def is_saved_model(path: str) -> bool:
+        return os.path.isfile(os.path.join(path, STUDENT_CONFIG_NAME))
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, STUDENT_CONFIG_NAME), "w", encoding="utf-8") as f:
+            json.dump({
+                "model_type": self.MODEL_TYPE,
+                "num_buckets": self.num_buckets,
+                "ngram_range": list(self.ngram_range),
+                "max_chars": self.max_chars
+            }, f, indent=2)
+        torch.save(self.state_dict(), os.path.join(path, STUDENT_WEIGHTS_NAME))
+
+    @classmethod
+    def load(cls, path: str) -> "CharNgramClassifier":
+        with open(os.path.join(path, STUDENT_CONFIG_NAME), "r", encoding="utf-8") as f:
+            config = json.load(f)
+        if config.get("model_type") != cls.MODEL_TYPE:
+            raise ValueError(f"Unsupported student model type: {config.get('model_type')}")
+        model = cls(num_buckets=config["num_buckets"], ngram_range=config["ngram_range"], max_chars=config["max_chars"])
+        model.load_state_dict(torch.load(os.path.join(path, STUDENT_WEIGHTS_NAME), map_location="cpu"))
+        model.eval()
+        return model
@@ -1,7 +1,9 @@
 import os
 import platform
+import threading
 from src.db.config_repository import ConfigRepository
 from src.utils.platform_utils import PlatformUtils
+from src.services.config_snapshot import ConfigSnapshot
 
 class ConfigService:
     def __init__(self):
@@ -40,6 +42,24 @@ class ConfigService:
         self.spacyModels = []
         self.customTerms = []
         self.treeSitterLanguages = []
+        self.block_cache_size = 512  # Max memoized clipboard blocks in TextProcessor
+        self.pii_scan_timeout_seconds = 0.5  # Per-pattern bound for email/phone/custom regex scans
+        self.custom_regex_max_timeouts = 3  # Consecutive timeouts before a custom regex is disabled
+        self.history_max_rows = 5000  # Retention: keep at most this many history entries
+        self.history_max_age_days = 90  # Retention: drop entries older than this
+        self.history_max_bytes = 256 * 1024 * 1024  # Retention: cap on stored history payload size
+        self.history_retention_batch_size = 500  # Rows deleted per short transaction
+        self.history_compaction_interval_seconds = 600  # How often the background compactor runs
+        self.history_compress_min_bytes = 4096  # Payloads at least this large are stored compressed
+        self.ner_ensemble_models = ()  # spaCy models run together as an NER ensemble (empty = the enabled, downloaded spaCy models; two or more enables it)
+        self.ner_ensemble_policy = "union"  # "union" or "majority" vote over the ensemble's entity spans
+        self.ner_latency_budget_seconds = 0.5  # Ensemble models slower than this are skipped
+        self.classifier_intra_op_threads = 0  # Torch threads per code classifier inference (0 = half the cores, at most 4)
+        self.classifier_inter_op_threads = 1  # Torch inter-op threads (spaCy and the UI share the cores)
+        self.classifier_batch_size = 8  # Rows of the code classifier's preallocated input buffers
+        self.classifier_warmup = True  # Run a warm-up inference in the background when the classifier loads
+        self.code_classifier_backend = "distilbert"  # "distilbert" (trained CodeClassifier) or "codebert" (AIChecker, loaded on first use)
+        self.codebert_model_path = "microsoft/codebert-base"  # Local directory or cached model name; never downloaded
         
         # SQLite database path (relative to project root)
         self.DB_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'clipboard_settings.db') 
@@ -49,48 +69,68 @@ class ConfigService:
         # Config for dev env
         self.debugMode = False
 
+        # Incremented on every change so consumers can cache derived structures
+        self.version = 0
+        self._snapshot_lock = threading.Lock()
+        self.snapshot = ConfigSnapshot(self, self.version)
+
+    def _bump_version(self):
+        """Mark the in-memory configuration as changed and publish a new snapshot"""
+        with self._snapshot_lock:
+            self.version += 1
+            # Built completely before the reference swap, so readers see either the old or the new config
+            self.snapshot = ConfigSnapshot(self, self.version)
+
+    def get_snapshot(self) -> ConfigSnapshot:
+        """Return the current immutable configuration snapshot"""
+        return self.snapshot
+
     def load_config_from_database(self):
         """Load configuration from database into memory"""
         try:
+            # Read the settings row and every config table in one go
+            tables = self.config_repository.load_all()
+            
             # Load settings
-            settings = self.config_repository.get_settings()
+            settings = tables["settings"]
             if settings:
                 self._load_settings_from_tuple(settings)
             
             # Load AI processing types
-            ai_types = self.config_repository.get_ai_processing_types()
+            ai_types = tables["ai_processing_types"]
             if ai_types:
                 self.aiProcessingTypes = self._convert_ai_types_to_dict(ai_types)
             
             # Load trusted programs
-            trusted_programs = self.config_repository.get_trusted_programs()
+            trusted_programs = tables["trusted_programs"]
             if trusted_programs:
                 self.trustedPrograms = self._convert_trusted_programs_to_dict(trusted_programs)
             
             # Load code protection types
-            code_types = self.config_repository.get_code_protection_types()
+            code_types = tables["code_protection_types"]
             if code_types:
                 self.codeProtectionTypes = self._convert_code_types_to_dict(code_types)
             
             # Load custom regex patterns
-            regex_patterns = self.config_repository.get_custom_regex_patterns()
+            regex_patterns = tables["custom_regex_patterns"]
             if regex_patterns:
                 self.customRegexPatterns = self._convert_regex_patterns_to_dict(regex_patterns)
             
             # Load SpaCy models
-            spacy_models = self.config_repository.get_spacy_models()
+            spacy_models = tables["spacy_models"]
             if spacy_models:
                 self.spacyModels = self._convert_spacy_models_to_dict(spacy_models)
                 # Sync 'downloaded' flags with environment to reflect reality
                 try:
-                    from src.services.checkers.spacy_checker import SpacyChecker
-                    checker = SpacyChecker()
+                    # Package-metadata index (cached on disk), no spaCy import or model load needed
+                    from src.services.checkers.spacy_model_index import SpacyModelIndex
+                    installed_models = SpacyModelIndex().get_installed_models()
                     # Map by short name for quick lookup
                     for model in self.spacyModels:
                         short = model.get('modelShortName') or model.get('modelName')
                         if not short:
                             continue
-                        installed = checker.is_model_installed(short)
+                        installed = short in installed_models
                         if bool(model.get('downloaded')) != installed:
                             # Update DB and memory to match installed state
                             self.update_spacy_model_flags(short, downloaded=installed)
@@ -98,15 +138,16 @@ class ConfigService:
                     print(f"Warning: failed to sync spaCy models with environment: {sync_err}")
             
             # Load custom terms
-            custom_terms = self.config_repository.get_custom_terms()
+            custom_terms = tables["custom_terms"]
             if custom_terms:
                 self.customTerms = self._convert_custom_terms_to_dict(custom_terms)
             
             # Load tree sitter languages
-            tree_languages = self.config_repository.get_tree_sitter_languages()
+            tree_languages = tables["tree_sitter_languages"]
             if tree_languages:
                 self.treeSitterLanguages = self._convert_tree_languages_to_dict(tree_languages)
                 
+            self._bump_version()
             print("Configuration loaded from database successfully")
             
         except Exception as e:
@@ -171,6 +212,7 @@ class ConfigService:
                 disable_all_features=self.disable_all_features,
                 disable_masking=self.disable_masking
             )
+            self._bump_version()
             print("Configuration saved to database successfully")
             
         except Exception as e:
@@ -186,6 +228,7 @@ class ConfigService:
             for key, value in kwargs.items():
                 if hasattr(self, key):
                     setattr(self, key, value)
+            self._bump_version()
             
             print("Configuration updated successfully")
             
@@ -201,6 +244,7 @@ class ConfigService:
                 if code_type.get('typeName') == type_name:
                     code_type['enabled'] = enabled
                     break
+            self._bump_version()
             return updated
         except Exception as e:
             print(f"Error updating code protection type '{type_name}': {e}")
@@ -219,6 +263,7 @@ class ConfigService:
                     if deleted is not None:
                         program['deleted'] = deleted
                     break
+            self._bump_version()
             return True
         except Exception as e:
             print(f"Error updating trusted program '{program_name}': {e}")
@@ -235,6 +280,7 @@ class ConfigService:
                 if ai_type.get('aiMaskOption') == ai_mask_option:
                     ai_type['enabled'] = enabled
                     break
+            self._bump_version()
             return True
         except Exception as e:
             print(f"Error updating AI processing type '{ai_mask_option}': {e}")
@@ -254,6 +300,7 @@ class ConfigService:
                     if first_priority is not None:
                         pattern['firstPriority'] = first_priority
                     break
+            self._bump_version()
             return True
         except Exception as e:
             print(f"Error updating custom regex pattern '{pattern_id}': {e}")
@@ -282,6 +329,7 @@ class ConfigService:
                     if downloaded is not None:
                         model['downloaded'] = downloaded
                     break
+            self._bump_version()
             return True
         except Exception as e:
             print(f"Error updating spaCy model '{model_short_name}': {e}")
@@ -315,9 +363,8 @@ class ConfigService:
             print("Fetching installed applications...")
             installed_apps = self.platform_utils.get_all_installed_programs()
             
-            # Save to database as trusted programs (initially disabled)
-            for app_name in installed_apps:
-                self.config_repository.add_trusted_program(app_name, enabled=True, deleted=False)
+            # Save to database as trusted programs in one bulk upsert (existing flags are kept)
+            self.config_repository.add_trusted_programs((app_name, True, False) for app_name in installed_apps)
             
             print(f"Saved {len(installed_apps)} installed applications to database")
             
@@ -343,6 +390,7 @@ class ConfigService:
                         'deleted': program[3]
                     })
             
+            self._bump_version()
             print(f"Updated config with {len(self.trustedPrograms)} trusted programs")
             
         except Exception as e:
@@ -0,0 +1,71 @@
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Tuple
+from src.services.mask_mappings import ShouldEraseMatcher, build_should_erase_patterns
+
+# ConfigService list attributes copied into the snapshot as tuples of read-only dicts
+SNAPSHOT_LIST_ATTRIBUTES = (
+    "trustedPrograms",
+    "customRegexPatterns",
+    "codeProtectionTypes",
+    "aiProcessingTypes",
+    "spacyModels",
+    "customTerms",
+    "treeSitterLanguages",
+)
+
+
+def _freeze_items(items: Iterable[Dict[str, Any]]) -> Tuple[MappingProxyType, ...]:
+    return tuple(MappingProxyType(dict(item)) for item in items or [])
+
+
+class ConfigSnapshot:
+    """
+    Immutable copy of the configuration at one version, with the structures derived
+    from it precomputed: enabled-type sets, the should-erase matcher and the trusted
+    program list sorted for matching.
+    ConfigService builds a new snapshot after every change and swaps it in with a single
+    reference assignment, so a reader holding a snapshot never sees a half-applied config.
+    """
+
+    def __init__(self, config, version: int):
+        values = {"version": version}
+
+        # Scalar settings (flags, mask types, thresholds, limits) and tuples of names
+        for name, value in vars(config).items():
+            if not name.startswith("_") and isinstance(value, (bool, int, float, str, tuple)) and name != "version":
+                values[name] = value
+
+        for name in SNAPSHOT_LIST_ATTRIBUTES:
+            values[name] = _freeze_items(getattr(config, name, []))
+
+        # Derived structures
+        values["enabled_code_protection_types"] = frozenset(
+            t.get('typeName') for t in values["codeProtectionTypes"] if t.get('enabled', False)
+        )
+        # Ordered, hashable form used as the block cache signature
+        values["code_protection_signature"] = tuple(
+            t.get('typeName') for t in values["codeProtectionTypes"] if t.get('enabled', False)
+        )
+        values["enabled_custom_regex_patterns"] = tuple(
+            p for p in values["customRegexPatterns"] if p.get('enabled', False) and p.get('regex')
+        )
+        values["should_erase_matcher"] = ShouldEraseMatcher(build_should_erase_patterns(values["aiProcessingTypes"]))
+        # NER ensemble: the configured models, or else every enabled and downloaded spaCy model
+        values["ner_ensemble_models"] = values.get("ner_ensemble_models") or tuple(
+            m.get('modelShortName') or m.get('modelName') for m in values["spacyModels"]
+            if m.get('enabled', False) and m.get('downloaded', False) and (m.get('modelShortName') or m.get('modelName'))
+        )
+        # (lowercased name, program) sorted by name length, longest first, so longer names match first
+        values["sorted_trusted_programs"] = tuple(
+            (p.get('programName', '').lower(), p)
+            for p in sorted(values["trustedPrograms"], key=lambda p: len(p.get('programName', '')), reverse=True)
+        )
+
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConfigSnapshot is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("ConfigSnapshot is immutable")
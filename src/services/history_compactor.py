@@ -0,0 +1,79 @@
+import threading
+from src.db.clipboard_repository import ClipboardRepository
+
+class HistoryCompactor:
+    """
+    Background retention for clipboard history.
+    Periodically deletes the oldest entries beyond the configured row, age and size
+    limits in small batches (one short transaction each, so the clipboard monitor is
+    never blocked for long) and then returns freed pages with an incremental vacuum.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.running = False
+        self.thread = None
+        self._wake_event = threading.Event()
+        self.db = None  # Created on the compactor thread; the SQLite connection is bound to it
+
+    def start(self):
+        """Start the compaction thread"""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.running = True
+        self._wake_event.clear()
+        self.thread = threading.Thread(target=self.compaction_loop, daemon=True)
+        self.thread.start()
+        print("History compactor started")
+
+    def stop(self):
+        """Stop the compaction thread"""
+        self.running = False
+        self._wake_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+        print("History compactor stopped")
+
+    def compaction_loop(self):
+        self.db = ClipboardRepository()
+        while self.running:
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"Error compacting history: {e}")
+            self._wake_event.wait(getattr(self.config, 'history_compaction_interval_seconds', 600))
+
+        self.db.db.close()
+
+    def compact(self):
+        """Apply the retention limits once. Returns the number of deleted entries."""
+        batch_size = getattr(self.config, 'history_retention_batch_size', 500)
+        max_rows = getattr(self.config, 'history_max_rows', 5000)
+        max_age_days = getattr(self.config, 'history_max_age_days', 90)
+        max_bytes = getattr(self.config, 'history_max_bytes', 256 * 1024 * 1024)
+        deleted = 0
+
+        # Age limit
+        if max_age_days:
+            while self.running:
+                count = self.db.delete_oldest_history(batch_size, older_than_days=max_age_days)
+                deleted += count
+                if count < batch_size:
+                    break
+
+        # Row and size limits
+        while self.running:
+            rows, total_bytes = self.db.get_history_size()
+            excess_rows = rows - max_rows if max_rows else 0
+            over_size = bool(max_bytes) and total_bytes > max_bytes
+            if excess_rows <= 0 and not over_size:
+                break
+            count = self.db.delete_oldest_history(min(batch_size, excess_rows) if excess_rows > 0 else batch_size)
+            deleted += count
+            if count == 0:
+                break
+
+        if deleted:
+            self.db.incremental_vacuum()
+            print(f"History compactor removed {deleted} entries")
+        return deleted
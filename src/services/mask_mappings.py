@@ -0,0 +1,117 @@
+import re
+from typing import List, Dict, Any, Iterable, Optional
+
+# AI mask option numbers (ai_processing_types.ai_mask_option) to spaCy entity labels
+AI_MASK_OPTION_LABELS = {
+    '0': 'PERSON',
+    '1': 'ORG', 
+    '2': 'GPE',
+    '3': 'DATE',
+    '4': 'LOC',
+    '5': 'PRODUCT',
+    '6': 'EVENT',
+    '7': 'WORK_OF_ART',
+    '8': 'LAW',
+    '9': 'LANGUAGE',
+    '10': 'TIME',
+    '11': 'PERCENT',
+    '12': 'MONEY',
+    '13': 'QUANTITY',
+    '14': 'ORDINAL',
+    '15': 'CARDINAL',
+    '16': 'NORP',
+    '17': 'FAC'
+}
+
+# Code protection placeholders that must never be recorded as mask mappings
+CODE_PROTECTION_ERASE_PATTERNS = [
+    "METHOD_NAME_",
+    "PARAMETER_CLASS_NAME_", 
+    "CLASS_NAME_"
+]
+
+
+def build_should_erase_patterns(ai_processing_types: Iterable[Dict[str, Any]]) -> List[str]:
+    """Should-erase patterns for the configured AI processing types plus the code protection placeholders"""
+    patterns = []
+    for ai_type in ai_processing_types:
+        mask_option = ai_type.get('aiMaskOption', '')
+        if mask_option is not None:
+            # Convert integer mask option to string pattern
+            patterns.append(AI_MASK_OPTION_LABELS.get(str(mask_option), f"AI_{mask_option}"))
+    patterns.extend(CODE_PROTECTION_ERASE_PATTERNS)
+    return patterns
+
+
+class ShouldEraseMatcher:
+    """
+    Precompiled substring matcher for the should-erase patterns.
+    All patterns are folded into a single regex alternation so a candidate
+    is checked in one scan instead of one `in` test per pattern.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = [p for p in dict.fromkeys(patterns) if p]
+        if self.patterns:
+            # Longest first so overlapping patterns report the most specific match
+            ordered = sorted(self.patterns, key=len, reverse=True)
+            self._regex = re.compile("|".join(re.escape(p) for p in ordered))
+        else:
+            self._regex = None
+
+    def matches(self, text: str) -> bool:
+        """Return True if any should-erase pattern occurs in text"""
+        return bool(self._regex and self._regex.search(text))
+
+
+class MaskMappingSet:
+    """
+    Ordered collection of mask mappings with a hash index on the original text.
+    Iterates as the list-of-dicts format stored by ClipboardRepository.add_entry.
+    """
+
+    def __init__(self, should_erase_matcher: Optional[ShouldEraseMatcher] = None):
+        self.should_erase_matcher = should_erase_matcher
+        self._mappings: List[Dict[str, Any]] = []
+        self._index: Dict[str, int] = {}
+        self._type_counts: Dict[str, int] = {}
+
+    def add(self, original_text: str, masked_text: str, mask_type: str) -> bool:
+        """
+        Add a mapping unless the original text is already mapped or matches
+        a should-erase pattern. Returns True if the mapping was added.
+        """
+        if original_text in self._index:
+            return False
+        if self.should_erase_matcher and self.should_erase_matcher.matches(original_text):
+            return False
+        self._index[original_text] = len(self._mappings)
+        self._type_counts[mask_type] = self._type_counts.get(mask_type, 0) + 1
+        self._mappings.append({
+            "originalText": original_text,
+            "maskedText": masked_text,
+            "maskType": mask_type
+        })
+        return True
+
+    def get(self, original_text: str) -> Optional[Dict[str, Any]]:
+        """Return the mapping for an original text or None"""
+        position = self._index.get(original_text)
+        return self._mappings[position] if position is not None else None
+
+    def count_by_type(self, mask_type: str) -> int:
+        """Return how many mappings of a mask type have been added"""
+        return self._type_counts.get(mask_type, 0)
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """Return the mappings as a list of dicts (copies)"""
+        return [dict(mapping) for mapping in self._mappings]
+
+    def __contains__(self, original_text: str) -> bool:
+        return original_text in self._index
+
+    def __iter__(self):
+        return iter(self._mappings)
+
+    def __len__(self) -> int:
+        return len(self._mappings)
@@ -0,0 +1,83 @@
+import re
+from typing import Iterator, List, Optional, Tuple
+
+# Blocks are separated by blank lines
+BLOCK_SEPARATOR = re.compile(r'\n\s*\n')
+LINE_SEPARATOR = re.compile(r'\n')
+
+
+class Segment:
+    """
+    A classified CODE/TEXT span of the original text.
+    Holds offsets instead of a copy of the content; processing stores its result as a
+    span edit (replacement), left None when the span is unchanged.
+    """
+
+    __slots__ = ("type", "start", "end", "confidence", "replacement", "processed")
+
+    def __init__(self, segment_type: str, start: int, end: int, confidence: float):
+        self.type = segment_type
+        self.start = start
+        self.end = end
+        self.confidence = confidence
+        self.replacement: Optional[str] = None
+        self.processed = False
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __repr__(self) -> str:
+        return f"Segment({self.type}, {self.start}:{self.end}, confidence={self.confidence:.2f}, edited={self.replacement is not None})"
+
+    def content(self, text: str) -> str:
+        """The original content of the span"""
+        return text[self.start:self.end]
+
+    def processed_content(self, text: str) -> str:
+        """The content after processing (the original if processing changed nothing)"""
+        return self.content(text) if self.replacement is None else self.replacement
+
+    def set_result(self, text: str, processed_content: str):
+        """Record the processing result, keeping an edit only if the content changed"""
+        self.replacement = None if processed_content == self.content(text) else processed_content
+        self.processed = True
+
+
+def strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+    """Offsets of text[start:end] without leading and trailing whitespace (start == end if blank)"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def iter_block_spans(text: str, start: int = 0, end: Optional[int] = None,
+                     separator: re.Pattern = BLOCK_SEPARATOR) -> Iterator[Tuple[int, int]]:
+    """(start, end) of every non-blank stripped block of text[start:end] between separators"""
+    end = len(text) if end is None else end
+    position = start
+    for match in separator.finditer(text, start, end):
+        span = strip_span(text, position, match.start())
+        if span[0] < span[1]:
+            yield span
+        position = match.end()
+    span = strip_span(text, position, end)
+    if span[0] < span[1]:
+        yield span
+
+
+def apply_span_edits(text: str, segments: List[Segment]) -> str:
+    """The text with each segment's edit applied; everything between segments is kept as is"""
+    parts = []
+    position = 0
+    for segment in sorted(segments, key=lambda s: s.start):
+        if segment.replacement is None:
+            continue
+        parts.append(text[position:segment.start])
+        parts.append(segment.replacement)
+        position = segment.end
+    if not parts:
+        return text
+    parts.append(text[position:])
+    return "".join(parts)
@@ -6,15 +6,42 @@ from src.services.checkers.spacy_checker import SpacyChecker
 from src.services.checkers.email_checker import EmailChecker
 from src.services.checkers.phone_checker import PhoneChecker
 from src.services.checkers.code_checker import CodeChecker
+from src.services.checkers.pii_scanner import PIIScanner
+from src.services.checkers.regex_guard import RegexSandbox
+from src.services.checkers.custom_term_matcher import CustomTermMatcher
+from src.services.block_cache import BlockCache
+from src.services.segments import Segment, LINE_SEPARATOR, iter_block_spans, apply_span_edits
+from src.services.mask_mappings import MaskMappingSet, ShouldEraseMatcher, AI_MASK_OPTION_LABELS, build_should_erase_patterns
+
 
 class TextProcessor:
     def __init__(self, config):
         self.config = config
-        self.db = ClipboardRepository()
+        # Immutable config snapshot, pinned per processed clipboard event
+        self.snapshot = config.get_snapshot()
+        self.db = ClipboardRepository(compress_min_bytes=getattr(config, 'history_compress_min_bytes', 4096))
         self.spacy_checker = SpacyChecker()
         self.email_checker = EmailChecker()
         self.phone_checker = PhoneChecker()
-        self.code_checker = CodeChecker()
+        self.code_checker = CodeChecker(config)
+        # Per-block memoization of classification, NER and code analysis results
+        self.block_cache = BlockCache(max_entries=getattr(config, 'block_cache_size', 512))
+        # Combined email/phone/custom regex scanner, rebuilt only when the config version changes
+        self._pii_scanner = None
+        self._pii_scanner_version = None
+        # User-supplied regexes run in a killable worker; repeat offenders are disabled
+        self.regex_sandbox = RegexSandbox()
+        self._regex_timeout_counts = {}
+        # Detectors being disabled: left out of the scanner until the config update succeeds
+        self._excluded_regex_detectors = {}
+        self._pending_regex_disables = set()
+        # Runs config writes on the thread owning the config DB connection (set by ClipboardService)
+        self.config_dispatcher = None
+        # Custom term automaton, updated incrementally when the config version changes
+        self.custom_term_matcher = CustomTermMatcher()
+        self._custom_term_matcher_version = None
+        # Model names last requested for the NER ensemble
+        self._ner_ensemble_models = ()
         # Don't automatically load spaCy model - let it be loaded on demand
 
     def process_text(self, text: str, last_mask_mappings: List[Dict[str, Any]], active_window: str) -> str:
@@ -23,16 +50,18 @@ class TextProcessor:
         then applies appropriate processors to each segment type.
         """
         try:
+            # One config version for the whole event, even if settings are saved meanwhile
+            self.snapshot = self.config.get_snapshot()
             processed_text = text
-            mask_mappings = []
+            mask_mappings = MaskMappingSet(self.get_should_erase_matcher())
             timestamp = self.get_current_timestamp()
 
             # If masking is disabled, just record the text and return it
-            if getattr(self.config, 'disable_masking', False):
-                self.db.add_entry(text, processed_text, active_window, timestamp, mask_mappings)
+            if self.snapshot.disable_masking:
+                self.db.add_entry(text, processed_text, active_window, timestamp, mask_mappings.to_list())
                 return processed_text
 
-            if self.config.debugMode:
+            if self.snapshot.debugMode:
                 print(f"=== Starting text processing pipeline ===")
                 print(f"Input text length: {len(text)}")
                 print(f"Active window: {active_window}")
@@ -40,17 +69,17 @@ class TextProcessor:
             # Step 1: Detect and separate code and text segments
             segments = self.segment_text(text)
             
-            if self.config.debugMode:
+            if self.snapshot.debugMode:
                 stats = self.get_segment_statistics(segments)
                 print(f"Segmentation stats: {stats}")
             
             # Step 2: Process each segment with appropriate processors
             processed_segments = []
             for i, segment in enumerate(segments):
-                if self.config.debugMode:
-                    print(f"Processing segment {i+1}/{len(segments)}: {segment['type']}")
+                if self.snapshot.debugMode:
+                    print(f"Processing segment {i+1}/{len(segments)}: {segment.type}")
                 
-                processed_segment = self.process_segment(segment, mask_mappings)
+                processed_segment = self.process_segment(segment, text, mask_mappings)
                 processed_segments.append(processed_segment)
             
             # Step 3: Validate processing
@@ -58,23 +87,22 @@ class TextProcessor:
                 print("Warning: Segment processing validation failed, using original text")
                 return text
             
-            # Step 4: Reconstruct the final text
-            processed_text = self.reconstruct_text(processed_segments)
-            
-            # Step 5: Apply custom regex patterns (global processing)
-            processed_text = self.process_custom_regex(processed_text, mask_mappings)
+            # Step 4: Reconstruct the final text by applying the segments' edits to the original
+            # (custom regex patterns are applied per segment by the combined PII scan)
+            processed_text = self.reconstruct_text(processed_segments, text)
             
-            if self.config.debugMode:
+            if self.snapshot.debugMode:
                 print(f"Final processed text length: {len(processed_text)}")
                 print(f"Total mask mappings: {len(mask_mappings)}")
+                print(f"Block cache: {self.block_cache.get_statistics()}")
                 print(f"=== Text processing pipeline completed ===")
             
             # Clear previous mappings and store new ones
             last_mask_mappings.clear()
-            last_mask_mappings.extend(mask_mappings)
+            last_mask_mappings.extend(mask_mappings.to_list())
             
             # Save to database with mask mappings
-            self.db.add_entry(text, processed_text, active_window, timestamp, mask_mappings)   
+            self.db.add_entry(text, processed_text, active_window, timestamp, mask_mappings.to_list())   
             return processed_text
             
         except Exception as e:
@@ -86,209 +114,232 @@ class TextProcessor:
             # Return original text on error
             return text
 
-    def segment_text(self, text: str) -> List[Dict[str, Any]]:
+    def segment_text(self, text: str) -> List[Segment]:
         """
         Detect and separate code and text segments from the input text.
-        Returns a list of segments with their type, content, and position information.
+        Returns Segments holding each block's type, confidence and offsets into text.
         """
         segments = []
         
         # Split text into potential blocks (by double newlines or significant whitespace)
-        blocks = self.split_into_blocks(text)
+        spans = self.split_into_block_spans(text)
         
-        if not blocks:
+        if not spans:
             # If no blocks found, classify the entire text
-            if self.code_checker.model_available and self.code_checker.code_classifier:
-                classification = self.code_checker.code_classifier.predict_with_confidence(text)
-            else:
-                classification = self.code_checker.manual_code_checker.predict_with_confidence(text)
+            classification = self.code_checker.predict_with_confidence(text)
             segment_type = "CODE" if classification["is_code"] else "TEXT"
-            
-            segment = {
-                "type": segment_type,
-                "content": text,
-                "start_pos": 0,
-                "end_pos": len(text),
-                "confidence": classification["confidence"],
-                "processed": False
-            }
-            segments.append(segment)
+            segments.append(Segment(segment_type, 0, len(text), classification["confidence"]))
             return segments
         
-        current_position = 0
+        for start, end, classification in self.classify_blocks(text, spans):
+            segments.append(Segment(classification["type"], start, end, classification["confidence"]))
+            
+            if self.snapshot.debugMode:
+                print(f"Segment: {classification['type']} (confidence: {classification['confidence']:.2f})")
+                print(f"Content: {text[start:min(end, start + 100)]}{'...' if end - start > 100 else ''}")
         
-        for block in blocks:
-            block_text = block.strip()
-            if not block_text:
-                continue
-                
-            # Classify the block as code or text
-            if self.code_checker.model_available and self.code_checker.code_classifier:
-                classification = self.code_checker.code_classifier.predict_with_confidence(block_text)
-            else:
-                classification = self.code_checker.manual_code_checker.predict_with_confidence(block_text)
+        return segments
+
+    def classify_blocks(self, text: str, spans: List[Tuple[int, int]]):
+        """
+        Yield (start, end, classification) for each block span of text.
+        A long block whose sampled windows disagree is split into lines, and runs of lines of
+        the same type are yielded as separate blocks.
+        """
+        for start, end in spans:
+            block_text = text[start:end]
             
-            # Use model prediction if confidence is high enough, otherwise use heuristics
-            if classification["confidence"] > 0.7:
-                segment_type = "CODE" if classification["is_code"] else "TEXT"
+            # Classify the block as code or text (cached for unchanged blocks)
+            classification = self.classify_block(block_text)
+            if classification.get("mixed") and '\n' in block_text:
+                yield from self.classify_mixed_block(text, start, end)
             else:
-                # Fallback to heuristic-based classification
-                segment_type = self.heuristic_code_detection(block_text)
-                classification["confidence"] = 0.6  # Lower confidence for heuristic
-            
-            # Find the actual position of this block in the original text
-            start_pos = text.find(block_text, current_position)
-            if start_pos == -1:  # Fallback if not found
-                start_pos = current_position
-            end_pos = start_pos + len(block_text)
-            
-            segment = {
-                "type": segment_type,
-                "content": block_text,
-                "start_pos": start_pos,
-                "end_pos": end_pos,
-                "confidence": classification["confidence"],
-                "processed": False
-            }
-            
-            segments.append(segment)
-            current_position = end_pos
-            
-            if self.config.debugMode:
-                print(f"Segment: {segment_type} (confidence: {classification['confidence']:.2f})")
-                print(f"Content: {block_text[:100]}{'...' if len(block_text) > 100 else ''}")
+                yield start, end, classification
+
+    def classify_mixed_block(self, text: str, start: int, end: int) -> List[Tuple[int, int, Dict[str, Any]]]:
+        """
+        Classify the lines of text[start:end], a block holding both code and prose, in one batch
+        and merge consecutive lines of the same type into one block.
+        """
+        line_spans = list(iter_block_spans(text, start, end, separator=LINE_SEPARATOR))
+        lines = [text[line_start:line_end] for line_start, line_end in line_spans]
         
-        return segments
+        classifications = [self._classification_result(line, classification) for line, classification
+                           in zip(lines, self.code_checker.predict_batch(lines))]
+        
+        runs = []
+        for (line_start, line_end), classification in zip(line_spans, classifications):
+            if runs and runs[-1][2]["type"] == classification["type"]:
+                runs[-1][1] = line_end
+                runs[-1][2]["confidence"] = min(runs[-1][2]["confidence"], classification["confidence"])
+            else:
+                runs.append([line_start, line_end, dict(classification)])
+        return [tuple(run) for run in runs]
+
+    def classify_block(self, block_text: str) -> Dict[str, Any]:
+        """
+        Classify a single block as CODE or TEXT.
+        Results are memoized by block content and classifier signature so unchanged blocks
+        are not reclassified until the model, its fallback or the cascade thresholds change.
+        """
+        block_hash = self.block_cache.hash_block(block_text)
+        signature = self.code_checker.classification_signature()
+        cached = self.block_cache.get("classification", block_hash, signature)
+        if cached is not None:
+            return dict(cached)
+        
+        # Heuristic/transformer cascade (heuristics alone when the model is unavailable)
+        classification = self.code_checker.predict_with_confidence(block_text)
+        result = self._classification_result(block_text, classification)
+        # Long blocks are classified by sampled windows; "mixed" means they disagreed
+        if classification.get("mixed"):
+            result["mixed"] = True
+        
+        # Re-read: a model failing during this call switches the checker to the manual fallback
+        self.block_cache.put("classification", block_hash, result, self.code_checker.classification_signature())
+        return dict(result)
+
+    def _classification_result(self, block_text: str, classification: Dict[str, Any]) -> Dict[str, Any]:
+        # Use model prediction if confidence is high enough, otherwise use heuristics
+        if classification["confidence"] > 0.7:
+            return {
+                "type": "CODE" if classification["is_code"] else "TEXT",
+                "confidence": classification["confidence"]
+            }
+        # Fallback to heuristic-based classification with lower confidence
+        return {"type": self.heuristic_code_detection(block_text), "confidence": 0.6}
 
     def split_into_blocks(self, text: str) -> List[str]:
         """
         Split text into logical blocks for classification.
         Uses double newlines, code block markers, and other heuristics.
         """
+        return [text[start:end] for start, end in self.split_into_block_spans(text)]
+
+    def split_into_block_spans(self, text: str) -> List[Tuple[int, int]]:
+        """
+        (start, end) offsets of the blocks of text, stripped of surrounding whitespace.
+        Large blocks are kept whole: the classifier samples windows of them and
+        classify_blocks splits one into lines only if the windows disagree.
+        """
         # Handle empty or very short text
         if not text.strip():
             return []
         
-        # Split by double newlines first
-        blocks = re.split(r'\n\s*\n', text)
-        
-        # Further split large blocks that might contain mixed content
-        refined_blocks = []
-        for block in blocks:
-            block = block.strip()
-            if not block:
-                continue
-                
-            if len(block) > 500:  # Large block, try to split further
-                # Split by single newlines for large blocks
-                sub_blocks = [b.strip() for b in block.split('\n') if b.strip()]
-                refined_blocks.extend(sub_blocks)
-            else:
-                refined_blocks.append(block)
-        
-        # If no blocks found, treat the entire text as one block
-        if not refined_blocks:
-            refined_blocks = [text.strip()]
-        
-        return refined_blocks
+        # Split by double newlines
+        return list(iter_block_spans(text))
 
-    def process_segment(self, segment: Dict[str, Any], mask_mappings: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def process_segment(self, segment: Segment, text: str, mask_mappings: MaskMappingSet) -> Segment:
         """
-        Process a single segment based on its type (CODE or TEXT).
-        Returns the processed segment with updated content.
+        Process a single segment of text based on its type (CODE or TEXT).
+        Returns the segment with its edit recorded.
         """
-        segment_type = segment["type"]
-        content = segment["content"]
-        
-        if segment_type == "CODE":
-            return self.process_code_segment(segment, mask_mappings)
+        if segment.type == "CODE":
+            return self.process_code_segment(segment, text, mask_mappings)
         else:  # TEXT
-            return self.process_text_segment(segment, mask_mappings)
+            return self.process_text_segment(segment, text, mask_mappings)
 
-    def process_code_segment(self, segment: Dict[str, Any], mask_mappings: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def process_code_segment(self, segment: Segment, text: str, mask_mappings: MaskMappingSet) -> Segment:
         """
         Process a code segment using code-specific processors.
         """
-        content = segment["content"]
+        content = segment.content(text)
         processed_content = content
         
         # Only process if code protection is enabled
-        if self.config.code_protection_enabled:
+        if self.snapshot.code_protection_enabled:
             try:
-                code_protection_types = getattr(self.config, 'codeProtectionTypes', [])
-                
-                # Detect language for the code segment
-                language = self.code_checker.detect_language(content)
+                code_protection_types = self.snapshot.codeProtectionTypes
                 
-                # Process code using the code checker
-                replacement_map = self.code_checker.process_code(content, code_protection_types)
+                # Reuse the analysis of an unchanged block for the same enabled protection types
+                block_hash = self.block_cache.hash_block(content)
+                signature = self.snapshot.code_protection_signature
+                cached = self.block_cache.get("code", block_hash, signature)
+                if cached is not None:
+                    language, replacement_map = cached
+                else:
+                    # Detect language for the code segment
+                    language = self.code_checker.detect_language(content)
+                    
+                    # Process code using the code checker
+                    replacement_map = self.code_checker.process_code(content, code_protection_types)
+                    self.block_cache.put("code", block_hash, (language, replacement_map), signature)
                 
                 # Apply replacements and track mappings
                 for original, replacement in replacement_map.items():
                     if self.add_to_mask_mappings(mask_mappings, original, replacement, f"CODE_{language.upper()}"):
                         processed_content = processed_content.replace(original, replacement)
-                        if self.config.debugMode:
+                        if self.snapshot.debugMode:
                             print(f"Code masking: {original} -> {replacement}")
             except Exception as e:
                 print(f"Error processing code segment: {e}")
                 # Continue with unprocessed content if there's an error
         
-        # Mark segment as processed
-        segment["content"] = processed_content
-        segment["processed"] = True
+        # Custom regex patterns apply to code as well (emails/phones are only masked in text)
+        processed_content = self.process_pii_on_text(processed_content, mask_mappings, ("CUSTOM_REGEX",))
+        
+        # Record the result as an edit of the segment's span
+        segment.set_result(text, processed_content)
         return segment
 
-    def process_text_segment(self, segment: Dict[str, Any], mask_mappings: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def process_text_segment(self, segment: Segment, text: str, mask_mappings: MaskMappingSet) -> Segment:
         """
         Process a text segment using text-specific processors.
         """
-        content = segment["content"]
+        content = segment.content(text)
         processed_content = content
         
-        # Step 1: AI-based NER processing (spaCy)
-        if self.config.ai_enabled:
-            processed_content = self.process_ai_on_text(processed_content, mask_mappings)
+        # Step 1: Custom terms, matched without NER so they apply even with AI masking off
+        processed_content = self.process_custom_terms_on_text(processed_content, mask_mappings)
         
-        # Step 2: Email processing
-        if self.config.email_enabled:
-            processed_content = self.process_emails_on_text(processed_content, mask_mappings)
+        # Step 2: AI-based NER processing (spaCy)
+        if self.snapshot.ai_enabled:
+            processed_content = self.process_ai_on_text(processed_content, mask_mappings)
         
-        # Step 3: Phone number processing
-        if self.config.phone_enabled:
-            processed_content = self.process_phone_numbers_on_text(processed_content, mask_mappings)
+        # Step 3: Email, phone and custom regex processing in a single scan
+        processed_content = self.process_pii_on_text(processed_content, mask_mappings,
+                                                     ("EMAIL", "PHONE", "CUSTOM_REGEX"))
         
-        # Mark segment as processed
-        segment["content"] = processed_content
-        segment["processed"] = True
+        # Record the result as an edit of the segment's span
+        segment.set_result(text, processed_content)
         return segment
 
-    def process_ai_on_text(self, text: str, mask_mappings: List[Dict[str, Any]]) -> str:
+    def process_ai_on_text(self, text: str, mask_mappings: MaskMappingSet) -> str:
         """
         Apply AI-based NER processing only to text segments.
         """
         try:
+            self.ensure_ner_ensemble()
+            
             # Try to load spaCy model if not already loaded
             if not self.spacy_checker.nlp and not self.spacy_checker.nlp_models:
                 self.spacy_checker.load_spacy_model("en_core_web_sm")
             
             # Use AI processing if available
             if self.spacy_checker.nlp or self.spacy_checker.nlp_models:
-                replacement_map = self.spacy_checker.analyze_and_replace_entities(text)
+                # NER results depend only on the block and the loaded models/custom terms
+                block_hash = self.block_cache.hash_block(text)
+                replacement_map = self.block_cache.get("ai", block_hash, self.spacy_checker.version)
+                if replacement_map is None:
+                    replacement_map, complete = self.spacy_checker.analyze_entities(text)
+                    # Degraded results (an ensemble model skipped or failed) are recomputed next time
+                    if complete:
+                        self.block_cache.put("ai", block_hash, replacement_map, self.spacy_checker.version)
                 
                 if replacement_map:
                     # Process the AI mappings
                     for original, replacement in replacement_map.items():
                         if self.add_to_mask_mappings(mask_mappings, original, replacement, "Spacy"):
-                            if self.config.debugMode:
+                            if self.snapshot.debugMode:
                                 print(f"AI masking: {original} -> {replacement}")
                             
                             # Replace all occurrences
                             text = text.replace(original, replacement)
                         else:
-                            if self.config.debugMode:
+                            if self.snapshot.debugMode:
                                 print(f"Did not add to mask mappings: {original} -> {replacement}")
                 else:
-                    if self.config.debugMode:
+                    if self.snapshot.debugMode:
                         print("AI processing failed or returned empty result")
             else:
                 print("spaCy not available - skipping AI processing")
@@ -298,122 +349,189 @@ class TextProcessor:
         
         return text
 
-    def process_emails_on_text(self, text: str, mask_mappings: List[Dict[str, Any]]) -> str:
+    def ensure_ner_ensemble(self):
+        """Load the configured ensemble models (once per change) and apply the merge policy and latency budget"""
+        model_names = tuple(self.snapshot.ner_ensemble_models)
+        # A single model is loaded the same way, so disabling models also shrinks a running ensemble
+        if model_names and model_names != self._ner_ensemble_models:
+            self._ner_ensemble_models = model_names
+            self.spacy_checker.load_spacy_models(list(model_names))
+        self.spacy_checker.configure_ensemble(self.snapshot.ner_ensemble_policy,
+                                              self.snapshot.ner_latency_budget_seconds)
+
+    def process_custom_terms_on_text(self, text: str, mask_mappings: MaskMappingSet) -> str:
         """
-        Apply email masking only to text segments.
+        Replace enabled custom terms (multi-word, case-insensitive) found by one pass of the
+        custom term automaton.
         """
-        email_mask_type = self.config.email_mask_type  # 0 = NONE
-        if email_mask_type != 0 and self.email_checker.contains_email(text):
-            
-            email_matches = self.email_checker.find_emails(text)
-            if self.config.debugMode:
-                print(f"Email matches found: {email_matches}")
-            
-            for match in email_matches:
-                email_defined_text = self.config.email_defined_text
-                masked_email = self.email_checker.mask_email(match, email_mask_type, email_defined_text)
-                
-                # Replace in text
-                text = text.replace(match, masked_email)
-                
-                # Add to mappings
-                if self.add_to_mask_mappings(mask_mappings, match, masked_email, "EMAIL"):
-                    if self.config.debugMode:
-                        print(f"Email masking: {match} -> {masked_email}")
-        
-        return text
+        matcher = self.get_custom_term_matcher()
+        matches = matcher.find_matches(text)
+        if not matches:
+            return text
+        if self.snapshot.debugMode:
+            print(f"Custom terms found: {[text[start:end] for start, end, _ in matches]}")
+        
+        # Rebuild the text in one pass; matches are ordered and non-overlapping
+        parts = []
+        last_end = 0
+        for start, end, replacement in matches:
+            original_text = text[start:end]
+            self.add_to_mask_mappings(mask_mappings, original_text, replacement, "CUSTOM_TERM")
+            parts.append(text[last_end:start])
+            parts.append(replacement)
+            last_end = end
+        parts.append(text[last_end:])
+        return "".join(parts)
+
+    def get_custom_term_matcher(self) -> CustomTermMatcher:
+        """Return the custom term matcher, syncing it with the snapshot only when the config version changes"""
+        snapshot = self.snapshot
+        if snapshot.version != self._custom_term_matcher_version:
+            self.custom_term_matcher.update_terms({
+                t.get('term'): t.get('replacement') or ""
+                for t in snapshot.customTerms if t.get('enabled', False) and t.get('term')
+            })
+            self._custom_term_matcher_version = snapshot.version
+        return self.custom_term_matcher
 
-    def process_phone_numbers_on_text(self, text: str, mask_mappings: List[Dict[str, Any]]) -> str:
+    def process_pii_on_text(self, text: str, mask_mappings: MaskMappingSet, span_types: Tuple[str, ...]) -> str:
         """
-        Apply phone number masking only to text segments.
+        Mask email, phone and custom regex matches found by one pass of the PII scanner.
+        Only spans whose type is in span_types are replaced.
         """
-        phone_mask_type = self.config.phone_mask_type  # 0 = NONE
-        if phone_mask_type != 0 and self.phone_checker.contains_phone(text):
-            
-            phone_matches = self.phone_checker.find_phone_numbers(text)
-            for match in phone_matches:
-                phone_defined_text = self.config.phone_defined_text
-                masked_phone = self.phone_checker.mask_phone(match, phone_mask_type, phone_defined_text)
-                
-                # Replace in text
-                text = text.replace(match, masked_phone)
-                
-                # Add to mappings
-                if self.add_to_mask_mappings(mask_mappings, match, masked_phone, "PHONE"):
-                    if self.config.debugMode:
-                        print(f"Phone masking: {match} -> {masked_phone}")
+        scanner = self.get_pii_scanner()
+        if not scanner.detectors:
+            return text
         
-        return text
+        spans = [span for span in scanner.scan(text) if span["type"] in span_types]
+        self.record_regex_timeouts(scanner)
+        if self.snapshot.debugMode and spans:
+            print(f"PII spans found: {[(span['type'], span['text']) for span in spans]}")
+        
+        # Rebuild the text in one pass; spans are ordered and non-overlapping
+        parts = []
+        last_end = 0
+        for span in spans:
+            replacement = self.get_span_replacement(span, mask_mappings)
+            if replacement is None:
+                continue
+            parts.append(text[last_end:span["start"]])
+            parts.append(replacement)
+            last_end = span["end"]
+        parts.append(text[last_end:])
+        return "".join(parts)
 
-    def reconstruct_text(self, segments: List[Dict[str, Any]]) -> str:
+    def get_span_replacement(self, span: Dict[str, Any], mask_mappings: MaskMappingSet):
+        """Return the masked value for a scanner span, or None to leave it unchanged"""
+        original_text = span["text"]
+        
+        if span["type"] == "EMAIL":
+            masked_email = self.email_checker.mask_email(original_text, self.snapshot.email_mask_type,
+                                                         self.snapshot.email_defined_text)
+            if self.add_to_mask_mappings(mask_mappings, original_text, masked_email, "EMAIL"):
+                if self.snapshot.debugMode:
+                    print(f"Email masking: {original_text} -> {masked_email}")
+            return masked_email
+        
+        if span["type"] == "PHONE":
+            masked_phone = self.phone_checker.mask_phone(original_text, self.snapshot.phone_mask_type,
+                                                         self.snapshot.phone_defined_text)
+            if self.add_to_mask_mappings(mask_mappings, original_text, masked_phone, "PHONE"):
+                if self.snapshot.debugMode:
+                    print(f"Phone masking: {original_text} -> {masked_phone}")
+            return masked_phone
+        
+        # CUSTOM_REGEX: repeated matches reuse the replacement of the first occurrence
+        pattern_config = span["data"]
+        mask_type = f"CUSTOM_REGEX ({pattern_config.get('regex', '')})"
+        existing = mask_mappings.get(original_text)
+        if existing is not None:
+            return existing["maskedText"] if existing["maskType"] == mask_type else None
+        
+        replacement = f"{pattern_config.get('replacement', '')}{mask_mappings.count_by_type(mask_type)} "
+        if self.add_to_mask_mappings(mask_mappings, original_text, replacement, mask_type):
+            if self.snapshot.debugMode:
+                print(f"Custom regex masking: {original_text} -> {replacement}")
+            return replacement
+        return None
+
+    def record_regex_timeouts(self, scanner: PIIScanner):
+        """
+        Track consecutive timeouts per custom regex pattern and disable a pattern
+        once it reaches custom_regex_max_timeouts.
+        The pattern is dropped from the scanner at once; the config update runs through
+        config_dispatcher and is retried on later events until it succeeds.
+        """
+        max_timeouts = self.snapshot.custom_regex_max_timeouts
+        for detector in list(scanner.detectors):
+            if detector["type"] != "CUSTOM_REGEX":
+                continue
+            name = detector["name"]
+            if name not in scanner.timed_out:
+                self._regex_timeout_counts.pop(name, None)
+                continue
+            count = self._regex_timeout_counts.get(name, 0) + 1
+            self._regex_timeout_counts[name] = count
+            if count >= max_timeouts:
+                print(f"Disabling custom regex pattern {detector['data'].get('regex')} after {count} timeouts")
+                self._excluded_regex_detectors[name] = detector["data"]
+                scanner.remove_detector(name)
+        
+        for name, pattern_config in list(self._excluded_regex_detectors.items()):
+            if name not in self._pending_regex_disables:
+                self._pending_regex_disables.add(name)
+                self.dispatch_config_update(lambda n=name, c=pattern_config: self._disable_regex_pattern(n, c))
+
+    def dispatch_config_update(self, callback):
+        """Run a config write on the thread owning the config connection (or here without a dispatcher)"""
+        if self.config_dispatcher is not None:
+            self.config_dispatcher(callback)
+        else:
+            callback()
+
+    def _disable_regex_pattern(self, name: str, pattern_config: Dict[str, Any]):
+        try:
+            if self.config.update_custom_regex_pattern(pattern_config.get('id'), enabled=False):
+                # The new config snapshot no longer contains the pattern
+                self._regex_timeout_counts.pop(name, None)
+                self._excluded_regex_detectors.pop(name, None)
+            else:
+                print(f"Could not disable custom regex pattern {pattern_config.get('regex')}; skipping it until it is")
+        finally:
+            self._pending_regex_disables.discard(name)
+
+    def get_pii_scanner(self) -> PIIScanner:
+        """Return the combined PII scanner, rebuilding it only when the config version changes"""
+        snapshot = self.snapshot
+        if self._pii_scanner is not None and snapshot.version == self._pii_scanner_version:
+            return self._pii_scanner
+        
+        scanner = PIIScanner(timeout=snapshot.pii_scan_timeout_seconds, sandbox=self.regex_sandbox)
+        if snapshot.email_enabled and snapshot.email_mask_type != 0:  # 0 = NONE
+            scanner.add_detector("EMAIL", "EMAIL", self.email_checker.email_pattern)
+        if snapshot.phone_enabled and snapshot.phone_mask_type != 0:  # 0 = NONE
+            scanner.add_detector("PHONE", "PHONE", self.phone_checker.phone_pattern)
+        if snapshot.custom_regex_enabled:
+            for pattern_config in snapshot.enabled_custom_regex_patterns:
+                if f"CUSTOM_REGEX_{pattern_config.get('id')}" in self._excluded_regex_detectors:
+                    continue
+                scanner.add_detector(f"CUSTOM_REGEX_{pattern_config.get('id')}", "CUSTOM_REGEX",
+                                     pattern_config['regex'], data=pattern_config, trusted=False)
+        
+        self._pii_scanner = scanner.compile()
+        self._pii_scanner_version = snapshot.version
+        return self._pii_scanner
+
+    def reconstruct_text(self, segments: List[Segment], text: str) -> str:
         """
         Reconstruct the final text from processed segments.
-        Maintains the original structure and spacing.
+        Maintains the original structure and spacing: only the edited spans are replaced.
         """
         if not segments:
             return ""
-        
-        # Sort segments by their original position
-        sorted_segments = sorted(segments, key=lambda x: x["start_pos"])
-        
-        # Reconstruct text with proper spacing
-        reconstructed_parts = []
-        for i, segment in enumerate(sorted_segments):
-            reconstructed_parts.append(segment["content"])
-            
-            # Add spacing between segments (but not after the last one)
-            if i < len(sorted_segments) - 1:
-                # Check if there should be spacing based on original positions
-                current_end = segment["end_pos"]
-                next_start = sorted_segments[i + 1]["start_pos"]
-                
-                if next_start > current_end:
-                    # There was original spacing, preserve it
-                    reconstructed_parts.append("")
-        
-        return "\n\n".join(reconstructed_parts)
+        return apply_span_edits(text, segments)
 
-    def process_custom_regex(self, processed_text: str, mask_mappings: List[Dict[str, Any]]) -> str:
-        """Process custom regex patterns if enabled - applied globally to final text"""
-        
-        # Check if custom regex is enabled
-        if (self.config.custom_regex_enabled):
-            
-            custom_regex_patterns = self.config.customRegexPatterns
-            for pattern_config in custom_regex_patterns:
-                if pattern_config.get('enabled', False):
-                    try:
-                        regex_pattern = pattern_config.get('regex', '')
-                        replacement_base = pattern_config.get('replacement', '')
-                        
-                        # Find all matches
-                        matches = list(re.finditer(regex_pattern, processed_text))
-                        count = 0
-                        
-                        # Process matches in reverse order to maintain positions
-                        for match in reversed(matches):
-                            replacement = f"{replacement_base}{count} "
-                            original_text = match.group(0)
-                            
-                            # Add to mask mappings
-                            if self.add_to_mask_mappings(mask_mappings, original_text, replacement, 
-                                                        f"CUSTOM_REGEX ({regex_pattern})"):
-                                # Replace in text
-                                start, end = match.span()
-                                processed_text = processed_text[:start] + replacement + processed_text[end:]
-                                count += 1
-                                
-                                if self.config.debugMode:
-                                    print(f"Custom regex masking: {original_text} -> {replacement}")
-                                
-                    except re.error as e:
-                        print(f"Invalid regex pattern: {e}")
-                    except Exception as e:
-                        print(f"Error processing custom regex: {e}")
-        
-        return processed_text
-
-    def get_segment_statistics(self, segments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def get_segment_statistics(self, segments: List[Segment]) -> Dict[str, Any]:
         """
         Get statistics about the segmented text for debugging and monitoring.
         """
@@ -429,13 +547,13 @@ class TextProcessor:
         if segments:
             total_confidence = 0.0
             for segment in segments:
-                if segment["type"] == "CODE":
+                if segment.type == "CODE":
                     stats["code_segments"] += 1
-                    stats["total_code_length"] += len(segment["content"])
+                    stats["total_code_length"] += len(segment)
                 else:
                     stats["text_segments"] += 1
-                    stats["total_text_length"] += len(segment["content"])
-                total_confidence += segment["confidence"]
+                    stats["total_text_length"] += len(segment)
+                total_confidence += segment.confidence
             
             stats["average_confidence"] = total_confidence / len(segments)
         
@@ -495,18 +613,18 @@ class TextProcessor:
         else:
             return "TEXT"
 
-    def validate_segment_processing(self, original_text: str, processed_segments: List[Dict[str, Any]]) -> bool:
+    def validate_segment_processing(self, original_text: str, processed_segments: List[Segment]) -> bool:
         """
         Validate that all segments have been processed and the reconstruction is valid.
         """
         # Check that all segments are processed
         for segment in processed_segments:
-            if not segment.get("processed", False):
-                print(f"Warning: Segment not processed: {segment['type']}")
+            if not segment.processed:
+                print(f"Warning: Segment not processed: {segment.type}")
                 return False
         
         # Check that reconstruction maintains reasonable length
-        reconstructed = self.reconstruct_text(processed_segments)
+        reconstructed = self.reconstruct_text(processed_segments, original_text)
         if len(reconstructed) < len(original_text) * 0.5:  # Should not lose more than 50% of content
             print(f"Warning: Reconstructed text is too short: {len(reconstructed)} vs {len(original_text)}")
             return False
@@ -517,7 +635,7 @@ class TextProcessor:
         """Check if text is masked by checking database and patterns"""
         # First check if this text exists as a masked text in the database
         if self.db.is_masked_text_in_history(text):
-            if self.config.debugMode:
+            if self.snapshot.debugMode:
                 print(f"isTextMasked: {text} is true")
             return True
 
@@ -586,36 +704,20 @@ class TextProcessor:
         
         return result
 
-    def add_to_mask_mappings(self, mask_mappings: List[Dict[str, Any]], original_text: str, 
+    def add_to_mask_mappings(self, mask_mappings: MaskMappingSet, original_text: str, 
                            masked_text: str, mask_type: str) -> bool:
         """Add to mask mappings if not already present and not in should erase list"""
         try:
-            # Check if already in mappings
-            for mapping in mask_mappings:
-                if mapping.get('originalText') == original_text:
-                    return False
-            
-            # Check should erase list
-            should_erase_list = self.get_should_erase_list()
-            
             # Debug logging
-            if getattr(self.config, 'debugMode', False):
-                print(f"Should erase list: {should_erase_list}")
+            if self.snapshot.debugMode:
+                print(f"Should erase list: {mask_mappings.should_erase_matcher.patterns if mask_mappings.should_erase_matcher else []}")
                 print(f"Original text: {original_text}")
             
-            should_erase = any(pattern in original_text for pattern in should_erase_list)
-            
-            if should_erase:
-                if getattr(self.config, 'debugMode', False):
-                    print(f"Text '{original_text}' matches should_erase pattern, skipping")
-                return False
-            else:
-                mask_mappings.append({
-                    "originalText": original_text,
-                    "maskedText": masked_text,
-                    "maskType": mask_type
-                })
-                return True
+            # Duplicate and should-erase checks are O(1) / single-scan inside the set
+            added = mask_mappings.add(original_text, masked_text, mask_type)
+            if not added and self.snapshot.debugMode and original_text not in mask_mappings:
+                print(f"Text '{original_text}' matches should_erase pattern, skipping")
+            return added
                 
         except Exception as e:
             import traceback
@@ -638,7 +740,7 @@ class TextProcessor:
             # Check for duplicates and update if exists
             term_exists = False
             for existing in existing_terms:
-                if self.config.debugMode:
+                if self.snapshot.debugMode:
                     print(f"existing: {existing.get('term')} {existing.get('replacement')}")
                 
                 existing_lower = existing.get('term', '').lower()
@@ -657,7 +759,7 @@ class TextProcessor:
                 existing_terms.append(custom_terms)
             
             # Save all terms
-            if self.config.debugMode:
+            if self.snapshot.debugMode:
                 print("saving custom terms")
                 for term in existing_terms:
                     print(f"existingTerms: {term.get('id')} {term.get('spacyModelId')} {term.get('term')} {term.get('replacement')} {term.get('enabled')}")
@@ -679,7 +781,7 @@ class TextProcessor:
     def set_custom_terms(self, path: str) -> bool:
         """Set custom terms from file"""
         try:
-            if self.config.debugMode:
+            if self.snapshot.debugMode:
                 print(f"setCustomTerms: {path}")
             
             # Read the file line by line and add to database
@@ -697,7 +799,7 @@ class TextProcessor:
                         if self.db.is_custom_term_already_in_database(term_lower):
                             continue
                         
-                        if self.config.debugMode:
+                        if self.snapshot.debugMode:
                             print(f"saving custom term with path: {path} {term_lower} {replacement}")
                         
                         custom_term = {
@@ -717,53 +819,15 @@ class TextProcessor:
 
     def get_should_erase_list(self) -> List[str]:
         """Get list of patterns that should be erased from mask mappings"""
-        should_erase_list = []
-        
-        # Add AI processing types - convert integers to string patterns
-        ai_processing_types = self.config.aiProcessingTypes
-        for ai_type in ai_processing_types:
-            mask_option = ai_type.get('aiMaskOption', '')
-            if mask_option is not None:
-                # Convert integer mask option to string pattern
-                pattern = self.string_to_ai_mask_option(str(mask_option))
-                if pattern:
-                    should_erase_list.append(pattern)
-        
-        # Add code protection patterns
-        should_erase_list.extend([
-            "METHOD_NAME_",
-            "PARAMETER_CLASS_NAME_", 
-            "CLASS_NAME_"
-        ])
-        
-        return should_erase_list
+        return build_should_erase_patterns(self.snapshot.aiProcessingTypes)
+
+    def get_should_erase_matcher(self) -> ShouldEraseMatcher:
+        """Return the should-erase matcher precompiled in the config snapshot"""
+        return self.snapshot.should_erase_matcher
 
     def string_to_ai_mask_option(self, mask_option: str) -> str:
         """Convert AI mask option to string representation"""
-        # Convert AI mask option numbers to string patterns
-        # Based on the AI processing types in the database
-        mask_option_map = {
-            '0': 'PERSON',
-            '1': 'ORG', 
-            '2': 'GPE',
-            '3': 'DATE',
-            '4': 'LOC',
-            '5': 'PRODUCT',
-            '6': 'EVENT',
-            '7': 'WORK_OF_ART',
-            '8': 'LAW',
-            '9': 'LANGUAGE',
-            '10': 'TIME',
-            '11': 'PERCENT',
-            '12': 'MONEY',
-            '13': 'QUANTITY',
-            '14': 'ORDINAL',
-            '15': 'CARDINAL',
-            '16': 'NORP',
-            '17': 'FAC'
-        }
-        
-        return mask_option_map.get(mask_option, f"AI_{mask_option}")
+        return AI_MASK_OPTION_LABELS.get(mask_option, f"AI_{mask_option}")
 
     def get_current_timestamp(self) -> str:
         """Return current timestamp as string"""
@@ -6,6 +6,11 @@ import customtkinter as ctk
 from src.ui.tooltip import Tooltip
 from src.utils.scroll_manager import ScrollManager
 
+# Failed history page loads: retries before giving up, and the first and largest retry delay
+LOAD_RETRY_LIMIT = 5
+LOAD_RETRY_BASE_MS = 500
+LOAD_RETRY_MAX_MS = 8000
+
 class HistoryPage:
     def __init__(self, parent, clipboard_service, main_window=None):
         self.frame = ctk.CTkFrame(parent, fg_color="#1a1a1a")
@@ -19,6 +24,16 @@ class HistoryPage:
         self.category_canvas = None
         self.category_scrollbar = None
         
+        # Lazy loading state: history is fetched one keyset page at a time
+        self.page_size = 50
+        self.history_cursor = None
+        self.history_exhausted = False
+        self.loading_page = False
+        self.loaded_card_count = 0
+        # Failed page loads are retried after a growing delay, then given up until the next refresh
+        self.load_failures = 0
+        self.load_retry_id = None
+        
         # Configure customtkinter appearance
         ctk.set_appearance_mode("dark")
         ctk.set_default_color_theme("blue")
@@ -170,6 +185,9 @@ class HistoryPage:
         )
         self.cards_frame.pack(fill="both", expand=True)
         
+        # Load older pages when the strip is scrolled close to its right end
+        self.cards_frame._parent_canvas.configure(xscrollcommand=self._on_cards_scrolled)
+        
         # Refresh history after creating the frame
         self.refresh_history()
 
@@ -387,43 +405,92 @@ class HistoryPage:
             for widget in self.cards_frame.winfo_children():
                 widget.destroy()
             
-            history = self.clipboard_service.get_history(limit=50)
+            self.history_cursor = None
+            self.history_exhausted = False
+            self.loaded_card_count = 0
+            self._cancel_load_retry()
+            self.load_failures = 0
+            self.cards_frame._parent_canvas.xview_moveto(0)
+            self.load_more_history()
+            
+        except Exception as e:
+            print(f"Error refreshing history: {e}")
+
+    def load_more_history(self):
+        """Append the next page of older history cards"""
+        if self.loading_page or self.history_exhausted or not self.cards_frame or self.load_retry_id:
+            return
+        self.loading_page = True
+        failed = False
+        try:
+            history, self.history_cursor = self.clipboard_service.get_history_page(
+                page_size=self.page_size, before=self.history_cursor
+            )
+            self.history_exhausted = self.history_cursor is None
+            self.load_failures = 0
             
             search_term = self.search_var.get().strip().lower()
             if search_term and search_term != "search in original text":
                 filtered_history = []
                 for entry in history:
-                    item_as_dict = entry if isinstance(entry, dict) else {
-                        'originalText': entry[1] if len(entry) > 1 else '',
-                        'maskedText': entry[2] if len(entry) > 2 else '',
-                        'sourceProcess': entry[3] if len(entry) > 3 else '',
-                    }
                     # Search in all text fields
                     searchable_text = ' '.join([
-                        str(item_as_dict.get('originalText', '')),
-                        str(item_as_dict.get('maskedText', '')),
-                        str(item_as_dict.get('sourceProcess', ''))
+                        str(entry.get('originalText', '')),
+                        str(entry.get('maskedText', '')),
+                        str(entry.get('sourceProcess', ''))
                     ]).lower()
                     
                     if search_term in searchable_text:
                         filtered_history.append(entry)
                 history = filtered_history
             
-            for i, entry in enumerate(history):
-                if isinstance(entry, dict):
-                    history_item = entry
-                else:
-                    history_item = {
-                        'originalText': entry[1] if len(entry) > 1 else '',
-                        'maskedText': entry[2] if len(entry) > 2 else '',
-                        'sourceProcess': entry[3] if len(entry) > 3 else '',
-                        'timestamp': entry[4] if len(entry) > 4 else '',
-                        'createdAt': entry[5] if len(entry) > 5 else ''
-                    }
-                self.create_history_card(history_item, i)
+            for entry in history:
+                self.create_history_card(entry, self.loaded_card_count)
+                self.loaded_card_count += 1
             
         except Exception as e:
-            print(f"Error refreshing history: {e}")
+            print(f"Error loading history page: {e}")
+            failed = True
+        finally:
+            self.loading_page = False
+        
+        if failed:
+            self._schedule_load_retry()
+        # A filtered page may not fill the strip, so keep loading until it scrolls or history ends
+        elif not self.history_exhausted:
+            self.frame.after_idle(self._load_more_if_needed)
+
+    def _schedule_load_retry(self):
+        """Retry a failed page load after 0.5s, 1s, 2s, ... and stop after LOAD_RETRY_LIMIT failures"""
+        self.load_failures += 1
+        if self.load_failures > LOAD_RETRY_LIMIT:
+            print("Giving up loading more history until the next refresh")
+            self.history_exhausted = True
+            return
+        delay_ms = min(LOAD_RETRY_BASE_MS * 2 ** (self.load_failures - 1), LOAD_RETRY_MAX_MS)
+        self.load_retry_id = self.frame.after(delay_ms, self._retry_load)
+
+    def _retry_load(self):
+        self.load_retry_id = None
+        self._load_more_if_needed()
+
+    def _cancel_load_retry(self):
+        if self.load_retry_id:
+            self.frame.after_cancel(self.load_retry_id)
+            self.load_retry_id = None
+
+    def _on_cards_scrolled(self, first, last):
+        """xscrollcommand of the cards canvas: keep the hidden scrollbar in sync and load more near the end"""
+        self.cards_frame._scrollbar.set(first, last)
+        if float(last) >= 0.9 and not self.history_exhausted and not self.loading_page and not self.load_retry_id:
+            self.frame.after_idle(self._load_more_if_needed)
+
+    def _load_more_if_needed(self):
+        if not self.cards_frame or not self.cards_frame.winfo_exists():
+            return
+        first, last = self.cards_frame._parent_canvas.xview()
+        if last >= 0.9:
+            self.load_more_history()
 
     def copy_to_clipboard(self, text):
         import pyperclip
@@ -23,6 +23,13 @@ class SimpleGUI:
         """Register the MainWindow so central refresh methods can access pages"""
         self.main_window = main_window
 
+    def run_on_ui_thread(self, callback):
+        """Schedule callback on the Tk thread"""
+        try:
+            self.root.after(0, callback)
+        except Exception as e:
+            print(f"Error scheduling UI callback: {e}")
+
     def refresh_history(self):
         """Central method to refresh the history UI safely on the Tk thread"""
         try:
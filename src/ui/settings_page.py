@@ -7,6 +7,7 @@ from src.utils.scroll_manager import ScrollManager
 
 import tkinter.messagebox as messagebox
 from src.ui.tooltip_info import ToolTipInfo
+from src.services.checkers.regex_guard import RegexGuard
 
 class SettingsPage:
     def __init__(self, parent, config_service, main_window=None):
@@ -321,7 +322,7 @@ class SettingsPage:
             # Check availability first to avoid redundant downloads
             try:
                 from src.services.checkers.spacy_checker import SpacyChecker
-                _checker = SpacyChecker()
+                _checker = SpacyChecker(load_default_model=False)
                 if _checker.is_model_installed(model_short):
                     messagebox.showinfo("Info", f"Model '{model_short}' is already installed.")
                     return
@@ -332,7 +333,7 @@ class SettingsPage:
             if not confirm:
                 return
             from src.services.checkers.spacy_checker import SpacyChecker
-            checker = SpacyChecker()
+            checker = SpacyChecker(load_default_model=False)
             ok = checker.download_spacy_model(model_short)
             if not ok:
                 messagebox.showerror("Error", f"Failed to download spaCy model '{model_short}'.")
@@ -1353,6 +1354,18 @@ class SettingsPage:
                 messagebox.showerror("Error", "Apply For field is required!")
                 return
             
+            # Reject patterns that don't compile or backtrack catastrophically on adversarial input
+            regex_guard = RegexGuard()
+            try:
+                validation = regex_guard.validate_pattern(regex)
+            finally:
+                regex_guard.sandbox.close()
+            if not validation["valid"]:
+                messagebox.showerror("Error", validation["error"])
+                return
+            if validation["warnings"]:
+                print(f"Regex pattern warnings for {regex}: {validation['warnings']}")
+            
             # Add to database
             pattern_id = self.config_service.config_repository.add_custom_regex_pattern(
                 regex, replacement, apply_for, priority, enabled
@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs first in the child interpreter: any import of torch or transformers is recorded and fails
+# loudly, whether or not they are installed, so the test proves laziness instead of absence
+SENTINEL = (
+    "import sys\n"
+    "attempted = []\n"
+    "class HeavyImportSentinel:\n"
+    "    def find_spec(self, name, path=None, target=None):\n"
+    "        if name.split('.')[0] in ('torch', 'transformers'):\n"
+    "            attempted.append(name)\n"
+    "            raise RuntimeError(f'{name} imported')\n"
+    "        return None\n"
+    "for name in [m for m in sys.modules if m.split('.')[0] in ('torch', 'transformers')]:\n"
+    "    del sys.modules[name]\n"
+    "sys.meta_path.insert(0, HeavyImportSentinel())\n"
+)
+
+
+class CheckerImportCostTest(unittest.TestCase):
+    def _run(self, body):
+        result = subprocess.run([sys.executable, "-c", SENTINEL + body], cwd=ROOT, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return result.stdout.strip().splitlines()[-1]
+
+    def test_codebert_backend_does_not_import_torch_until_used(self):
+        output = self._run(
+            "from src.services.checkers.code_checker import CodeChecker\n"
+            "class Config: code_classifier_backend = 'codebert'\n"
+            "checker = CodeChecker(Config())\n"
+            "print(checker.model_available, attempted)\n"
+        )
+        self.assertEqual(output, "True []")
+
+    def test_sentinel_sees_the_import_on_first_use(self):
+        output = self._run(
+            "from src.services.checkers.code_checker import CodeChecker\n"
+            "class Config: code_classifier_backend = 'codebert'\n"
+            "checker = CodeChecker(Config())\n"
+            "try:\n"
+            "    checker.code_classifier.predict_with_confidence('x = 1')\n"
+            "except RuntimeError:\n"
+            "    pass\n"
+            "print(attempted)\n"
+        )
+        self.assertEqual(output, "['torch']")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from src.db.clipboard_repository import ClipboardRepository
+
+
+class ClipboardRepositoryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.repo = ClipboardRepository()
+        self.repo.db.db_path = os.path.join(self.tmp.name, "clipboard.db")
+        self.repo.db.initialize_schema()
+
+    def tearDown(self):
+        self.repo.db.close()
+        self.tmp.cleanup()
+
+
+class CollapsedHistoryTest(ClipboardRepositoryTestCase):
+    def test_collapsed_entry_shows_the_latest_copy(self):
+        first = self.repo.add_entry("secret", "[MASKED]", "editor.exe", "10:00:00")
+        latest = self.repo.add_entry("secret", "[MASKED]", "browser.exe", "10:05:00")
+
+        entries = self.repo.get_history_with_mappings(collapsed=True)
+
+        self.assertEqual(len(entries), 1)
+        entry = entries[0]
+        self.assertEqual(entry["id"], latest)
+        self.assertEqual(entry["sourceProcess"], "browser.exe")
+        self.assertEqual(entry["timestamp"], "10:05:00")
+        self.assertEqual(entry["occurrenceCount"], 2)
+        self.assertEqual([o["id"] for o in entry["occurrences"]], [latest, first])
+
+    def test_distinct_contents_are_not_collapsed(self):
+        self.repo.add_entry("one", "[ONE]", "editor.exe", "10:00:00")
+        self.repo.add_entry("two", "[TWO]", "editor.exe", "10:01:00")
+
+        entries = self.repo.get_history_with_mappings(collapsed=True)
+
+        self.assertEqual([e["originalText"] for e in entries], ["two", "one"])
+        self.assertEqual([e["occurrenceCount"] for e in entries], [1, 1])
+
+
+class UnmaskLookupTest(ClipboardRepositoryTestCase):
+    def test_deduplicated_and_legacy_entries_are_found(self):
+        self.repo.add_entry("alice@example.com", "[EMAIL]", "editor.exe", "10:00:00")
+        conn = self.repo.db.connect()
+        conn.execute("""
+            INSERT INTO clipboard_history (original_text, masked_text, source_process, timestamp)
+            VALUES ('555-0100', '[PHONE]', 'editor.exe', '09:00:00')
+        """)
+        conn.commit()
+
+        self.assertEqual(self.repo.get_original_text("[EMAIL]"), "alice@example.com")
+        self.assertEqual(self.repo.get_original_text("[PHONE]"), "555-0100")
+        self.assertTrue(self.repo.is_masked_text_in_history("[PHONE]"))
+        self.assertFalse(self.repo.is_masked_text_in_history(""))
+        self.assertIsNone(self.repo.get_original_text("[NAME]"))
+
+
+class IncrementalVacuumTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "clipboard.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_existing_database_is_switched_once(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE legacy (id INTEGER PRIMARY KEY)")
+        conn.commit()
+        conn.close()
+
+        repo = ClipboardRepository()
+        repo.db.db_path = self.db_path
+        repo.enable_incremental_vacuum()
+        mode = repo.db.connect().execute("PRAGMA auto_vacuum").fetchone()[0]
+        repo.db.close()
+
+        self.assertEqual(mode, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
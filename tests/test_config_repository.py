@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+
+from src.db.config_repository import ConfigRepository, CONFIG_TABLES
+
+
+class LoadAllTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.repo = ConfigRepository()
+        self.repo.db.db_path = os.path.join(self.tmp.name, "clipboard.db")
+        self.repo.db.initialize_schema()
+
+    def tearDown(self):
+        self.repo.db.close()
+        self.tmp.cleanup()
+
+    def test_reads_every_table_and_ends_its_transaction(self):
+        self.repo.add_trusted_programs([("editor.exe", True, False)])
+
+        tables = self.repo.load_all()
+
+        self.assertIsNone(tables["settings"])
+        self.assertEqual(set(tables), {"settings", *CONFIG_TABLES})
+        self.assertEqual([row[1] for row in tables["trusted_programs"]], ["editor.exe"])
+        self.assertFalse(self.repo.db.connect().in_transaction)
+
+    def test_callers_transaction_is_not_committed(self):
+        conn = self.repo.db.connect()
+        conn.execute("INSERT INTO categories (name) VALUES ('Pending')")
+        self.assertTrue(conn.in_transaction)
+
+        self.repo.load_all()
+        self.assertTrue(conn.in_transaction)
+        conn.rollback()
+
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM categories").fetchone()[0], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+from types import SimpleNamespace
+
+from src.services.config_snapshot import ConfigSnapshot
+
+
+def _spacy_model(name, enabled, downloaded):
+    return {'modelShortName': name, 'modelName': name, 'enabled': enabled, 'downloaded': downloaded}
+
+
+class NerEnsembleModelsTest(unittest.TestCase):
+    def _snapshot(self, ensemble_models=(), spacy_models=()):
+        config = SimpleNamespace(ner_ensemble_models=ensemble_models, spacyModels=list(spacy_models))
+        return ConfigSnapshot(config, 1)
+
+    def test_defaults_to_enabled_downloaded_models(self):
+        snapshot = self._snapshot(spacy_models=[
+            _spacy_model("en_core_web_sm", True, True),
+            _spacy_model("en_core_web_md", True, False),
+            _spacy_model("en_core_web_lg", True, True),
+            _spacy_model("de_core_news_sm", False, True),
+        ])
+        self.assertEqual(snapshot.ner_ensemble_models, ("en_core_web_sm", "en_core_web_lg"))
+
+    def test_configured_models_take_precedence(self):
+        snapshot = self._snapshot(ensemble_models=("en_core_web_md",),
+                                  spacy_models=[_spacy_model("en_core_web_sm", True, True)])
+        self.assertEqual(snapshot.ner_ensemble_models, ("en_core_web_md",))
+
+    def test_no_models_enabled(self):
+        self.assertEqual(self._snapshot().ner_ensemble_models, ())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import tempfile
+import unittest
+
+from src.services.code_classifier.corpus_dedup import CorpusDeduplicator, MinHasher, REPORT_NAME
+
+CODE = ("def compute_total(items):\n    total = 0\n    for item in items:\n"
+        "        total += item.price * item.quantity\n    return total\n\n\n"
+        "def average(values):\n    if not values:\n        return 0.0\n    return sum(values) / len(values)\n\n"
+        "class Cart:\n    def __init__(self):\n        self.items = []\n")
+NEAR_CODE = CODE.replace("total = 0", "total = 0  # start")
+PROSE = "The meeting has been moved to Thursday afternoon because the room was booked by another team."
+EMPTY_BIN = (1 << 64) - 1
+
+
+class MinHasherTest(unittest.TestCase):
+    def setUp(self):
+        self.hasher = MinHasher(num_perm=32, shingle_size=5)
+
+    def test_similarity_estimates(self):
+        signature = self.hasher.signature(CODE)
+        self.assertEqual(self.hasher.similarity(signature, self.hasher.signature(CODE)), 1.0)
+        self.assertGreaterEqual(self.hasher.similarity(signature, self.hasher.signature(NEAR_CODE)), 0.8)
+        self.assertLess(self.hasher.similarity(signature, self.hasher.signature(PROSE)), 0.2)
+
+    def test_case_and_whitespace_are_normalized(self):
+        self.assertEqual(self.hasher.signature(CODE), self.hasher.signature("  " + CODE.upper().replace("\n", " \n\t")))
+
+    def test_densification_fills_every_bin_of_a_short_text(self):
+        # Fewer shingles than bins: empty bins are filled from their non-empty neighbours
+        signature = self.hasher.signature("abcdefg")
+        self.assertEqual(len(signature), 32)
+        self.assertNotIn(EMPTY_BIN, signature)
+        self.assertEqual(signature, self.hasher.signature("abcdefg"))
+
+    def test_signature_is_stable_across_instances(self):
+        self.assertEqual(self.hasher.signature(PROSE), MinHasher(num_perm=32, shingle_size=5).signature(PROSE))
+
+
+class CorpusDeduplicatorTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.input_dir = os.path.join(self.tmp.name, "in")
+        self.output_dir = os.path.join(self.tmp.name, "out")
+        os.makedirs(self.input_dir)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, language, questions):
+        with open(os.path.join(self.input_dir, f"{language}_code_text_pairs.jsonl"), "w", encoding="utf-8") as f:
+            for segments in questions:
+                f.write(json.dumps({"language": language, "segments": segments}) + "\n")
+
+    def _read(self, language):
+        with open(os.path.join(self.output_dir, f"{language}_code_text_pairs.jsonl"), encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_bands_must_divide_num_perm(self):
+        with self.assertRaises(ValueError):
+            CorpusDeduplicator(self.input_dir, self.output_dir, num_perm=32, bands=5)
+
+    def test_exact_and_near_duplicates_across_files(self):
+        self._write("python", [
+            [{"type": "CODE", "text": CODE}, {"type": "TEXT", "text": PROSE}],
+            [{"type": "CODE", "text": "  " + CODE.replace("\n", "\n\n")}],  # Exact after whitespace collapse
+            [{"type": "CODE", "text": NEAR_CODE}],
+        ])
+        self._write("ruby", [
+            [{"type": "CODE", "text": CODE}],  # Exact duplicate in another language file
+            [{"type": "TEXT", "text": CODE}],  # Same text, other label
+        ])
+
+        report = CorpusDeduplicator(self.input_dir, self.output_dir).run()
+        total = report["total"]
+        self.assertEqual(total["segments_in"], 6)
+        self.assertEqual(total["segments_out"], 3)
+        self.assertEqual(total["exact_duplicates"], 2)
+        self.assertEqual(total["label_conflicts"], 1)
+        self.assertEqual(total["near_duplicates_kept"], 1)
+        self.assertEqual(total["clusters"], 2)
+
+        python = self._read("python")
+        self.assertEqual(len(python), 2)  # The question left without segments is dropped
+        code, prose = python[0]["segments"]
+        near = python[1]["segments"][0]
+        self.assertEqual(near["cluster"], code["cluster"])
+        self.assertEqual(near["split"], code["split"])
+        self.assertNotEqual(prose["cluster"], code["cluster"])
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, "ruby_code_text_pairs.jsonl.tmp")))
+        self.assertEqual(self._read("ruby"), [])
+
+        with open(os.path.join(self.output_dir, REPORT_NAME), encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["total"], total)
+
+    def test_cluster_size_is_capped(self):
+        variants = [CODE.replace("total = 0", f"total = 0  # v{i}") for i in range(5)]
+        self._write("python", [[{"type": "CODE", "text": text}] for text in [CODE] + variants])
+
+        report = CorpusDeduplicator(self.input_dir, self.output_dir, max_cluster_size=2).run()
+        self.assertEqual(report["total"]["segments_out"], 2)
+        self.assertEqual(report["total"]["near_duplicates_dropped"], 4)
+
+    def test_split_is_deterministic_per_cluster(self):
+        deduplicator = CorpusDeduplicator(self.input_dir, self.output_dir, test_size=0.2)
+        cluster_ids = [hashlib.sha1(str(i).encode()).hexdigest()[:16] for i in range(2000)]
+        splits = [deduplicator.split_for_cluster(cluster_id) for cluster_id in cluster_ids]
+        self.assertEqual(splits, [deduplicator.split_for_cluster(cluster_id) for cluster_id in cluster_ids])
+        self.assertAlmostEqual(splits.count("test") / len(splits), 0.2, delta=0.03)
+
+    def test_no_input_files(self):
+        self.assertEqual(CorpusDeduplicator(self.input_dir, self.output_dir).run(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from src.services.checkers.custom_term_matcher import CustomTermMatcher
+
+
+def matched(matcher, text):
+    return [(text[start:end], replacement) for start, end, replacement in matcher.find_matches(text)]
+
+
+class CustomTermMatcherTest(unittest.TestCase):
+    def test_case_insensitive_multi_word_match_across_whitespace(self):
+        matcher = CustomTermMatcher({"Project Apollo": "PROJECT1"})
+        text = "Ask the project  \n Apollo team"
+        self.assertEqual(matched(matcher, text), [("project  \n Apollo", "PROJECT1")])
+
+    def test_matches_only_on_word_boundaries(self):
+        matcher = CustomTermMatcher({"cat": "ANIMAL"})
+        self.assertEqual(matched(matcher, "concatenate cats, cat."), [("cat", "ANIMAL")])
+
+    def test_leftmost_longest_without_overlaps(self):
+        matcher = CustomTermMatcher({"new york": "CITY", "new york city": "BIG_CITY", "york city": "OTHER"})
+        self.assertEqual(matched(matcher, "in New York City today"), [("New York City", "BIG_CITY")])
+
+    def test_leftmost_match_wins_over_a_later_overlapping_one(self):
+        matcher = CustomTermMatcher({"ab cd": "FIRST", "cd ef": "SECOND"})
+        self.assertEqual(matched(matcher, "ab cd ef"), [("ab cd", "FIRST")])
+
+    def test_failure_links_are_rebuilt_after_remove_and_add(self):
+        matcher = CustomTermMatcher({"a b x": "ABX", "b c": "BC"})
+        self.assertEqual(matched(matcher, "a b c"), [("b c", "BC")])
+
+        matcher.remove_term("a b x")
+        matcher.add_term("a b c", "ABC")
+        self.assertEqual(matched(matcher, "a b c"), [("a b c", "ABC")])
+
+        matcher.remove_term("a b c")
+        self.assertEqual(matched(matcher, "a b c"), [("b c", "BC")])
+        self.assertEqual(len(matcher), 1)
+
+    def test_removed_term_can_be_added_back(self):
+        matcher = CustomTermMatcher({"secret": "S"})
+        matcher.remove_term("secret")
+        self.assertEqual(matched(matcher, "a secret"), [])
+        matcher.add_term("Secret", "S2")
+        self.assertEqual(matched(matcher, "a secret"), [("secret", "S2")])
+
+    def test_update_terms_reports_changes(self):
+        matcher = CustomTermMatcher()
+        self.assertTrue(matcher.update_terms({"alpha": "A", "beta": "B"}))
+        self.assertFalse(matcher.update_terms({"ALPHA": "A", " beta ": "B"}))
+        self.assertTrue(matcher.update_terms({"alpha": "A2"}))
+        self.assertEqual(matched(matcher, "alpha beta"), [("alpha", "A2")])
+
+    def test_offsets_stay_aligned_when_lowercasing_expands_a_character(self):
+        # "İ".lower() is two characters; offsets must still point into the original text
+        matcher = CustomTermMatcher({"foo bar": "FB"})
+        text = "İİ  Foo   bar!"
+        self.assertEqual(matched(matcher, text), [("Foo   bar", "FB")])
+
+    def test_empty_inputs(self):
+        self.assertEqual(CustomTermMatcher().find_matches("anything"), [])
+        self.assertEqual(CustomTermMatcher({"x": "y"}).find_matches(""), [])
+        self.assertFalse(CustomTermMatcher().update_terms({"   ": "blank"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
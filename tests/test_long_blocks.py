@@ -0,0 +1,28 @@
+import unittest
+
+from src.services.code_classifier.long_blocks import (
+    CHARS_PER_TOKEN, LONG_BLOCK_CHARS, MAX_SEQUENCE_LENGTH, WINDOW_CHARS, sample_windows
+)
+
+
+class LongBlockWindowsTest(unittest.TestCase):
+    def test_threshold_follows_the_token_budget(self):
+        # A block of ~500-1200 characters of code already exceeds 256 tokens; it must be windowed
+        self.assertLessEqual(LONG_BLOCK_CHARS, MAX_SEQUENCE_LENGTH * CHARS_PER_TOKEN)
+        self.assertLess(LONG_BLOCK_CHARS, 1200)
+        self.assertLessEqual(WINDOW_CHARS, LONG_BLOCK_CHARS)
+
+    def test_windows_cover_head_middle_and_tail(self):
+        lines = [f"line {i:03d}: value = compute({i})" for i in range(200)]
+        text = "\n".join(lines)
+        windows = sample_windows(text)
+
+        self.assertEqual(len(windows), 3)
+        self.assertTrue(all(len(window) <= WINDOW_CHARS for window in windows))
+        self.assertTrue(windows[0].startswith(lines[0]))
+        self.assertTrue(windows[1].startswith("line "))  # moved to a line start
+        self.assertTrue(windows[2].endswith(lines[-1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+from src.services.checkers.email_checker import EmailChecker
+from src.services.checkers.phone_checker import PhoneChecker
+from src.services.checkers.pii_scanner import PIIScanner
+
+
+def found(scanner, text):
+    return [(span["detector"], span["text"]) for span in scanner.scan(text)]
+
+
+class PIIScannerTest(unittest.TestCase):
+    def test_earlier_registered_detector_wins_on_equal_start(self):
+        scanner = PIIScanner()
+        scanner.add_detector("SHORT", "CUSTOM_REGEX", r"\d{3}")
+        scanner.add_detector("LONG", "CUSTOM_REGEX", r"\d{3}-\d{4}")
+        self.assertEqual(found(scanner, "call 555-1234"), [("SHORT", "555"), ("SHORT", "123")])
+
+        scanner = PIIScanner()
+        scanner.add_detector("LONG", "CUSTOM_REGEX", r"\d{3}-\d{4}")
+        scanner.add_detector("SHORT", "CUSTOM_REGEX", r"\d{3}")
+        self.assertEqual(found(scanner, "call 555-1234"), [("LONG", "555-1234")])
+
+    def test_leftmost_span_wins_over_earlier_registered_detector(self):
+        scanner = PIIScanner()
+        scanner.add_detector("WORLD", "CUSTOM_REGEX", r"world\d")
+        scanner.add_detector("HELLO", "CUSTOM_REGEX", r"hello world")
+        self.assertEqual(found(scanner, "hello world1"), [("HELLO", "hello world")])
+
+    def test_every_detector_is_reported_in_one_scan(self):
+        scanner = PIIScanner()
+        scanner.add_detector("EMAIL", "EMAIL", r"[\w.]+@[\w.]+\.\w+")
+        scanner.add_detector("PHONE", "PHONE", r"\+?\d[\d -]{7,}\d")
+        spans = scanner.scan("mail a.b@example.com or +49 170 1234567 now")
+        self.assertEqual([(s["type"], s["text"]) for s in spans],
+                         [("EMAIL", "a.b@example.com"), ("PHONE", "+49 170 1234567")])
+        self.assertEqual(spans[0]["start"], 5)
+
+    def test_backreference_pattern_scanned_separately_keeps_tie_break(self):
+        scanner = PIIScanner()
+        scanner.add_detector("REPEAT", "CUSTOM_REGEX", r"(\w)\1\w*")
+        scanner.add_detector("WORD", "CUSTOM_REGEX", r"\w+")
+        self.assertEqual(found(scanner, "aab cd"), [("REPEAT", "aab"), ("WORD", "cd")])
+
+    def test_removed_detector_renumbers_the_combined_engine(self):
+        scanner = PIIScanner()
+        scanner.add_detector("A", "CUSTOM_REGEX", r"aaa")
+        scanner.add_detector("B", "CUSTOM_REGEX", r"bbb")
+        scanner.add_detector("C", "CUSTOM_REGEX", r"ccc")
+        self.assertEqual(found(scanner, "aaa bbb ccc"), [("A", "aaa"), ("B", "bbb"), ("C", "ccc")])
+
+        self.assertTrue(scanner.remove_detector("A"))
+        self.assertFalse(scanner.remove_detector("A"))
+        self.assertEqual(found(scanner, "aaa bbb ccc"), [("B", "bbb"), ("C", "ccc")])
+
+    def test_long_digit_run_is_masked_to_the_end(self):
+        scanner = PIIScanner()
+        scanner.add_detector("EMAIL", "EMAIL", EmailChecker().email_pattern)
+        scanner.add_detector("PHONE", "PHONE", PhoneChecker().phone_pattern)
+        digits = "123456789012345678901234567890"
+        spans = scanner.scan(f"id {digits} end")
+        self.assertEqual([s["text"] for s in spans], ["1234567890123456789", "01234567890"])
+        self.assertEqual("".join(s["text"] for s in spans), digits)
+
+    def test_invalid_pattern_is_rejected(self):
+        scanner = PIIScanner()
+        self.assertFalse(scanner.add_detector("BROKEN", "CUSTOM_REGEX", r"(unclosed"))
+        self.assertEqual(scanner.detectors, [])
+        self.assertEqual(scanner.scan("(unclosed"), [])
+
+    def test_empty_matches_are_ignored(self):
+        scanner = PIIScanner()
+        scanner.add_detector("OPTIONAL", "CUSTOM_REGEX", r"x*")
+        self.assertEqual(found(scanner, "ab xx"), [("OPTIONAL", "xx")])
+
+
+if __name__ == "__main__":
+    unittest.main()
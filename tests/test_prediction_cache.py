@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+
+from src.services.code_classifier.prediction_cache import PredictionCache
+
+
+class PredictionCachePersistenceTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "cache.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_long_block_fields_survive_a_restart(self):
+        cache = PredictionCache("v1", db_path=self.db_path)
+        key = cache.make_key("block")
+        cache.put(key, {"prediction": "CODE", "confidence": 0.8, "is_code": True, "mixed": True, "windows": 3})
+        cache.close()
+
+        reopened = PredictionCache("v1", db_path=self.db_path)
+        result = reopened.get(key)
+        self.assertEqual(reopened.disk_hits, 1)
+        self.assertEqual(result, {"prediction": "CODE", "confidence": 0.8, "is_code": True, "mixed": True, "windows": 3})
+        reopened.close()
+
+    def test_plain_prediction_round_trip(self):
+        cache = PredictionCache("v1", db_path=self.db_path)
+        key = cache.make_key("hello  world")
+        cache.put(key, {"prediction": "TEXT", "confidence": 0.9, "is_code": False})
+        cache.close()
+
+        reopened = PredictionCache("v1", db_path=self.db_path)
+        self.assertEqual(reopened.get(reopened.make_key("hello world")),
+                         {"prediction": "TEXT", "confidence": 0.9, "is_code": False})
+        reopened.close()
+
+    def test_other_model_version_is_not_read(self):
+        cache = PredictionCache("v1", db_path=self.db_path)
+        key = cache.make_key("block")
+        cache.put(key, {"prediction": "CODE", "confidence": 0.8, "is_code": True})
+        cache.close()
+
+        reopened = PredictionCache("v2", db_path=self.db_path)
+        self.assertIsNone(reopened.get(key))
+        reopened.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import json
+import os
+import tempfile
+import unittest
+
+try:
+    import requests  # noqa: F401
+    import bs4  # noqa: F401
+    SCRAPER_DEPENDENCIES_AVAILABLE = True
+except ImportError:
+    SCRAPER_DEPENDENCIES_AVAILABLE = False
+
+
+def _question(question_id):
+    return {
+        "question_id": question_id,
+        "title": f"Question {question_id}",
+        "body": "<p>How do I add numbers?</p><pre><code>def add(a, b):\n    return a + b</code></pre>",
+        "score": 1
+    }
+
+
+@unittest.skipUnless(SCRAPER_DEPENDENCIES_AVAILABLE, "requests and beautifulsoup4 are required")
+class ScraperReplayTest(unittest.TestCase):
+    def setUp(self):
+        from src.services.code_classifier.model_data_fetch.http_replay import fixture_key
+        self.tmp = tempfile.TemporaryDirectory()
+        self.previous_cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.fixtures_dir = os.path.join(self.tmp.name, "fixtures")
+        os.makedirs(self.fixtures_dir)
+        pages = {1: ([_question(1), _question(2)], True), 2: ([_question(3)], False)}
+        for page, (items, has_more) in pages.items():
+            url = "https://api.stackexchange.com/2.3/questions"
+            params = {"order": "desc", "sort": "votes", "tagged": "python", "site": "stackoverflow",
+                      "filter": "withBody", "pagesize": 100, "page": page}
+            with open(os.path.join(self.fixtures_dir, fixture_key(url, params) + ".json"), "w", encoding="utf-8") as f:
+                json.dump({"url": url, "params": params, "status": 200,
+                           "body": json.dumps({"items": items, "has_more": has_more, "quota_remaining": 100})}, f)
+
+    def tearDown(self):
+        os.chdir(self.previous_cwd)
+        self.tmp.cleanup()
+
+    def _scraper(self):
+        from src.services.code_classifier.model_data_fetch.stackoverflow_scraper import StackOverflowScraper
+        scraper = StackOverflowScraper(http_mode="replay", fixtures_dir=self.fixtures_dir)
+        scraper.languages = ["python"]
+        return scraper
+
+    def test_replay_fetches_all_pages_into_the_sandbox(self):
+        scraper = self._scraper()
+        questions = scraper.fetch_questions("python", max_pages=5)
+
+        self.assertEqual([q["question_id"] for q in questions], [1, 2, 3])
+        self.assertEqual(scraper.quota_remaining, 100)
+        self.assertTrue(scraper.raw_data_dir.startswith(self.fixtures_dir))
+        with open(os.path.join(scraper.raw_data_dir, "python_raw_data.jsonl"), encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 3)
+        self.assertEqual(scraper.load_cursors()["python"], {"next_page": 3, "done": True})
+        # Nothing is written to the production data directory
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, "model")))
+
+    def test_replay_resumes_from_cursor_and_processes_segments(self):
+        first = self._scraper()
+        first.fetch_questions("python", max_pages=1)
+        self.assertEqual(first.load_cursors()["python"], {"next_page": 2, "done": False})
+
+        second = self._scraper()
+        self.assertEqual([q["question_id"] for q in second.fetch_questions("python", max_pages=5)], [3])
+
+        second.process_language_data("python", processes=1)
+        with open(os.path.join(second.processed_data_dir, "python_code_text_pairs.jsonl"), encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual([s["type"] for s in rows[0]["segments"]], ["TEXT", "CODE"])
+
+    def test_unknown_request_is_not_fetched(self):
+        scraper = self._scraper()
+        self.assertEqual(scraper.fetch_questions("rust", max_pages=1), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import threading
+import unittest
+from types import SimpleNamespace
+
+from src.services.checkers.spacy_checker import SpacyChecker, SPACY_AVAILABLE
+
+
+class FakeModel:
+    """Stands in for a spaCy pipeline: tags every occurrence of one word"""
+
+    def __init__(self, word, label, release=None):
+        self.word = word
+        self.label = label
+        self.release = release
+
+    def __call__(self, text):
+        if self.release is not None:
+            self.release.wait(5)
+        start = text.find(self.word)
+        ents = [] if start < 0 else [SimpleNamespace(start_char=start, end_char=start + len(self.word), label_=self.label)]
+        return SimpleNamespace(text=text, ents=ents)
+
+
+@unittest.skipUnless(SPACY_AVAILABLE, "spaCy is not installed")
+class EnsembleCompletenessTest(unittest.TestCase):
+    def setUp(self):
+        self.checker = SpacyChecker(load_default_model=False)
+
+    def tearDown(self):
+        if self.checker._executor is not None:
+            self.checker._executor.shutdown(wait=False)
+
+    def test_all_models_answered(self):
+        self.checker.nlp_models = {"a": FakeModel("Alice", "PERSON"), "b": FakeModel("Paris", "GPE")}
+        replacements, complete = self.checker.analyze_entities("Alice lives in Paris")
+        self.assertTrue(complete)
+        self.assertEqual(replacements, {"Alice": "PERSON1", "Paris": "GPE1"})
+
+    def test_model_missing_the_budget_marks_the_result_incomplete(self):
+        release = threading.Event()
+        self.checker.nlp_models = {"fast": FakeModel("Alice", "PERSON"),
+                                   "slow": FakeModel("Paris", "GPE", release=release)}
+        self.checker.configure_ensemble(latency_budget=0.05)
+        try:
+            replacements, complete = self.checker.analyze_entities("Alice lives in Paris")
+        finally:
+            release.set()
+        self.assertFalse(complete)
+        self.assertEqual(replacements, {"Alice": "PERSON1"})
+
+
+if __name__ == "__main__":
+    unittest.main()